@@ -0,0 +1,323 @@
+"""
+Benchmark Suite
+Measures per-tier latency and throughput of the chatbot against the mock Azure OpenAI server
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Callable
+from services.latency_stats import percentile
+
+
+# Router benchmarks per test_suite.json question type, named after the tier they exercise
+ROUTER_TIERS = {"KB": "company_info", "DB": "inventory", "Fallback": "unknown"}
+
+# Company questions for the KB benchmark, on top of the KB questions in test_suite.json
+KB_QUESTIONS = [
+    "Where are you located?",
+    "What are your opening hours?",
+    "How long does delivery take?",
+    "What is your returns policy?",
+    "How can I contact support?",
+    "Tell me about the company"
+]
+
+
+def run_benchmark(func: Callable[[Any], Any], inputs: List[Any], requests: int,
+                  concurrency: int, warmup: int) -> Dict[str, Any]:
+    """
+    Call func over the inputs (cycling) from a thread pool and time every call
+    
+    Args:
+        func: Function under test, called with one input
+        inputs: Inputs to cycle through
+        requests: Number of timed calls
+        concurrency: Number of calls in flight at once
+        warmup: Untimed calls made first (connection setup, caches, JIT of lazy paths)
+    
+    Returns:
+        Summary with count, errors, throughput and latency percentiles in ms
+    """
+    for index in range(warmup):
+        try:
+            func(inputs[index % len(inputs)])
+        except Exception:
+            pass
+    
+    def timed(index: int) -> Optional[float]:
+        start = time.perf_counter()
+        try:
+            func(inputs[index % len(inputs)])
+        except Exception:
+            return None
+        return (time.perf_counter() - start) * 1000
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+    
+    latencies = sorted(sample for sample in samples if sample is not None)
+    return {
+        "requests": requests,
+        "errors": requests - len(latencies),
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0
+    }
+
+
+class MockProcess:
+    """mock_azure.py running in its own process, so it does not compete for the GIL"""
+    
+    def __init__(self, process: subprocess.Popen, url: str):
+        """
+        Args:
+            process: The mock server process
+            url: Its endpoint URL
+        """
+        self.process = process
+        self.url = url
+    
+    def stats(self) -> Dict[str, int]:
+        """Request counters of the mock server"""
+        with urllib.request.urlopen(f"{self.url}/stats", timeout=5) as response:
+            return json.loads(response.read())
+    
+    def stop(self):
+        """Terminate the mock server"""
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+
+def start_mock(args: argparse.Namespace) -> MockProcess:
+    """
+    Start mock_azure.py on a free port and wait until it answers
+    
+    Args:
+        args: Parsed command line arguments with the mock settings
+    
+    Returns:
+        Running MockProcess
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("mock_azure.py")), "--port", str(port),
+         "--latency", str(args.latency), "--jitter", str(args.jitter),
+         "--error-rate", str(args.error_rate), "--seed", str(args.seed)],
+        stdout=subprocess.DEVNULL
+    )
+    mock = MockProcess(process, f"http://127.0.0.1:{port}")
+    
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            mock.stats()
+            return mock
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                mock.stop()
+                raise RuntimeError("Mock Azure OpenAI server did not start")
+            time.sleep(0.1)
+
+
+def git_commit() -> Optional[str]:
+    """Current git commit, so results can be compared between commits"""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(results: Dict[str, Any], baseline_path: Path):
+    """
+    Print the change of each benchmark against a previous results file
+    
+    Args:
+        results: Results of this run
+        baseline_path: JSON file written by an earlier run
+    """
+    try:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"❌ Error loading baseline: {e}")
+        return
+    
+    print()
+    print(f"📊 Compared with {baseline_path} (commit {baseline.get('commit') or 'unknown'})")
+    print(f"{'Benchmark':<24} {'p50':>16} {'p95':>16} {'p99':>16} {'throughput':>18}")
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous:
+            print(f"{name:<24} (new)")
+            continue
+        
+        cells = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            before, after = previous.get(metric, 0.0), current[metric]
+            change = (after - before) / before * 100 if before else 0.0
+            cells.append(f"{after:>9.2f} ({change:+.0f}%)")
+        print(f"{name:<24} {cells[0]:>16} {cells[1]:>16} {cells[2]:>16} {cells[3]:>18}")
+
+
+def main():
+    """Start the mock server, run every benchmark and write the results as JSON"""
+    parser = argparse.ArgumentParser(description="TechGear UK Chatbot benchmark suite")
+    parser.add_argument("--requests", type=int, default=200, help="Timed calls per benchmark")
+    parser.add_argument("--concurrency", type=int, default=8, help="Calls in flight at once")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed calls before each benchmark")
+    parser.add_argument("--latency", type=float, default=300, help="Mock LLM latency in ms")
+    parser.add_argument("--jitter", type=float, default=100, help="Mock LLM latency jitter in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock LLM calls answered with 429")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the mock server")
+    parser.add_argument("--endpoint", default=None,
+                        help="Use this endpoint (e.g. a separately started mock_azure.py) instead of an in-process mock")
+    parser.add_argument("--no-fast-paths", action="store_true",
+                        help="Disable the local classifier and KB retrieval so every query reaches the LLM")
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache enabled")
+    parser.add_argument("--only", default=None, help="Comma-separated benchmark names to run")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare against")
+    args = parser.parse_args()
+    
+    # Settings are read when config is first imported, so set them beforehand
+    if not args.cache:
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+    if args.no_fast_paths:
+        os.environ["LOCAL_CLASSIFIER"] = "false"
+        os.environ["KB_LOCAL_RETRIEVAL"] = "false"
+    
+    mock = None
+    if args.endpoint:
+        os.environ["AZURE_OPENAI_ENDPOINT"] = args.endpoint
+    elif os.getenv("LLM_CASSETTE_MODE", "").lower() == "replay":
+        # Recorded responses are served from the cassette, no endpoint is called
+        pass
+    else:
+        mock = start_mock(args)
+        os.environ["AZURE_OPENAI_ENDPOINT"] = mock.url
+        os.environ["AZURE_OPENAI_KEY"] = "mock"
+    
+    # Stop the mock server even if the router cannot be set up: the subprocess
+    # holds this process's pipes open, so a leaked one hangs the caller
+    try:
+        results = run_benchmarks(args, mock)
+    finally:
+        if mock:
+            mock.stop()
+    
+    output = Path(args.output)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print("=" * 100)
+    print(f"💾 Results written to {output}")
+    
+    if args.compare:
+        compare(results, Path(args.compare))
+
+
+def run_benchmarks(args: argparse.Namespace, mock: Optional[MockProcess]) -> Dict[str, Any]:
+    """
+    Build the router and run the selected benchmarks against it
+    
+    Args:
+        args: Parsed command line arguments
+        mock: In-process mock server, if one was started
+    
+    Returns:
+        Results with commit, timestamp, settings and one summary per benchmark
+    """
+    import config
+    from services.router import ChatbotRouter
+    
+    test_cases = json.loads(Path("test_suite.json").read_text(encoding="utf-8"))
+    router = ChatbotRouter()
+    kb_service = router.kb_service
+    inventory_service = router.inventory_service
+    
+    inventory_calls = [
+        (item_name, size, intent)
+        for item_name in inventory_service.get_item_names()
+        for size in ("S", "M", "L", "XL", None)
+        for intent in ("stock", "price")
+    ]
+    
+    benchmarks = {
+        f"router.{tier}": (router.route_query, [test["q"] for test in test_cases if test["type"] == test_type])
+        for test_type, tier in ROUTER_TIERS.items()
+    }
+    benchmarks["inventory.get_inventory"] = (lambda call: inventory_service.get_inventory(*call), inventory_calls)
+    benchmarks["kb.search"] = (
+        kb_service.search,
+        [test["q"] for test in test_cases if test["type"] == "KB"] + KB_QUESTIONS
+    )
+    
+    selected = set(args.only.split(",")) if args.only else set(benchmarks)
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "endpoint": "external" if args.endpoint else "mock" if mock else "cassette",
+            "mock_latency_ms": None if args.endpoint else args.latency,
+            "mock_jitter_ms": None if args.endpoint else args.jitter,
+            "mock_error_rate": None if args.endpoint else args.error_rate,
+            "fused_routing": config.FUSED_ROUTING,
+            "local_classifier": config.LOCAL_CLASSIFIER,
+            "kb_local_retrieval": config.KB_LOCAL_RETRIEVAL,
+            "response_cache_size": config.RESPONSE_CACHE_SIZE
+        },
+        "benchmarks": {}
+    }
+    
+    print("=" * 100)
+    print("⏱️  TechGear UK Chatbot Benchmark")
+    print("=" * 100)
+    print(f"{'Benchmark':<24} {'req':>6} {'err':>5} {'rps':>10} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'LLM/req':>8}")
+    
+    try:
+        for name, (func, inputs) in benchmarks.items():
+            if name not in selected or not inputs:
+                continue
+            
+            llm_calls = mock.stats()["requests"] if mock else 0
+            summary = run_benchmark(func, inputs, args.requests, args.concurrency, args.warmup)
+            if mock:
+                # Warm-up calls are included, so this is an upper bound per timed request
+                calls = mock.stats()["requests"] - llm_calls
+                summary["llm_calls_per_request"] = round(calls / (args.requests + args.warmup), 3)
+            results["benchmarks"][name] = summary
+            
+            print(f"{name:<24} {summary['requests']:>6} {summary['errors']:>5} {summary['throughput_rps']:>10.1f} "
+                  f"{summary['mean_ms']:>10.2f} {summary['p50_ms']:>10.2f} {summary['p95_ms']:>10.2f} "
+                  f"{summary['p99_ms']:>10.2f} {summary.get('llm_calls_per_request', 0):>8.2f}")
+    finally:
+        router.close()
+    
+    return results
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Benchmark interrupted by user")
+        sys.exit(1)
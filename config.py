@@ -17,12 +17,132 @@ DATA_DIR = BASE_DIR / "data"
 KNOWLEDGE_BASE_PATH = DATA_DIR / "knowledge_base.txt"
 INVENTORY_DB_PATH = "./inventory.db"  # Relative path as per requirements
 
-# Azure OpenAI settings
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_KEY = os.getenv("AZURE_OPENAI_KEY")
+# Answer company questions from a local BM25 index of the knowledge base file
+# when one entry clearly wins (confidence = 1 - runner-up score / top score)
+KB_LOCAL_RETRIEVAL = os.getenv("KB_LOCAL_RETRIEVAL", "true").lower() == "true"
+KB_RETRIEVAL_CONFIDENCE = float(os.getenv("KB_RETRIEVAL_CONFIDENCE", "0.5"))
+# Seconds between checks of the knowledge base file for changes; a changed
+# file is reloaded in the background, off the query path
+KB_RELOAD_INTERVAL = float(os.getenv("KB_RELOAD_INTERVAL", "2"))
+
+# SQLite tuning for the read-heavy inventory tier
+# (WAL journal mode is set by setup_database.py, not at startup)
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() == "true"
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Stock writes (InventoryService.reserve / apply_stock_updates) are group-committed:
+# updates queued while a transaction commits share the next one
+INVENTORY_WRITE_BATCH = int(os.getenv("INVENTORY_WRITE_BATCH", "256"))
+INVENTORY_WRITE_WAIT_MS = float(os.getenv("INVENTORY_WRITE_WAIT_MS", "0"))
+
+# Serve inventory lookups from an in-memory snapshot. Stock updates made by the
+# chatbot are applied to it in place; other database changes reload it in the background
+INVENTORY_SNAPSHOT = os.getenv("INVENTORY_SNAPSHOT", "true").lower() == "true"
+# Milliseconds between checks for changes made outside the chatbot (PRAGMA data_version)
+INVENTORY_REFRESH_INTERVAL_MS = float(os.getenv("INVENTORY_REFRESH_INTERVAL_MS", "100"))
+
+# Resolve near-miss product names ("Tech-Knit Hoodies", "running tee") to the
+# closest catalog name when the exact lookup misses
+FUZZY_NAME_MATCH = os.getenv("FUZZY_NAME_MATCH", "true").lower() == "true"
+FUZZY_MATCH_THRESHOLD = float(os.getenv("FUZZY_MATCH_THRESHOLD", "0.8"))
+
+# Record/replay of LLM calls: "record" saves every chat completion to the
+# cassette file, "replay" answers from it without network access. Replay
+# latency is in milliseconds, or "recorded" to reproduce the original timing.
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+LLM_CASSETTE_PATH = Path(os.getenv("LLM_CASSETTE_PATH", str(DATA_DIR / "llm_cassette.jsonl")))
+LLM_CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "0").lower()
+
+# Azure OpenAI settings (replay mode needs no deployment, so placeholders are used)
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT") or (
+    "https://replay.invalid" if LLM_CASSETTE_MODE == "replay" else None)
+AZURE_OPENAI_KEY = os.getenv("AZURE_OPENAI_KEY") or ("replay" if LLM_CASSETTE_MODE == "replay" else None)
 AZURE_API_VERSION = os.getenv("AZURE_API_VERSION", "2024-02-15-preview")
 AZURE_DEPLOYMENT_NAME = os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4o-mini")
 
+# HTTP connection pool shared by every Azure OpenAI client. Idle connections
+# are kept open for reuse; LLM_HTTP_WARMUP_CONNECTIONS are opened at startup
+# so the first queries skip the TCP and TLS handshakes (0 disables warm-up).
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "120"))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "5"))
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "30"))
+LLM_HTTP_WARMUP_CONNECTIONS = int(os.getenv("LLM_HTTP_WARMUP_CONNECTIONS", "2"))
+
+# Retries, rate limiting and circuit breaking for Azure OpenAI calls (services/resilience.py)
+# Size the RPM/TPM limits to the deployment's quota; 0 disables that limit
+LLM_RESILIENCE = os.getenv("LLM_RESILIENCE", "true").lower() == "true"
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.25"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "4"))
+LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+LLM_RATE_LIMIT_TPM = float(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", "2"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# Routing settings
+# When enabled, a single chat completion returns the tier, the KB category and
+# the get_inventory arguments together instead of two sequential calls.
+# Opt-in: the combined prompt changes how queries are classified
+FUSED_ROUTING = os.getenv("FUSED_ROUTING", "false").lower() == "true"
+
+# Without fused routing, start the KB search and inventory extraction alongside
+# the tier classifier (only for tiers the local classifier saw hints of) and
+# cancel whichever the classifier does not select. Trades extra tokens for latency.
+SPECULATIVE_ROUTING = os.getenv("SPECULATIVE_ROUTING", "false").lower() == "true"
+
+# Stream classification completions and stop reading once the label is unambiguous
+STREAM_CLASSIFICATION = os.getenv("STREAM_CLASSIFICATION", "false").lower() == "true"
+
+# Have classification calls answer with a one-token digit code, enforced with
+# logit_bias and max_tokens=1, instead of a free-text label. Requires a model
+# using the cl100k_base or o200k_base tokenizer (GPT-4, GPT-4o families).
+CONSTRAINED_CLASSIFICATION = os.getenv("CONSTRAINED_CLASSIFICATION", "false").lower() == "true"
+
+# Answer common stock and company questions with a local keyword classifier,
+# deferring to the LLM only when it is not confident
+LOCAL_CLASSIFIER = os.getenv("LOCAL_CLASSIFIER", "true").lower() == "true"
+
+# Share one answer, and one LLM call per identical prompt, between concurrent
+# identical queries instead of each making its own (services/single_flight.py)
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+
+# Response cache settings (RESPONSE_CACHE_SIZE=0 disables caching)
+# Inventory answers are also invalidated whenever product_inventory changes;
+# fallback answers are not cached by default
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+CACHE_TTL_KB = float(os.getenv("CACHE_TTL_KB", str(6 * 60 * 60)))
+CACHE_TTL_INVENTORY = float(os.getenv("CACHE_TTL_INVENTORY", "300"))
+CACHE_TTL_FALLBACK = float(os.getenv("CACHE_TTL_FALLBACK", "0"))
+
+# Conversation memory for follow-up questions (SESSION_MAX_SESSIONS=0 disables it)
+# Sessions expire after SESSION_IDLE_TIMEOUT seconds; beyond either limit the
+# least recently used sessions are evicted
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "50000"))
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", str(30 * 60)))
+SESSION_MAX_MEMORY_MB = float(os.getenv("SESSION_MAX_MEMORY_MB", "64"))
+SESSION_HISTORY_MESSAGES = int(os.getenv("SESSION_HISTORY_MESSAGES", "6"))
+SESSION_MESSAGE_CHARS = int(os.getenv("SESSION_MESSAGE_CHARS", "300"))
+
+# HTTP/WebSocket server settings (server.py)
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+SERVER_MAX_CONCURRENCY = int(os.getenv("SERVER_MAX_CONCURRENCY", "64"))
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "256"))
+SERVER_REQUEST_TIMEOUT = float(os.getenv("SERVER_REQUEST_TIMEOUT", "30"))
+SERVER_DRAIN_TIMEOUT = float(os.getenv("SERVER_DRAIN_TIMEOUT", "30"))
+
+# Telemetry: timing spans for LLM calls, SQLite queries and routing, exported
+# as Prometheus text (server.py /metrics) and optionally as JSON log lines
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+TELEMETRY_JSON_LOGS = os.getenv("TELEMETRY_JSON_LOGS", "false").lower() == "true"
+TELEMETRY_LOG_PATH = os.getenv("TELEMETRY_LOG_PATH") or None
+
 # Fallback message
 FALLBACK_MESSAGE = "I'm sorry, I cannot answer your query at the moment."
 
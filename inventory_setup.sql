@@ -7,6 +7,8 @@ CREATE TABLE product_inventory (
     stock_count INTEGER NOT NULL,
     price_gbp DECIMAL(10, 2) NOT NULL
 );
+CREATE UNIQUE INDEX idx_product_inventory_item_size
+    ON product_inventory (item_name COLLATE NOCASE, size COLLATE NOCASE);
 
 INSERT INTO product_inventory (item_name, size, stock_count, price_gbp) VALUES
 ('Waterproof Commuter Jacket', 'S', 5, 85.00),
@@ -3,23 +3,109 @@ Tri-Tier Chatbot (CLI) - Main Entry Point
 TechGear UK Console Application
 """
 
+import argparse
 import sys
-from services.router import ChatbotRouter
+import threading
+import time
+from typing import Optional, Dict
+
+
+# Startup phases are timed from here
+START_TIME = time.perf_counter()
+
+# Session of the CLI conversation, so follow-up questions refer to earlier answers
+CLI_SESSION_ID = "cli"
+
+
+class RouterLoader:
+    """
+    Builds the ChatbotRouter in a background thread
+    
+    Importing the services (openai in particular) and loading the data take
+    most of the CLI's startup time, so they run while the prompt is already
+    shown; the first query waits for them if they are not finished yet.
+    """
+    
+    def __init__(self):
+        """Start loading the router"""
+        self.router = None
+        self.error: Optional[Exception] = None
+        self.timings: Dict[str, float] = {}
+        self._thread = threading.Thread(target=self._load, name="router-loader", daemon=True)
+        self._thread.start()
+    
+    def get(self):
+        """
+        Wait for the router to be ready
+        
+        Returns:
+            ChatbotRouter
+        
+        Raises:
+            Exception: The error that stopped the router from loading
+        """
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.router
+    
+    def _load(self):
+        """Import and build the router, timing each phase"""
+        try:
+            start = time.perf_counter()
+            from services.router import ChatbotRouter
+            self.timings["import services"] = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            self.router = ChatbotRouter()
+            self.timings["build router"] = time.perf_counter() - start
+            for name, seconds in self.router.startup_timings.items():
+                self.timings[f"  {name}"] = seconds
+        except Exception as e:
+            self.error = e
+
+
+def print_startup_profile(prompt_ready: float, loader: RouterLoader):
+    """
+    Print how long each startup phase took
+    
+    Args:
+        prompt_ready: perf_counter value when the prompt could be shown
+        loader: Router loader to wait for
+    """
+    try:
+        loader.get()
+    except Exception:
+        pass
+    ready = time.perf_counter()
+    
+    print("⏱️  Startup profile (ms)")
+    print(f"  {'prompt shown':<28} {(prompt_ready - START_TIME) * 1000:>8.1f}")
+    for name, seconds in loader.timings.items():
+        print(f"  {name:<28} {seconds * 1000:>8.1f}")
+    print(f"  {'router ready':<28} {(ready - START_TIME) * 1000:>8.1f}")
+    print()
 
 
 def main():
     """Main entry point for the Tri-Tier Chatbot CLI"""
+    parser = argparse.ArgumentParser(description="TechGear UK Chatbot")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print the time taken by each startup phase")
+    args = parser.parse_args()
+    
+    # Load the chatbot in the background so the prompt appears immediately
+    loader = RouterLoader()
+    
     print("=" * 60)
     print("Welcome to TechGear UK Chatbot")
     print("=" * 60)
     print("Type 'exit' to quit\n")
     
-    # Initialize the chatbot router
-    try:
-        router = ChatbotRouter()
-    except Exception as e:
-        print(f"Error initializing chatbot: {e}")
-        sys.exit(1)
+    if args.profile_startup:
+        print_startup_profile(time.perf_counter(), loader)
+    
+    router = None
     
     # Main conversation loop
     while True:
@@ -36,13 +122,21 @@ def main():
             if not user_input:
                 continue
             
-            # Route the query and get response
-            response = router.route_query(user_input)
+            # The first query waits for the chatbot to finish loading
+            if router is None:
+                try:
+                    router = loader.get()
+                except Exception as e:
+                    print(f"Error initializing chatbot: {e}")
+                    sys.exit(1)
+            
+            # Route the query and get response; the whole run is one conversation
+            response = router.route_query(user_input, session_id=CLI_SESSION_ID)
             
             # Display bot response
             print(f"Bot: {response}\n")
-            
-        except KeyboardInterrupt:
+        
+        except (KeyboardInterrupt, EOFError):
             print("\n\nThank you for using TechGear UK Chatbot. Goodbye!")
             break
         except Exception as e:
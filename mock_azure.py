@@ -0,0 +1,378 @@
+"""
+Mock Azure OpenAI Server
+Local stand-in for the chat completions endpoint, for benchmarking without a live deployment
+"""
+
+import argparse
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, List, Tuple
+from services.intent_classifier import LocalIntentClassifier
+from services.kb_service import COMPANY_CATEGORIES, COMPANY_CLASSIFICATION_PROMPT, COMPANY_CODE_PROMPT, CATEGORY_CODES
+from services.llm_service import CLASSIFICATION_PROMPT, TIER_CODE_PROMPT, TIER_CODES
+import config
+
+
+# Path of the chat completions endpoint on an Azure OpenAI resource
+COMPLETIONS_PATH = re.compile(r"^/openai/deployments/([^/]+)/chat/completions$")
+
+# Characters per streamed chunk
+STREAM_CHUNK_CHARS = 4
+
+
+class MockCompletions:
+    """
+    Produces chat completion responses for the chatbot's prompts
+    
+    Answers are derived from the repo's own keyword classifier, so the mock
+    agrees with the local fast path: queries it is confident about get the
+    right tier, category and get_inventory arguments; anything else is
+    answered as unknown / not_company.
+    """
+    
+    def __init__(self, db_path: str = config.INVENTORY_DB_PATH):
+        """
+        Initialize the responder from the inventory catalog
+        
+        Args:
+            db_path: Inventory database to read product names from
+        """
+        with sqlite3.connect(db_path) as conn:
+            item_names = [row[0] for row in conn.execute(
+                f"SELECT DISTINCT item_name FROM {config.DB_TABLE_NAME}"
+            )]
+        self.classifier = LocalIntentClassifier(item_names, COMPANY_CATEGORIES)
+    
+    def respond(self, body: Dict[str, Any]) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        Work out the assistant's reply to a chat completions request
+        
+        Args:
+            body: Parsed request body
+        
+        Returns:
+            (content, tool_calls); tool_calls is a list of {"name", "arguments"}
+        """
+        messages = body.get("messages") or []
+        system = next((m.get("content") for m in messages if m.get("role") == "system"), "") or ""
+        query = next((m.get("content") for m in reversed(messages) if m.get("role") == "user"), "") or ""
+        tools = [tool["function"]["name"] for tool in body.get("tools") or []]
+        route = self.classifier.classify(query)
+        
+        if not route["confident"]:
+            route = {"tier": "unknown", "kb_category": None, "inventory_calls": []}
+        
+        if "route_query" in tools:
+            arguments = {"tier": route["tier"]}
+            if route["kb_category"]:
+                arguments["kb_category"] = route["kb_category"]
+            if route["inventory_calls"]:
+                arguments["items"] = route["inventory_calls"]
+            return None, [{"name": "route_query", "arguments": arguments}]
+        
+        if "get_inventory" in tools:
+            if not route["inventory_calls"]:
+                return "I could not identify a product in that question.", []
+            return None, [{"name": "get_inventory", "arguments": call} for call in route["inventory_calls"]]
+        
+        if system == COMPANY_CLASSIFICATION_PROMPT:
+            return route["kb_category"] or "not_company", []
+        
+        if system == CLASSIFICATION_PROMPT:
+            return route["tier"], []
+        
+        # Constrained classification prompts are answered with the label's digit code
+        if system == COMPANY_CODE_PROMPT:
+            return _code(CATEGORY_CODES, route["kb_category"] or "not_company"), []
+        
+        if system == TIER_CODE_PROMPT:
+            return _code(TIER_CODES, route["tier"]), []
+        
+        return "OK", []
+    
+    def completion(self, body: Dict[str, Any], model: str) -> Dict[str, Any]:
+        """
+        Build a complete (non-streamed) chat completion response
+        
+        Args:
+            body: Parsed request body
+            model: Deployment name from the request path
+        
+        Returns:
+            Response body in the Azure OpenAI format
+        """
+        content, tool_calls = self.respond(body)
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = self._tool_calls(tool_calls)
+        
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_calls else "stop"
+            }],
+            "usage": self._usage(body, content, tool_calls)
+        }
+    
+    def chunks(self, body: Dict[str, Any], model: str) -> List[Dict[str, Any]]:
+        """
+        Build the chunks of a streamed chat completion response
+        
+        Args:
+            body: Parsed request body
+            model: Deployment name from the request path
+        
+        Returns:
+            List of chunk bodies, in order; the first has no choices, as
+            Azure's content filter results chunk does, and so has the usage
+            chunk sent last when stream_options asks for it
+        """
+        content, tool_calls = self.respond(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+        
+        chunks = [{"id": "", "object": "", "created": 0, "model": "", "choices": [], "prompt_filter_results": []}]
+        if tool_calls:
+            calls = [dict(call, index=index) for index, call in enumerate(self._tool_calls(tool_calls))]
+            chunks.append(chunk({"role": "assistant", "tool_calls": calls}))
+        else:
+            text = content or ""
+            pieces = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+            chunks.append(chunk({"role": "assistant", "content": ""}))
+            chunks.extend(chunk({"content": piece}) for piece in pieces)
+        chunks.append(chunk({}, "tool_calls" if tool_calls else "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunks.append(dict(chunk({}), choices=[], usage=self._usage(body, content, tool_calls)))
+        return chunks
+    
+    @staticmethod
+    def _tool_calls(tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Format tool calls as the API returns them"""
+        return [{
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "function",
+            "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])}
+        } for call in tool_calls]
+    
+    @staticmethod
+    def _usage(body: Dict[str, Any], content: Optional[str], tool_calls: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Approximate token usage at four characters per token"""
+        prompt = sum(len(m.get("content") or "") for m in body.get("messages") or [])
+        prompt += len(json.dumps(body.get("tools") or []))
+        completion = len(content or "") + len(json.dumps([call["arguments"] for call in tool_calls]))
+        prompt_tokens, completion_tokens = prompt // 4 + 1, completion // 4 + 1
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+
+
+def _code(codes: Dict[str, str], label: str) -> str:
+    """Digit code of a label"""
+    return next(code for code, coded_label in codes.items() if coded_label == label)
+
+
+class MockAzureServer:
+    """Threaded HTTP server serving MockCompletions with simulated latency and errors"""
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 300,
+                 jitter_ms: float = 100, error_rate: float = 0.0, stream_interval_ms: float = 10,
+                 seed: Optional[int] = None):
+        """
+        Initialize the mock server
+        
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            latency_ms: Mean time before the response (or first streamed chunk)
+            jitter_ms: Latency varies uniformly by up to this much either way
+            error_rate: Fraction of requests answered with 429 and Retry-After
+            stream_interval_ms: Delay between streamed chunks
+            seed: Random seed for reproducible latency and errors
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.stream_interval_ms = stream_interval_ms
+        self.completions = MockCompletions()
+        
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "errors": 0, "streamed": 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def url(self) -> str:
+        """Endpoint URL to use as AZURE_OPENAI_ENDPOINT"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> "MockAzureServer":
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-azure", daemon=True)
+        self._thread.start()
+        return self
+    
+    def serve_forever(self):
+        """Serve requests on the calling thread until interrupted"""
+        self._httpd.serve_forever()
+    
+    def stop(self):
+        """Stop serving and close the socket"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get request counters
+        
+        Returns:
+            Dictionary with 'requests', 'errors' and 'streamed'
+        """
+        with self._lock:
+            return dict(self._counters)
+    
+    def _sample(self) -> Tuple[float, bool]:
+        """Draw this request's latency in seconds and whether it fails"""
+        with self._lock:
+            latency = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self._random.random() < self.error_rate
+            self._counters["requests"] += 1
+            self._counters["errors"] += failed
+            return max(latency, 0.0) / 1000, failed
+    
+    def _handler_class(self):
+        """Build the request handler class bound to this server"""
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            # Headers and body are written separately; without TCP_NODELAY the
+            # body waits on the client's delayed ACK and adds ~40 ms per call
+            disable_nagle_algorithm = True
+            
+            def do_GET(self):
+                if self.path.split("?", 1)[0] == "/stats":
+                    return self._json(200, server.stats())
+                return self._json(404, {"error": {"code": "404", "message": "Resource not found"}})
+            
+            def do_HEAD(self):
+                # Connection warm-up probes (services/clients.py): no body, connection kept open
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            
+            def do_POST(self):
+                path = self.path.split("?", 1)[0]
+                match = COMPLETIONS_PATH.match(path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length)
+                if not match:
+                    return self._json(404, {"error": {"code": "404", "message": "Resource not found"}})
+                
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    return self._json(400, {"error": {"code": "400", "message": "Invalid JSON body"}})
+                
+                latency, failed = server._sample()
+                time.sleep(latency)
+                if failed:
+                    return self._json(429, {"error": {
+                        "code": "429",
+                        "message": "Requests to the ChatCompletions_Create Operation have exceeded the rate limit."
+                    }}, {"Retry-After": "1"})
+                
+                if body.get("stream"):
+                    with server._lock:
+                        server._counters["streamed"] += 1
+                    return self._stream(server.completions.chunks(body, match.group(1)))
+                return self._json(200, server.completions.completion(body, match.group(1)))
+            
+            def _json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def _stream(self, chunks: List[Dict[str, Any]]):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    for index, chunk in enumerate(chunks):
+                        if index:
+                            time.sleep(server.stream_interval_ms / 1000)
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client stopped reading early (streamed classification does)
+                    pass
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+
+
+def main():
+    """Run the mock server until interrupted"""
+    parser = argparse.ArgumentParser(description="Mock Azure OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind")
+    parser.add_argument("--latency", type=float, default=300, help="Mean response latency in ms")
+    parser.add_argument("--jitter", type=float, default=100, help="Latency varies by up to this many ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--stream-interval", type=float, default=10, help="Delay between streamed chunks in ms")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    args = parser.parse_args()
+    
+    server = MockAzureServer(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                             args.stream_interval, args.seed)
+    print(f"Mock Azure OpenAI listening on {server.url}", flush=True)
+    print(f"  Set AZURE_OPENAI_ENDPOINT={server.url} and any AZURE_OPENAI_KEY")
+    print(f"  GET {server.url}/stats for request counters")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,24 @@
 """
 Test Suite Runner
-Runs all test cases from test_suite.json against the chatbot
+Runs all test cases from test_suite.json against the chatbot, concurrently,
+and checks per-type latency budgets
 """
 
+import argparse
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional, Dict, Any, List
+from services.latency_stats import percentile
 from services.router import ChatbotRouter
 import sys
 
 
+# Question types in test_suite.json, in summary order
+TEST_TYPES = ["KB", "DB", "Fallback"]
+
+
 def load_test_suite():
     """Load test cases from test_suite.json"""
     test_file = Path("test_suite.json")
@@ -25,8 +35,111 @@ def load_test_suite():
         return None
 
 
-def run_tests():
-    """Run all test cases and display results"""
+def check_response(test_type: str, expected: str, response: str) -> bool:
+    """
+    Check if a response matches the expected answer (flexible matching)
+    
+    Args:
+        test_type: Question type, 'KB', 'DB' or 'Fallback'
+        expected: Expected answer from the test suite
+        response: Chatbot response
+    
+    Returns:
+        True if the response is accepted
+    """
+    if test_type == "KB":
+        # For KB tests, check if expected text is in response
+        return expected.lower() in response.lower()
+    
+    if test_type == "DB":
+        # For DB tests, check if expected pattern is in response
+        if "Yes" in expected and "in stock" in expected:
+            # Stock availability test
+            return "yes" in response.lower() and "in stock" in response.lower()
+        if expected == "0 / Out of stock":
+            return "0" in response or "out of stock" in response.lower()
+        if expected.startswith("£"):
+            # Price test
+            return "£" in response and expected.replace("£", "") in response
+        # Stock count test
+        return expected in response
+    
+    if test_type == "Fallback":
+        # For fallback tests, check for fallback message
+        return "i'm sorry" in response.lower() and "cannot answer" in response.lower()
+    
+    return False
+
+
+def run_test(router: ChatbotRouter, test: Dict[str, Any], budgets: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Run one test case and time it
+    
+    Args:
+        router: Chatbot router under test
+        test: Test case from test_suite.json
+        budgets: Latency budget in ms per test type
+    
+    Returns:
+        Result with the response, pass/fail, elapsed ms and whether it was over budget
+    """
+    start = time.perf_counter()
+    try:
+        response = router.route_query(test["q"])
+        passed = check_response(test["type"], test["target"], response)
+    except Exception as e:
+        response = f"ERROR: {e}"
+        passed = False
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    budget = budgets.get(test["type"])
+    return {
+        "test": test,
+        "response": response,
+        "passed": passed,
+        "elapsed_ms": elapsed_ms,
+        "over_budget": budget is not None and elapsed_ms > budget
+    }
+
+
+def print_latency_summary(outcomes: List[Dict[str, Any]], budgets: Dict[str, float], wall_ms: float):
+    """
+    Print latency percentiles per test type against their budgets
+    
+    Args:
+        outcomes: Results from run_test
+        budgets: Latency budget in ms per test type
+        wall_ms: Wall-clock time of the whole run
+    """
+    print("⏱️  Latency Summary (ms)")
+    print("-" * 80)
+    print(f"{'Type':<10} {'tests':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9} {'budget':>9} {'over':>6}")
+    
+    types = TEST_TYPES + sorted({outcome["test"]["type"] for outcome in outcomes} - set(TEST_TYPES))
+    for test_type in types:
+        latencies = sorted(outcome["elapsed_ms"] for outcome in outcomes if outcome["test"]["type"] == test_type)
+        if not latencies:
+            continue
+        budget = budgets.get(test_type)
+        over = sum(1 for outcome in outcomes if outcome["test"]["type"] == test_type and outcome["over_budget"])
+        print(f"{test_type:<10} {len(latencies):>6} {sum(latencies) / len(latencies):>9.1f} "
+              f"{percentile(latencies, 50):>9.1f} {percentile(latencies, 95):>9.1f} {latencies[-1]:>9.1f} "
+              f"{budget if budget is not None else '-':>9} {over:>6}")
+    
+    serial_ms = sum(outcome["elapsed_ms"] for outcome in outcomes)
+    print("-" * 80)
+    print(f"Wall clock: {wall_ms:.0f} ms (sum of test times: {serial_ms:.0f} ms)")
+
+
+def run_tests(workers: int = 4, budgets: Optional[Dict[str, float]] = None):
+    """
+    Run all test cases and display results
+    
+    Args:
+        workers: Number of test cases run at once
+        budgets: Latency budget in ms per test type; a test over budget fails the run
+    """
+    budgets = budgets or {}
     
     # Load test suite
     test_cases = load_test_suite()
@@ -47,83 +160,55 @@ def run_tests():
     results = {
         "passed": 0,
         "failed": 0,
+        "over_budget": 0,
         "total": len(test_cases)
     }
     
     failed_tests = []
     
     print("=" * 80)
-    print("🧪 Running Test Suite")
+    print(f"🧪 Running Test Suite ({workers} worker{'s' if workers != 1 else ''})")
     print("=" * 80)
     print()
     
-    for test in test_cases:
-        test_id = test["id"]
-        test_type = test["type"]
-        question = test["q"]
-        expected = test["target"]
-        
-        print(f"Test #{test_id} [{test_type}]")
-        print(f"  Q: {question}")
-        
-        try:
-            # Get chatbot response
-            response = router.route_query(question)
-            
-            # Check if response matches expected (flexible matching)
-            passed = False
-            
-            if test_type == "KB":
-                # For KB tests, check if expected text is in response
-                passed = expected.lower() in response.lower()
-            
-            elif test_type == "DB":
-                # For DB tests, check if expected pattern is in response
-                if "Yes" in expected and "in stock" in expected:
-                    # Stock availability test
-                    passed = "yes" in response.lower() and "in stock" in response.lower()
-                elif expected == "0 / Out of stock":
-                    passed = "0" in response or "out of stock" in response.lower()
-                elif expected.startswith("£"):
-                    # Price test
-                    passed = "£" in response and expected.replace("£", "") in response
+    start = time.perf_counter()
+    outcomes = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Results are reported in test suite order as they become available
+            for outcome in pool.map(lambda test: run_test(router, test, budgets), test_cases):
+                outcomes.append(outcome)
+                test = outcome["test"]
+                response = outcome["response"]
+                
+                print(f"Test #{test['id']} [{test['type']}] ({outcome['elapsed_ms']:.0f} ms)")
+                print(f"  Q: {test['q']}")
+                
+                if outcome["passed"]:
+                    print(f"  ✅ PASSED")
+                    print(f"  A: {response}")
+                    results["passed"] += 1
                 else:
-                    # Stock count test
-                    passed = expected in response
-            
-            elif test_type == "Fallback":
-                # For fallback tests, check for fallback message
-                passed = "i'm sorry" in response.lower() and "cannot answer" in response.lower()
-            
-            if passed:
-                print(f"  ✅ PASSED")
-                print(f"  A: {response}")
-                results["passed"] += 1
-            else:
-                print(f"  ❌ FAILED")
-                print(f"  Expected: {expected}")
-                print(f"  Got:      {response}")
-                results["failed"] += 1
-                failed_tests.append({
-                    "id": test_id,
-                    "type": test_type,
-                    "question": question,
-                    "expected": expected,
-                    "got": response
-                })
-        
-        except Exception as e:
-            print(f"  ❌ ERROR: {e}")
-            results["failed"] += 1
-            failed_tests.append({
-                "id": test_id,
-                "type": test_type,
-                "question": question,
-                "expected": expected,
-                "got": f"ERROR: {e}"
-            })
-        
-        print()
+                    print(f"  ❌ FAILED")
+                    print(f"  Expected: {test['target']}")
+                    print(f"  Got:      {response}")
+                    results["failed"] += 1
+                    failed_tests.append({
+                        "id": test["id"],
+                        "type": test["type"],
+                        "question": test["q"],
+                        "expected": test["target"],
+                        "got": response
+                    })
+                
+                if outcome["over_budget"]:
+                    print(f"  ⏱️  OVER BUDGET: {outcome['elapsed_ms']:.0f} ms > {budgets[test['type']]:g} ms")
+                    results["over_budget"] += 1
+                
+                print()
+    finally:
+        router.close()
+    wall_ms = (time.perf_counter() - start) * 1000
     
     # Display summary
     print("=" * 80)
@@ -132,8 +217,12 @@ def run_tests():
     print(f"Total Tests:  {results['total']}")
     print(f"✅ Passed:    {results['passed']}")
     print(f"❌ Failed:    {results['failed']}")
+    if budgets:
+        print(f"⏱️  Over budget: {results['over_budget']}")
     print(f"Success Rate: {(results['passed'] / results['total'] * 100):.1f}%")
     print("=" * 80)
+    print_latency_summary(outcomes, budgets, wall_ms)
+    print("=" * 80)
     
     # Display failed tests details
     if failed_tests:
@@ -147,17 +236,34 @@ def run_tests():
             print(f"  Got:      {test['got']}")
         print("-" * 80)
     
-    return results["failed"] == 0
+    return results["failed"] == 0 and results["over_budget"] == 0
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="TechGear UK Chatbot test suite")
+    parser.add_argument("--workers", type=int, default=4, help="Test cases run at once (1 runs them in order)")
+    parser.add_argument("--budget-kb", type=float, default=None, help="Latency budget in ms for KB tests")
+    parser.add_argument("--budget-db", type=float, default=None, help="Latency budget in ms for DB tests")
+    parser.add_argument("--budget-fallback", type=float, default=None, help="Latency budget in ms for Fallback tests")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    budgets = {
+        test_type: budget
+        for test_type, budget in (("KB", args.budget_kb), ("DB", args.budget_db), ("Fallback", args.budget_fallback))
+        if budget is not None
+    }
+    
     print()
-    success = run_tests()
+    success = run_tests(max(args.workers, 1), budgets)
     print()
     
     if success:
         print("🎉 All tests passed!")
         sys.exit(0)
     else:
-        print("⚠️  Some tests failed. Please review the results above.")
+        print("⚠️  Some tests failed or exceeded their latency budget. Please review the results above.")
         sys.exit(1)
@@ -0,0 +1,509 @@
+"""
+Tri-Tier Chatbot (Server) - HTTP and WebSocket Entry Point
+Serves ChatbotRouter.aroute_query to web and chat-widget front ends
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import signal
+import struct
+import sys
+import uuid
+from typing import Optional, Dict, Tuple, Union
+from services.resilience import resilience
+from services.telemetry import telemetry
+import config
+
+
+# Magic value from RFC 6455 used to compute Sec-WebSocket-Accept
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+MAX_SESSION_ID_LENGTH = 128
+
+# Content type of the Prometheus text exposition format served on /metrics
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    503: "Service Unavailable",
+    504: "Gateway Timeout"
+}
+
+
+class Overloaded(Exception):
+    """Raised when the request queue is full or the server is draining"""
+
+
+class ChatServer:
+    """Asyncio HTTP/WebSocket server with bounded concurrency and backpressure"""
+    
+    def __init__(self, router, host: str = config.SERVER_HOST, port: int = config.SERVER_PORT,
+                 max_concurrency: int = config.SERVER_MAX_CONCURRENCY,
+                 max_queue: int = config.SERVER_MAX_QUEUE,
+                 request_timeout: float = config.SERVER_REQUEST_TIMEOUT):
+        """
+        Initialize the server
+        
+        Args:
+            router: ChatbotRouter used to answer queries
+            host: Interface to bind
+            port: Port to bind
+            max_concurrency: Queries routed at the same time
+            max_queue: Queries allowed to wait for a slot before returning 503
+            request_timeout: Seconds before a query is abandoned with 504
+        """
+        self.router = router
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.request_timeout = request_timeout
+        
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._admitted = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._draining = False
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections = set()
+        
+        # Signs the session IDs handed to HTTP clients. Sessions live in this
+        # process's memory, so a key that changes on restart loses nothing
+        self._session_key = secrets.token_bytes(32)
+    
+    async def start(self):
+        """Start listening for connections"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        sockets = self._server.sockets or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+    
+    async def shutdown(self, drain_timeout: float = config.SERVER_DRAIN_TIMEOUT):
+        """
+        Stop accepting work and wait for in-flight queries to finish
+        
+        Args:
+            drain_timeout: Seconds to wait for in-flight queries before closing connections
+        """
+        self._draining = True
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        
+        try:
+            await asyncio.wait_for(self._idle.wait(), drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"Server Warning: {self._admitted} queries still running after {drain_timeout}s")
+        
+        for writer in list(self._connections):
+            writer.close()
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get admission counters
+        
+        Returns:
+            Dictionary with admitted (in flight plus queued) and capacity limits
+        """
+        return {
+            "admitted": self._admitted,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue
+        }
+    
+    async def answer(self, query: str, session_id: Optional[str] = None) -> str:
+        """
+        Route a query with admission control and a timeout
+        
+        Args:
+            query: User's question
+            session_id: Conversation the query belongs to, for follow-up questions
+        
+        Returns:
+            Response string
+        
+        Raises:
+            Overloaded: The queue is full or the server is shutting down
+            asyncio.TimeoutError: The query took longer than request_timeout
+        """
+        if self._draining or self._admitted >= self.max_concurrency + self.max_queue:
+            raise Overloaded()
+        
+        self._admitted += 1
+        self._idle.clear()
+        try:
+            async with self._slots:
+                return await asyncio.wait_for(self.router.aroute_query(query, session_id), self.request_timeout)
+        finally:
+            self._admitted -= 1
+            if self._admitted == 0:
+                self._idle.set()
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP requests on a connection until it closes or upgrades to WebSocket"""
+        self._connections.add(writer)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                
+                method, path, headers, body = request
+                
+                if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self._serve_websocket(reader, writer, headers)
+                    break
+                
+                status, payload = await self._handle_http(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close" and not self._draining
+                await self._write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as e:
+            await self._write_response(writer, 400, {"error": str(e)}, keep_alive=False)
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+    
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """
+        Read one HTTP request
+        
+        Returns:
+            (method, path, headers, body), or None if the client closed the connection
+        """
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise ValueError("Incomplete request")
+            return None
+        except asyncio.LimitOverrunError:
+            raise ValueError("Request headers too large")
+        
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError("Request headers too large")
+        
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise ValueError("Malformed request line")
+        
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        
+        length = int(headers.get("content-length", "0") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        
+        return method.upper(), target.split("?", 1)[0], headers, body
+    
+    async def _handle_http(self, method: str, path: str, body: bytes) -> Tuple[int, Union[Dict, str]]:
+        """
+        Handle a plain HTTP request
+        
+        Returns:
+            (status code, JSON payload or metrics text)
+        """
+        if path == "/health":
+            status = "draining" if self._draining else "ok"
+            return 200, dict(self.stats(), status=status, sessions=self.router.session_stats(),
+                             llm_circuit=resilience.stats(), single_flight=self.router.flight_stats())
+        
+        if path == "/metrics":
+            return 200, telemetry.render_prometheus()
+        
+        if path != "/chat":
+            return 404, {"error": "Not found"}
+        
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        
+        try:
+            query, session_id = self._parse_query(body)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        
+        # Only IDs this server issued are accepted, so a client cannot pick
+        # another client's session and read or continue its conversation
+        if session_id is None:
+            session_id = self._issue_session()
+        elif not self._is_issued_session(session_id):
+            return 400, {"error": "Unknown 'session_id', omit it to start a new conversation"}
+        
+        status, payload = await self._route(query, session_id)
+        payload["session_id"] = session_id
+        return status, payload
+    
+    def _issue_session(self) -> str:
+        """Create a new session ID signed with this server's key"""
+        token = secrets.token_hex(16)
+        return f"{token}.{self._sign_session(token)}"
+    
+    def _is_issued_session(self, session_id: str) -> bool:
+        """Whether a client-supplied session ID was issued by this server"""
+        token, _, signature = session_id.partition(".")
+        return bool(signature) and hmac.compare_digest(signature, self._sign_session(token))
+    
+    def _sign_session(self, token: str) -> str:
+        """HMAC of a session token"""
+        return hmac.new(self._session_key, token.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+    
+    async def _route(self, query: str, session_id: Optional[str] = None) -> Tuple[int, Dict]:
+        """Answer a query and map overload and timeout to HTTP status codes"""
+        try:
+            return 200, {"response": await self.answer(query, session_id)}
+        except Overloaded:
+            return 503, {"error": "Server busy, please retry"}
+        except asyncio.TimeoutError:
+            return 504, {"error": "Request timed out"}
+    
+    @staticmethod
+    def _parse_query(body: bytes) -> Tuple[str, Optional[str]]:
+        """Extract a non-empty query string and the optional session_id from a JSON body"""
+        try:
+            data = json.loads(body.decode("utf-8") or "{}")
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError("Body must be JSON")
+        
+        query = data.get("query") if isinstance(data, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError("Missing 'query'")
+        
+        session_id = data.get("session_id")
+        if session_id is not None and (not isinstance(session_id, str) or not 0 < len(session_id) <= MAX_SESSION_ID_LENGTH):
+            raise ValueError(f"'session_id' must be a string of 1-{MAX_SESSION_ID_LENGTH} characters")
+        return query.strip(), session_id
+    
+    async def _write_response(self, writer: asyncio.StreamWriter, status: int, payload: Union[Dict, str],
+                              keep_alive: bool):
+        """Write a JSON HTTP response, or a Prometheus text response for a string payload"""
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), METRICS_CONTENT_TYPE
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        headers = [
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, 'Unknown')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+    
+    async def _serve_websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                               headers: Dict[str, str]):
+        """
+        Complete the WebSocket handshake and answer one query per text message
+        
+        Messages may be plain text or JSON {"query": "..."}; replies are JSON
+        {"response": "..."} or {"error": "...", "status": code}. Each
+        connection is one conversation; a session_id in a message is ignored,
+        so a client can only continue its own conversation.
+        """
+        key = headers.get("sec-websocket-key")
+        if not key:
+            raise ValueError("Missing Sec-WebSocket-Key")
+        
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode("latin-1"))
+        await writer.drain()
+        
+        connection_session = f"ws-{uuid.uuid4().hex}"
+        close_code = 1000
+        try:
+            while not self._draining:
+                try:
+                    opcode, payload = await self._read_frame(reader, writer)
+                except ValueError:
+                    # Message too big
+                    close_code = 1009
+                    break
+                
+                if opcode == 0x8:
+                    break
+                if opcode != 0x1:
+                    continue
+                
+                text = payload.decode("utf-8", errors="replace")
+                try:
+                    if text.lstrip().startswith("{"):
+                        query, _ = self._parse_query(payload)
+                    else:
+                        query = text.strip()
+                    if not query:
+                        raise ValueError("Empty query")
+                    status, reply = await self._route(query, connection_session)
+                except ValueError as e:
+                    status, reply = 400, {"error": str(e)}
+                
+                if status != 200:
+                    reply["status"] = status
+                self._write_frame(writer, 0x1, json.dumps(reply).encode("utf-8"))
+                await writer.drain()
+        finally:
+            self.router.end_session(connection_session)
+        
+        # Close handshake (1000 normal, 1001 going away when draining, 1009 too big)
+        if self._draining:
+            close_code = 1001
+        self._write_frame(writer, 0x8, struct.pack("!H", close_code))
+        await writer.drain()
+    
+    @classmethod
+    async def _read_frame(cls, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Tuple[int, bytes]:
+        """
+        Read one complete (possibly fragmented) WebSocket message
+        
+        Pings are answered here rather than returned, because they may arrive
+        between the fragments of a data message that is still being read.
+        
+        Returns:
+            (opcode, payload) of a data message or a close frame
+        """
+        message = b""
+        message_opcode = None
+        
+        while True:
+            first, second = await reader.readexactly(2)
+            fin = first & 0x80
+            opcode = first & 0x0F
+            length = second & 0x7F
+            
+            if length == 126:
+                length = struct.unpack("!H", await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", await reader.readexactly(8))[0]
+            if length > MAX_BODY_BYTES:
+                raise ValueError("WebSocket message too large")
+            
+            mask = await reader.readexactly(4) if second & 0x80 else None
+            payload = await reader.readexactly(length)
+            if mask:
+                payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+            
+            # Control frames may arrive between fragments of a data message
+            if opcode == 0x9:
+                cls._write_frame(writer, 0xA, payload)
+                await writer.drain()
+                continue
+            if opcode == 0x8:
+                return opcode, payload
+            if opcode >= 0x8:
+                # Unsolicited pong
+                continue
+            
+            if opcode != 0x0:
+                message_opcode = opcode
+            message += payload
+            if len(message) > MAX_BODY_BYTES:
+                raise ValueError("WebSocket message too large")
+            if fin:
+                return message_opcode, message
+    
+    @staticmethod
+    def _write_frame(writer: asyncio.StreamWriter, opcode: int, payload: bytes):
+        """Write one unmasked WebSocket frame"""
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        writer.write(header + payload)
+
+
+async def serve(args: argparse.Namespace):
+    """Run the server until SIGINT/SIGTERM, then drain and exit"""
+    from services.clients import clients
+    from services.router import ChatbotRouter
+    
+    # Queries run on this loop, so warm up its connection pool rather than the router's
+    router = ChatbotRouter(warm_up=False)
+    warm_up = asyncio.create_task(clients.awarm_up())
+    server = ChatServer(
+        router,
+        host=args.host,
+        port=args.port,
+        max_concurrency=args.concurrency,
+        max_queue=args.queue,
+        request_timeout=args.timeout
+    )
+    await server.start()
+    print(f"TechGear UK Chatbot server listening on http://{server.host}:{server.port}")
+    print("  POST /chat  {\"query\": \"...\", \"session_id\": \"<from a previous reply>\" (optional)}")
+    print("  GET  /ws    WebSocket, one query per message")
+    print("  GET  /health")
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: fall back to KeyboardInterrupt
+            pass
+    
+    try:
+        await stop.wait()
+    finally:
+        print("\nShutting down, draining in-flight requests...")
+        warm_up.cancel()
+        await server.shutdown(args.drain_timeout)
+        router.close()
+        print("Server stopped.")
+
+
+def main():
+    """Main entry point for the Tri-Tier Chatbot server"""
+    parser = argparse.ArgumentParser(description="TechGear UK Chatbot HTTP/WebSocket server")
+    parser.add_argument("--host", default=config.SERVER_HOST, help="Interface to bind")
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT, help="Port to bind")
+    parser.add_argument("--concurrency", type=int, default=config.SERVER_MAX_CONCURRENCY,
+                        help="Queries routed at the same time")
+    parser.add_argument("--queue", type=int, default=config.SERVER_MAX_QUEUE,
+                        help="Queries allowed to wait before returning 503")
+    parser.add_argument("--timeout", type=float, default=config.SERVER_REQUEST_TIMEOUT,
+                        help="Per-request timeout in seconds")
+    parser.add_argument("--drain-timeout", type=float, default=config.SERVER_DRAIN_TIMEOUT,
+                        help="Seconds to wait for in-flight requests on shutdown")
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Error running server: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
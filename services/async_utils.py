@@ -0,0 +1,112 @@
+"""
+Async Utilities
+Helpers for running the asyncio routing path from synchronous callers
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import weakref
+from typing import Any, Callable, Coroutine, Generic, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """An asyncio event loop running in a daemon thread"""
+    
+    def __init__(self, name: str = "chatbot-loop"):
+        """
+        Initialize the background loop; the thread starts on first use
+        
+        Args:
+            name: Name of the loop thread
+        """
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """
+        Run a coroutine on the background loop and wait for its result
+        
+        Safe to call from any number of threads concurrently; the coroutines
+        are interleaved on the single loop.
+        
+        Args:
+            coro: Coroutine to run
+            timeout: Seconds to wait for the result (optional)
+        
+        Returns:
+            The coroutine's result
+        """
+        return self.submit(coro).result(timeout)
+    
+    def submit(self, coro: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+        """
+        Schedule a coroutine on the background loop without waiting for it
+        
+        Args:
+            coro: Coroutine to run
+        
+        Returns:
+            Future for the coroutine's result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+    
+    def stop(self):
+        """Stop the loop and wait for its thread to exit"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop, self._thread = None, None
+        
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+    
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread if it is not already running"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name=self.name, daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+
+class LoopLocal(Generic[T]):
+    """
+    Lazily creates one object per running event loop
+    
+    Async HTTP clients are bound to the loop they were first used on, so a
+    service used from several loops needs one client per loop.
+    """
+    
+    def __init__(self, factory: Callable[[], T]):
+        """
+        Args:
+            factory: Zero-argument callable that builds the per-loop object
+        """
+        self._factory = factory
+        self._instances: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, T]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+    
+    def get(self) -> T:
+        """
+        Get the object for the running event loop, creating it on first use
+        
+        Returns:
+            Per-loop instance
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            instance = self._instances.get(loop)
+            if instance is None:
+                instance = self._factory()
+                self._instances[loop] = instance
+            return instance
@@ -0,0 +1,322 @@
+"""
+LLM Cassette - Record and replay chat completions
+Captures every chat completion to a JSONL file and serves it back without
+network access, for offline, deterministic test runs and benchmarks
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
+import config
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request was never recorded"""
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """
+    Fingerprint of a chat completion request
+    
+    Args:
+        request: Keyword arguments passed to chat.completions.create
+    
+    Returns:
+        Short hex digest of the canonical JSON form of the request
+    """
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:24]
+
+
+class ReplayStream:
+    """Iterates recorded chunks like the openai Stream returned for stream=True"""
+    
+    def __init__(self, chunks: List["ChatCompletionChunk"]):
+        self._chunks = iter(chunks)
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self) -> "ChatCompletionChunk":
+        return next(self._chunks)
+    
+    def __enter__(self) -> "ReplayStream":
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+    
+    def close(self):
+        self._chunks = iter(())
+
+
+class AsyncReplayStream:
+    """Async version of ReplayStream, standing in for openai's AsyncStream"""
+    
+    def __init__(self, chunks: List["ChatCompletionChunk"]):
+        self._chunks = iter(chunks)
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> "ChatCompletionChunk":
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+    
+    async def __aenter__(self) -> "AsyncReplayStream":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+    
+    async def close(self):
+        self._chunks = iter(())
+
+
+class Cassette:
+    """
+    Records chat completions to a JSONL file and replays them by request fingerprint
+    
+    Each line holds one request: its key, the user message (for people reading
+    the file), the latency seen when it was recorded, and either the response
+    or the list of streamed chunks. Only the first response to a request is
+    kept; failed calls are not recorded.
+    """
+    
+    def __init__(self, mode: str = config.LLM_CASSETTE_MODE, path: Path = config.LLM_CASSETTE_PATH,
+                 latency: str = config.LLM_CASSETTE_LATENCY):
+        """
+        Initialize the cassette and load previously recorded requests
+        
+        Args:
+            mode: 'off', 'record' (call the API and save responses) or 'replay' (serve saved responses)
+            path: JSONL cassette file
+            latency: Simulated latency in replay mode: milliseconds, or 'recorded' to
+                     wait as long as the original call took
+        """
+        if mode not in MODES:
+            raise ValueError(f"LLM_CASSETTE_MODE must be one of {', '.join(MODES)}, got '{mode}'")
+        
+        self.mode = mode
+        self.path = Path(path)
+        self.latency = latency
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        
+        if mode != "off":
+            self._load()
+    
+    @property
+    def replaying(self) -> bool:
+        """True if responses are served from the cassette instead of the API"""
+        return self.mode == "replay"
+    
+    def wrap(self, client):
+        """
+        Route a client's chat completions through the cassette
+        
+        Args:
+            client: AzureOpenAI client
+        
+        Returns:
+            The client itself when the cassette is off, otherwise a wrapper whose
+            chat.completions.create records or replays
+        """
+        if self.mode == "off":
+            return client
+        return _CassetteClient(client, _Completions(self, client))
+    
+    def wrap_async(self, client):
+        """
+        Async version of wrap
+        
+        Args:
+            client: AsyncAzureOpenAI client
+        
+        Returns:
+            The client itself or its recording/replaying wrapper
+        """
+        if self.mode == "off":
+            return client
+        return _CassetteClient(client, _AsyncCompletions(self, client))
+    
+    def _load(self):
+        """Read the recorded requests, skipping malformed lines"""
+        if not self.path.exists():
+            return
+        
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], entry)
+                    except (ValueError, KeyError):
+                        continue
+        except OSError as e:
+            print(f"Cassette Load Error: {e}")
+    
+    def lookup(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Find the recording of a request
+        
+        Args:
+            request: Keyword arguments passed to chat.completions.create
+        
+        Returns:
+            Recorded entry
+        
+        Raises:
+            CassetteMiss: If the request was never recorded
+        """
+        entry = self._entries.get(request_key(request))
+        if entry is None:
+            raise CassetteMiss(f"No recorded response in {self.path} for: {_user_message(request)[:80]!r}")
+        return entry
+    
+    def delay(self, entry: Dict[str, Any]) -> float:
+        """Seconds to wait before replaying an entry"""
+        if self.latency == "recorded":
+            return entry.get("latency_ms", 0) / 1000
+        try:
+            return max(float(self.latency), 0.0) / 1000
+        except ValueError:
+            return 0.0
+    
+    def record(self, request: Dict[str, Any], latency: float, response: Optional["ChatCompletion"] = None,
+               chunks: Optional[List["ChatCompletionChunk"]] = None):
+        """
+        Save a response, unless the request was already recorded
+        
+        Args:
+            request: Keyword arguments passed to chat.completions.create
+            latency: Seconds until the response (or the stream) was returned
+            response: Completion, for non-streamed requests
+            chunks: Chunks, for streamed requests
+        """
+        key = request_key(request)
+        entry = {"key": key, "query": _user_message(request)[:200], "latency_ms": round(latency * 1000, 1)}
+        if chunks is not None:
+            entry["chunks"] = [chunk.model_dump(mode="json", exclude_none=True) for chunk in chunks]
+        else:
+            entry["response"] = response.model_dump(mode="json", exclude_none=True)
+        
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = entry
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            except OSError as e:
+                print(f"Cassette Record Error: {e}")
+
+
+class _CassetteClient:
+    """Client wrapper exposing chat.completions through the cassette"""
+    
+    def __init__(self, client, completions):
+        self._client = client
+        self.chat = _Chat(completions)
+    
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class _Chat:
+    """Stand-in for client.chat"""
+    
+    def __init__(self, completions):
+        self.completions = completions
+
+
+class _Completions:
+    """Stand-in for client.chat.completions that records or replays create()"""
+    
+    def __init__(self, cassette: Cassette, client):
+        self.cassette = cassette
+        self.client = client
+    
+    def create(self, **request):
+        if self.cassette.replaying:
+            entry = self.cassette.lookup(request)
+            delay = self.cassette.delay(entry)
+            if delay:
+                time.sleep(delay)
+            return _replay(entry, ReplayStream)
+        
+        start = time.perf_counter()
+        response = self.client.chat.completions.create(**request)
+        latency = time.perf_counter() - start
+        
+        if request.get("stream"):
+            # Read the whole stream so the recording is complete even if the caller stops early
+            with response:
+                chunks = list(response)
+            self.cassette.record(request, latency, chunks=chunks)
+            return ReplayStream(chunks)
+        
+        self.cassette.record(request, latency, response=response)
+        return response
+
+
+class _AsyncCompletions(_Completions):
+    """Async version of _Completions"""
+    
+    async def create(self, **request):
+        if self.cassette.replaying:
+            entry = self.cassette.lookup(request)
+            delay = self.cassette.delay(entry)
+            if delay:
+                await asyncio.sleep(delay)
+            return _replay(entry, AsyncReplayStream)
+        
+        start = time.perf_counter()
+        response = await self.client.chat.completions.create(**request)
+        latency = time.perf_counter() - start
+        
+        if request.get("stream"):
+            try:
+                chunks = [chunk async for chunk in response]
+            finally:
+                await response.close()
+            self.cassette.record(request, latency, chunks=chunks)
+            return AsyncReplayStream(chunks)
+        
+        self.cassette.record(request, latency, response=response)
+        return response
+
+
+def _replay(entry: Dict[str, Any], stream_type):
+    """Rebuild a recorded response, or a stream of type stream_type over its chunks"""
+    # Imported here: openai.types is slow to import and only needed when a cassette is in use
+    from openai.types.chat import ChatCompletion, ChatCompletionChunk
+    
+    if "chunks" in entry:
+        return stream_type([ChatCompletionChunk.model_validate(chunk) for chunk in entry["chunks"]])
+    return ChatCompletion.model_validate(entry["response"])
+
+
+def _user_message(request: Dict[str, Any]) -> str:
+    """Text of the last user message in a request"""
+    for message in reversed(request.get("messages", [])):
+        if message.get("role") == "user":
+            return str(message.get("content") or "")
+    return ""
+
+
+# Process-wide cassette shared by every service
+cassette = Cassette()
@@ -0,0 +1,207 @@
+"""
+Azure OpenAI Clients - Shared connection pools
+One sync client and one async client per event loop, shared by every service,
+over keep-alive HTTP connection pools with configured limits and timeouts, with
+retries and circuit breaking handled by services/resilience.py and identical
+in-flight requests coalesced by services/single_flight.py
+
+openai and httpx take most of the chatbot's startup time to import, so they
+are imported when the first client is built rather than with this module.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, Dict, Any
+from services.async_utils import LoopLocal
+from services.cassette import cassette
+from services.resilience import resilience
+from services.single_flight import llm_flights
+import config
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AzureOpenAI, AsyncAzureOpenAI
+
+
+class ClientFactory:
+    """
+    Builds the Azure OpenAI clients used by LLMService and KnowledgeBaseService
+    
+    Every service gets the same client, so TLS sessions and idle connections
+    are reused across services instead of each keeping its own pool. Async
+    clients are bound to the event loop they are used on, so there is one
+    per loop. Clients are created on first use.
+    """
+    
+    def __init__(self, endpoint: Optional[str] = config.AZURE_OPENAI_ENDPOINT,
+                 api_key: Optional[str] = config.AZURE_OPENAI_KEY,
+                 api_version: str = config.AZURE_API_VERSION,
+                 max_connections: int = config.LLM_HTTP_MAX_CONNECTIONS,
+                 max_keepalive: int = config.LLM_HTTP_MAX_KEEPALIVE,
+                 keepalive_expiry: float = config.LLM_HTTP_KEEPALIVE_EXPIRY,
+                 connect_timeout: float = config.LLM_HTTP_CONNECT_TIMEOUT,
+                 timeout: float = config.LLM_HTTP_TIMEOUT):
+        """
+        Initialize the factory
+        
+        Args:
+            endpoint: Azure OpenAI endpoint URL
+            api_key: Azure OpenAI API key
+            api_version: Azure OpenAI API version
+            max_connections: Connections open at once per pool
+            max_keepalive: Idle connections kept open per pool
+            keepalive_expiry: Seconds an idle connection is kept open
+            connect_timeout: Seconds to establish a connection
+            timeout: Seconds to wait for a response (read, write and pool timeout)
+        """
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.api_version = api_version
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        
+        self._client = None
+        self._http: Optional["httpx.Client"] = None
+        self._lock = threading.Lock()
+        self._async_http = LoopLocal(self._new_async_http)
+        self._async_clients = LoopLocal(self._new_async_client)
+    
+    @property
+    def configured(self) -> bool:
+        """True if an endpoint and API key are set"""
+        return bool(self.endpoint and self.api_key)
+    
+    def client(self) -> "AzureOpenAI":
+        """
+        Get the shared sync client
+        
+        Returns:
+            AzureOpenAI client (wrapped by the resilience layer, single flight and the LLM cassette when enabled)
+        """
+        with self._lock:
+            if self._client is None:
+                from openai import AzureOpenAI, DefaultHttpxClient
+                
+                self._http = DefaultHttpxClient(**self._pool_options())
+                self._client = cassette.wrap(llm_flights.wrap(resilience.wrap(AzureOpenAI(
+                    azure_endpoint=self.endpoint,
+                    api_key=self.api_key,
+                    api_version=self.api_version,
+                    http_client=self._http,
+                    **self._retry_options()
+                ))))
+            return self._client
+    
+    def async_client(self) -> "AsyncAzureOpenAI":
+        """
+        Get the shared async client for the running event loop
+        
+        Returns:
+            AsyncAzureOpenAI client (wrapped by the resilience layer, single flight and the LLM cassette when enabled)
+        """
+        return self._async_clients.get()
+    
+    def warm_up(self, connections: int = config.LLM_HTTP_WARMUP_CONNECTIONS) -> int:
+        """
+        Open connections in the sync pool ahead of the first request
+        
+        Args:
+            connections: Connections to open concurrently
+        
+        Returns:
+            Number of connections that answered
+        """
+        if not self.configured or cassette.replaying or connections < 1:
+            return 0
+        
+        self.client()
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            results = list(pool.map(lambda _: self._ping(self._http), range(connections)))
+        return sum(results)
+    
+    async def awarm_up(self, connections: int = config.LLM_HTTP_WARMUP_CONNECTIONS) -> int:
+        """
+        Open connections in the running event loop's pool ahead of the first request
+        
+        Args:
+            connections: Connections to open concurrently
+        
+        Returns:
+            Number of connections that answered
+        """
+        if not self.configured or cassette.replaying or connections < 1:
+            return 0
+        
+        self.async_client()
+        http = self._async_http.get()
+        results = await asyncio.gather(*(self._aping(http) for _ in range(connections)))
+        return sum(results)
+    
+    def close(self):
+        """Close the sync client's connections"""
+        with self._lock:
+            if self._http is not None:
+                self._http.close()
+            self._client, self._http = None, None
+    
+    def _pool_options(self) -> Dict[str, Any]:
+        """Connection limits and timeouts for an httpx client"""
+        import httpx
+        
+        return {
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            "timeout": httpx.Timeout(self.timeout, connect=self.connect_timeout)
+        }
+    
+    @staticmethod
+    def _retry_options() -> Dict[str, Any]:
+        """Turn off the SDK's own retries when the resilience layer retries instead"""
+        return {"max_retries": 0} if resilience.enabled else {}
+    
+    def _new_async_http(self) -> "httpx.AsyncClient":
+        """Build the connection pool for the running event loop"""
+        from openai import DefaultAsyncHttpxClient
+        
+        return DefaultAsyncHttpxClient(**self._pool_options())
+    
+    def _new_async_client(self) -> "AsyncAzureOpenAI":
+        """Build the async client for the running event loop on its own connection pool"""
+        from openai import AsyncAzureOpenAI
+        
+        return cassette.wrap_async(llm_flights.wrap_async(resilience.wrap_async(AsyncAzureOpenAI(
+            azure_endpoint=self.endpoint,
+            api_key=self.api_key,
+            api_version=self.api_version,
+            http_client=self._async_http.get(),
+            **self._retry_options()
+        ))))
+    
+    def _ping(self, http: "httpx.Client") -> bool:
+        """Send one request to the endpoint; any HTTP response leaves a pooled connection"""
+        try:
+            http.head(self.endpoint)
+            return True
+        except Exception as e:
+            print(f"Client Warm-up Error: {e}")
+            return False
+    
+    async def _aping(self, http: "httpx.AsyncClient") -> bool:
+        """Async version of _ping"""
+        try:
+            await http.head(self.endpoint)
+            return True
+        except Exception as e:
+            print(f"Client Warm-up Error: {e}")
+            return False
+
+
+# Process-wide client factory shared by every service
+clients = ClientFactory()
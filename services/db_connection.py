@@ -0,0 +1,149 @@
+"""
+Database Connection Manager
+Persistent, thread-local SQLite connections tuned for the read-heavy inventory
+tier, plus one read-write connection for stock updates
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict
+import config
+
+
+class ConnectionManager:
+    """Hands out one persistent read-only connection per thread and a shared writer connection"""
+    
+    def __init__(self, db_path: str,
+                 mmap_size: int = config.SQLITE_MMAP_SIZE,
+                 cache_size_kb: int = config.SQLITE_CACHE_SIZE_KB,
+                 statement_cache: int = config.SQLITE_STATEMENT_CACHE,
+                 busy_timeout_ms: int = config.SQLITE_BUSY_TIMEOUT_MS):
+        """
+        Initialize the connection manager
+        
+        Args:
+            db_path: Path to the SQLite database
+            mmap_size: Bytes of the database file to memory-map per connection
+            cache_size_kb: Page cache size per connection in KiB
+            statement_cache: Number of prepared statements cached per connection
+            busy_timeout_ms: Milliseconds the writer waits for another process's write lock
+        """
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.statement_cache = statement_cache
+        self.busy_timeout_ms = busy_timeout_ms
+        
+        self._local = threading.local()
+        # Keyed by the owning Thread object: thread idents are reused once a thread exits
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._watcher_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+    
+    def reader(self) -> sqlite3.Connection:
+        """
+        Get the calling thread's read-only connection, opening it on first use
+        
+        Returns:
+            Persistent read-only sqlite3 connection
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open_reader()
+            self._local.conn = conn
+            with self._lock:
+                self._close_dead_threads()
+                self._connections[threading.current_thread()] = conn
+        return conn
+    
+    def writer(self) -> sqlite3.Connection:
+        """
+        Get the read-write connection, opening it on first use
+        
+        The connection is in autocommit mode so callers control transactions
+        with explicit BEGIN IMMEDIATE / COMMIT; it must only be used by one
+        thread at a time (the StockWriter thread).
+        
+        Returns:
+            Persistent read-write sqlite3 connection
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                conn = sqlite3.connect(
+                    self.db_path,
+                    isolation_level=None,
+                    check_same_thread=False,
+                    cached_statements=self.statement_cache
+                )
+                conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+                self._writer = conn
+            return self._writer
+    
+    def reset_writer(self):
+        """Close the read-write connection, e.g. after a failed rollback; the next writer() call reopens it"""
+        with self._writer_lock:
+            if self._writer is not None:
+                try:
+                    self._writer.close()
+                except Exception as e:
+                    print(f"Database Warning: could not close the writer connection: {e}")
+                self._writer = None
+    
+    def data_version(self) -> int:
+        """
+        Get the database change counter from a dedicated watcher connection
+        
+        Returns:
+            Value of PRAGMA data_version; it differs between two calls if the
+            database was modified by another connection in the interim
+        """
+        with self._watcher_lock:
+            if self._watcher is None:
+                self._watcher = self._open_reader()
+            return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+    
+    def close_all(self):
+        """Close every connection opened by this manager"""
+        with self._lock:
+            connections, self._connections = self._connections, {}
+        for conn in connections.values():
+            conn.close()
+        self._local = threading.local()
+        
+        with self._watcher_lock:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+        
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+    
+    def _close_dead_threads(self):
+        """Close connections owned by threads that have exited (caller holds the lock)"""
+        for thread in [thread for thread in self._connections if not thread.is_alive()]:
+            self._connections.pop(thread).close()
+    
+    def _open_reader(self) -> sqlite3.Connection:
+        """
+        Open a read-only connection with the read-optimized pragmas applied
+        
+        Each connection is only used by one thread at a time; same-thread
+        checks are disabled so close_all can close them from any thread.
+        """
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            check_same_thread=False,
+            cached_statements=self.statement_cache
+        )
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_size_kb)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
@@ -0,0 +1,325 @@
+"""
+Local Intent Classifier - Fast Path
+Deterministic keyword classifier that answers common queries without an LLM call
+"""
+
+import re
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Tuple
+
+
+# Phrases that identify each company information category
+COMPANY_KEYWORDS = {
+    "company_name": ["company name", "your name", "name of the company", "what is techgear", "who are you"],
+    "location": ["address", "located", "location", "where are you", "where is your", "find you"],
+    "office_hours": ["hours", "open", "opening times", "timings", "what time do you", "close on",
+                     "closing time"],
+    "delivery_policy": ["delivery", "deliver", "delivered", "shipping", "postage", "next day", "dispatch"],
+    "returns": ["return", "returning", "refund", "exchange"],
+    "contact": ["contact", "phone", "email", "telephone", "call you", "reach you", "support"],
+    "general_info": ["about the company", "about techgear", "company data", "company information",
+                     "company details", "tell me about"]
+}
+
+# Words that suggest an inventory question even when no product matched
+INVENTORY_HINTS = ["stock", "available", "availability", "in size", "how many", "price", "cost",
+                   "jacket", "hoodie", "tee", "t shirt", "shirt"]
+
+# Word sizes, checked longest first so "extra large" wins over "large"
+SIZE_WORDS = [
+    ("extra large", "XL"),
+    ("x large", "XL"),
+    ("small", "S"),
+    ("medium", "M"),
+    ("large", "L")
+]
+
+PRICE_PATTERN = re.compile(r"\b(price|prices|cost|costs|how much)\b")
+
+STOCK_PATTERN = re.compile(r"\b(stock|available|availability|how many|left)\b")
+
+# Asking whether a product is carried at all also counts as a stock question
+HAVE_PATTERN = re.compile(r"\b(do you have|have you got|got any)\b")
+
+# A follow-up ("and in large?", "how much is it?") may only use these words and
+# size words, so queries about anything else never inherit a previous product
+FOLLOW_UP_WORDS = set("""
+a about also an and any are available availability cost costs do does for got have how in instead is it its
+left many much of one ones please price prices same size sizes so stock that the them then there these they
+this those what whats s x xl m l extra small medium large you
+""".split())
+
+
+# Words a company question may use besides its category keywords. A keyword alone
+# is not enough: "when does tesco open" or "how do i return a library book" have
+# words outside this vocabulary and go to the LLM instead of getting our answer
+COMPANY_CONTEXT_WORDS = set("""
+a about after an and any anyone are at before can could cost costs day days do does for free from get give
+have how i if in info information is it long me monday tuesday wednesday thursday friday saturday sunday
+much my need number of on or our please policy policies s somebody someone store shop office take takes
+tell that the there time times to today tomorrow us we what whats when where which who will with would you
+your yours
+""".split())
+
+# Fraction of a query's words that must be keywords or COMPANY_CONTEXT_WORDS
+# before a company category is answered without the LLM
+MIN_COMPANY_COVERAGE = 0.8
+
+# Words that tie a question to the company. Without one, every word must be
+# company vocabulary: "how do i open a jar" is not asking about our hours
+COMPANY_ANCHOR_WORDS = {"you", "your", "yours", "we", "us", "our", "techgear", "company", "store", "shop",
+                        "office"}
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for matching: lowercase, punctuation to spaces, single spaces
+    
+    Args:
+        text: Raw text
+    
+    Returns:
+        Normalized text
+    """
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+class LocalIntentClassifier:
+    """Deterministic classifier for the high-volume stock and company questions"""
+    
+    def __init__(self, item_names: Iterable[str], company_fields: Iterable[str],
+                 sizes: Iterable[str] = ("S", "M", "L", "XL")):
+        """
+        Initialize the classifier from the catalog and knowledge base fields
+        
+        Args:
+            item_names: Product names from the inventory database
+            company_fields: Company information categories the KB can answer
+            sizes: Valid product sizes
+        """
+        self.sizes = [size.upper() for size in sizes]
+        self.company_keywords = {
+            category: [normalize_text(keyword) for keyword in keywords]
+            for category, keywords in COMPANY_KEYWORDS.items()
+            if category in set(company_fields) or category == "general_info"
+        }
+        self.company_vocabulary = COMPANY_CONTEXT_WORDS | {
+            word for keywords in self.company_keywords.values() for keyword in keywords for word in keyword.split()
+        }
+        self.set_item_names(item_names)
+        
+        # "in XL", "size M", "an XL": bare letters only count after a size cue
+        size_alternatives = "|".join(sorted((re.escape(s.lower()) for s in self.sizes), key=len, reverse=True))
+        self._size_pattern = re.compile(rf"\b(?:size|in|an|a)\s+({size_alternatives})\b")
+        self._xl_pattern = re.compile(r"\bxl\b")
+    
+    def set_item_names(self, item_names: Iterable[str]):
+        """
+        Rebuild the product name index, e.g. after the catalog changes
+        
+        Names are looked up by their normalized text, so matching a query
+        costs a few dictionary lookups per word however large the catalog is.
+        
+        Args:
+            item_names: Product names from the inventory database
+        """
+        index: Dict[str, str] = {}
+        longest = 0
+        for name in item_names:
+            normalized = normalize_text(name)
+            if normalized and normalized not in index:
+                index[normalized] = name
+                longest = max(longest, normalized.count(" ") + 1)
+        
+        # Swapped in one assignment, so concurrent classify() calls see the old or the new index
+        self._items: Tuple[Dict[str, str], int] = (index, longest)
+    
+    def classify(self, query: str) -> Dict[str, Any]:
+        """
+        Classify a query locally
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            Dictionary with 'tier', 'kb_category', 'inventory_calls', 'confident',
+            'hints' and 'unfamiliar'. When 'confident' is False the caller should
+            defer to the LLM; 'hints' lists the tiers the query showed any evidence
+            for. 'unfamiliar' is True when a company keyword appeared among words
+            company questions do not use ("when does tesco open"), so keyword
+            matching of any kind should not answer it.
+        """
+        text = normalize_text(query)
+        items = self._match_items(text)
+        categories = self._match_company_categories(text)
+        has_inventory_hint = bool(items) or any(
+            re.search(rf"\b{re.escape(hint)}", text) for hint in INVENTORY_HINTS
+        )
+        hints = [tier for tier, present in (("company_info", categories), ("inventory", has_inventory_hint)) if present]
+        
+        # Inventory: known products, a stock, price, size or "do you have" cue and
+        # no competing company topic. "Is the hoodie machine washable?" names a
+        # product but asks something else, so it goes to the LLM
+        if items and not categories and self._asks_inventory(text):
+            intent = "price" if PRICE_PATTERN.search(text) else "stock"
+            calls = []
+            for index, (start, name) in enumerate(items):
+                # With several products, each size belongs to the text up to the next product
+                if len(items) == 1:
+                    segment = text
+                else:
+                    end = items[index + 1][0] if index + 1 < len(items) else len(text)
+                    segment = text[start:end]
+                
+                arguments = {"item_name": name}
+                size = self._match_size(segment)
+                if size:
+                    arguments["size"] = size
+                arguments["intent"] = intent
+                calls.append(arguments)
+            return self._result("inventory", None, calls, True, hints)
+        
+        # Company information: exactly one category, nothing product-related and
+        # no more than a word or two the company questions do not use
+        unfamiliar = bool(categories) and not self._company_context(text)
+        if len(categories) == 1 and not has_inventory_hint and not unfamiliar:
+            return self._result("company_info", categories[0], [], True, hints)
+        
+        return self._result("unknown", None, [], False, hints, unfamiliar)
+    
+    def follow_up(self, query: str, previous_calls: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Resolve a follow-up question against the products of the previous turn
+        
+        "and in large?" or "how much is it?" name no product, so they reuse
+        the previous inventory_calls with the new size and/or intent. Only
+        short queries made of size, price, stock and pronoun words qualify.
+        
+        Args:
+            query: User's question
+            previous_calls: get_inventory arguments of the conversation's last inventory answer
+        
+        Returns:
+            Confident inventory routing result, or None if the query is not a follow-up
+        """
+        text = normalize_text(query)
+        if not previous_calls or not text or not set(text.split()) <= FOLLOW_UP_WORDS:
+            return None
+        
+        size = self._match_size(text)
+        asks_price = bool(PRICE_PATTERN.search(text))
+        asks_stock = bool(STOCK_PATTERN.search(text))
+        if not (size or asks_price or asks_stock):
+            return None
+        
+        calls = []
+        for previous in previous_calls:
+            arguments = {"item_name": previous["item_name"]}
+            if size or previous.get("size"):
+                arguments["size"] = size or previous["size"]
+            if asks_price:
+                arguments["intent"] = "price"
+            elif asks_stock:
+                arguments["intent"] = "stock"
+            else:
+                arguments["intent"] = previous.get("intent") or "stock"
+            calls.append(arguments)
+        return self._result("inventory", None, calls, True, ["inventory"])
+    
+    def _match_items(self, text: str) -> List[Tuple[int, str]]:
+        """Return (position, catalog name) for each product mentioned in the normalized text"""
+        index, longest = self._items
+        words = text.split()
+        offsets = []
+        position = 0
+        for word in words:
+            offsets.append(position)
+            position += len(word) + 1
+        
+        # Every run of words that is a catalog name: (name length, first word, end word, name)
+        found = []
+        for first in range(len(words)):
+            for end in range(first + 1, min(first + longest, len(words)) + 1):
+                head = " ".join(words[first:end - 1])
+                for last in self._singulars(words[end - 1]):
+                    key = f"{head} {last}" if head else last
+                    name = index.get(key)
+                    if name:
+                        found.append((len(key), first, end, name))
+                        break
+        
+        # Longest names first so "running tee" never shadows "dry fit running tee"
+        found.sort(key=lambda match: match[0], reverse=True)
+        taken: List[Tuple[int, int]] = []
+        spans = []
+        for _, first, end, name in found:
+            if not any(first < taken_end and taken_first < end for taken_first, taken_end in taken):
+                taken.append((first, end))
+                spans.append((offsets[first], name))
+        return sorted(spans)
+    
+    @staticmethod
+    def _singulars(word: str) -> Iterator[str]:
+        """Yield a word and, for simple plurals ("hoodies", "tees", "boxes"), its singular forms"""
+        yield word
+        if word.endswith("es") and len(word) > 2:
+            yield word[:-2]
+        if word.endswith("s") and len(word) > 1:
+            yield word[:-1]
+    
+    def _asks_inventory(self, text: str) -> bool:
+        """Whether the normalized text asks about stock, price or a size"""
+        return bool(STOCK_PATTERN.search(text) or PRICE_PATTERN.search(text)
+                    or HAVE_PATTERN.search(text) or self._match_size(text))
+    
+    def _company_context(self, text: str) -> bool:
+        """
+        Whether the normalized text reads like a question about the company
+        
+        Most of its words must be company vocabulary, and all of them unless one
+        refers to the company ("you", "your", "techgear", ...).
+        """
+        words = text.split()
+        if not words:
+            return False
+        coverage = sum(1 for word in words if word in self.company_vocabulary) / len(words)
+        if COMPANY_ANCHOR_WORDS.intersection(words):
+            return coverage >= MIN_COMPANY_COVERAGE
+        return coverage == 1.0
+    
+    def _match_size(self, text: str) -> Optional[str]:
+        """Return the size mentioned in the normalized text, if any"""
+        for word, size in SIZE_WORDS:
+            if size in self.sizes and re.search(rf"\b{word}\b", text):
+                return size
+        
+        match = self._size_pattern.search(text)
+        if match:
+            return match.group(1).upper()
+        
+        if "XL" in self.sizes and self._xl_pattern.search(text):
+            return "XL"
+        return None
+    
+    def _match_company_categories(self, text: str) -> List[str]:
+        """Return every company category with a keyword in the normalized text"""
+        # Whole words only (plurals allowed): "open" must not match "opening a jar"
+        padded = f" {text} "
+        return [
+            category
+            for category, keywords in self.company_keywords.items()
+            if any(f" {keyword} " in padded or f" {keyword}s " in padded or f" {keyword}es " in padded
+                   for keyword in keywords)
+        ]
+    
+    @staticmethod
+    def _result(tier: str, kb_category: Optional[str], inventory_calls: List[Dict[str, Any]],
+                confident: bool, hints: List[str], unfamiliar: bool = False) -> Dict[str, Any]:
+        """Build a routing result in the same shape as LLMService.route_intent"""
+        return {
+            "tier": tier,
+            "kb_category": kb_category,
+            "inventory_calls": inventory_calls,
+            "confident": confident,
+            "hints": hints,
+            "unfamiliar": unfamiliar
+        }
@@ -0,0 +1,144 @@
+"""
+Inventory Snapshot - In-memory index of product_inventory
+Array-backed columns keyed by normalized (item_name, size) for dictionary-speed lookups
+"""
+
+import sqlite3
+import sys
+from array import array
+from typing import Optional, Dict, List, Tuple, Iterable
+import config
+
+
+SNAPSHOT_SQL = f"SELECT item_name, size, stock_count, price_gbp FROM {config.DB_TABLE_NAME} ORDER BY id"
+
+# SQLite's NOCASE collation only folds ASCII letters ("É" and "é" stay different)
+_NOCASE_FOLD = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+# (row_count, stock_count, price_gbp) - stock_count is the total across all
+# matched rows, price_gbp is the price of the first matched row
+InventoryMatch = Tuple[int, int, float]
+
+
+def normalize_key(value: str) -> str:
+    """
+    Normalize an item name or size for lookups, matching the case-insensitive SQL comparison
+    
+    Args:
+        value: Raw item name or size
+    
+    Returns:
+        Value with ASCII letters lowercased, as COLLATE NOCASE compares it
+    """
+    return value.translate(_NOCASE_FOLD)
+
+
+class InventorySnapshot:
+    """Compact in-memory copy of the inventory table; only stock counts change in place"""
+    
+    def __init__(self, rows: Iterable[Tuple[str, str, int, float]]):
+        """
+        Build the snapshot from (item_name, size, stock_count, price_gbp) rows
+        
+        Rows are consumed as an iterator, so a cursor can be passed directly
+        without materializing the whole table as Python tuples.
+        
+        Args:
+            rows: Iterable of inventory rows, in table order
+        """
+        # Per-row columns
+        self.row_stock = array("q")
+        self.row_price = array("d")
+        self.row_item = array("l")
+        self._row_index: Dict[Tuple[str, str], int] = {}
+        
+        # Per-item columns and aggregates
+        self.item_names: List[str] = []
+        self.item_rows = array("l")
+        self.item_total_stock = array("q")
+        self.item_first_price = array("d")
+        self._item_index: Dict[str, int] = {}
+        
+        for item_name, size, stock_count, price_gbp in rows:
+            # Interned, so the row keys of an item share its key string instead of one copy per row
+            item_key = sys.intern(normalize_key(item_name))
+            item_id = self._item_index.get(item_key)
+            if item_id is None:
+                item_id = len(self.item_names)
+                self._item_index[item_key] = item_id
+                self.item_names.append(item_name)
+                self.item_rows.append(0)
+                self.item_total_stock.append(0)
+                self.item_first_price.append(float(price_gbp))
+            
+            row_key = (item_key, sys.intern(normalize_key(size)))
+            if row_key not in self._row_index:
+                self._row_index[row_key] = len(self.row_stock)
+                self.row_stock.append(int(stock_count))
+                self.row_price.append(float(price_gbp))
+                self.row_item.append(item_id)
+            
+            self.item_rows[item_id] += 1
+            self.item_total_stock[item_id] += int(stock_count)
+    
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> "InventorySnapshot":
+        """
+        Load a snapshot of the inventory table
+        
+        Args:
+            conn: Open connection to the inventory database
+        
+        Returns:
+            New InventorySnapshot
+        """
+        return cls(conn.execute(SNAPSHOT_SQL))
+    
+    def __len__(self) -> int:
+        """Number of (item_name, size) rows in the snapshot"""
+        return len(self.row_stock)
+    
+    def set_stock(self, item_name: str, size: str, stock_count: int) -> bool:
+        """
+        Record a committed stock change without reloading the table
+        
+        Args:
+            item_name: Name of the product
+            size: Size of the product
+            stock_count: Stock count after the change
+        
+        Returns:
+            True if the row is in the snapshot
+        """
+        row_id = self._row_index.get((normalize_key(item_name), normalize_key(size)))
+        if row_id is None:
+            return False
+        
+        item_id = self.row_item[row_id]
+        self.item_total_stock[item_id] += int(stock_count) - self.row_stock[row_id]
+        self.row_stock[row_id] = int(stock_count)
+        return True
+    
+    def find(self, item_name: str, size: Optional[str] = None) -> Optional[InventoryMatch]:
+        """
+        Look up an item, optionally for a single size
+        
+        Args:
+            item_name: Name of the product
+            size: Size of the product (optional)
+        
+        Returns:
+            (row_count, stock_count, price_gbp) or None if not found
+        """
+        item_key = normalize_key(item_name)
+        
+        if size:
+            row_id = self._row_index.get((item_key, normalize_key(size)))
+            if row_id is None:
+                return None
+            return 1, self.row_stock[row_id], self.row_price[row_id]
+        
+        item_id = self._item_index.get(item_key)
+        if item_id is None:
+            return None
+        return self.item_rows[item_id], self.item_total_stock[item_id], self.item_first_price[item_id]
@@ -1,40 +1,221 @@
 """
 Inventory Service - Tier 2
-Handles database queries for product inventory
+Handles database queries and stock updates for product inventory
 """
 
 import sqlite3
-from typing import Optional, Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple, Callable
+from services.db_connection import ConnectionManager
+from services.inventory_index import InventorySnapshot, InventoryMatch, normalize_key
+from services.name_index import NameIndex, NameMatch
+from services.stock_writer import StockWriter, FAILED
+from services.telemetry import telemetry
 import config
 
 
+# Query text is kept constant so each connection's prepared statement cache hits.
+# NOCASE comparisons match the (item_name, size) index created by setup_database.py.
+TABLE_EXISTS_SQL = "SELECT name FROM sqlite_master WHERE type='table' AND name=?"
+ITEM_NAMES_SQL = f"SELECT DISTINCT item_name FROM {config.DB_TABLE_NAME} ORDER BY item_name"
+ITEM_SIZE_SQL = f"""
+    SELECT item_name, size, stock_count, price_gbp 
+    FROM {config.DB_TABLE_NAME} 
+    WHERE item_name = ? COLLATE NOCASE AND size = ? COLLATE NOCASE
+"""
+ITEM_SQL = f"""
+    SELECT item_name, size, stock_count, price_gbp 
+    FROM {config.DB_TABLE_NAME} 
+    WHERE item_name = ? COLLATE NOCASE
+    ORDER BY id
+"""
+
+
 class InventoryService:
     """Service for handling inventory database queries"""
     
-    def __init__(self, db_path: str = config.INVENTORY_DB_PATH):
+    def __init__(self, db_path: str = config.INVENTORY_DB_PATH,
+                 use_snapshot: bool = config.INVENTORY_SNAPSHOT,
+                 fuzzy_matching: bool = config.FUZZY_NAME_MATCH,
+                 fuzzy_threshold: float = config.FUZZY_MATCH_THRESHOLD,
+                 refresh_interval: float = config.INVENTORY_REFRESH_INTERVAL_MS / 1000):
         """
         Initialize the Inventory Service
         
         Args:
             db_path: Path to the SQLite database
+            use_snapshot: Serve lookups from an in-memory snapshot of the table
+            fuzzy_matching: Resolve unknown product names to the closest catalog name
+            fuzzy_threshold: Lowest name match score (0-1) accepted as the same product
+            refresh_interval: Seconds between checks for changes made outside this service
         """
         self.db_path = db_path
+        self.connections = ConnectionManager(db_path)
         self._verify_database()
+        
+        # Fuzzy product name index, rebuilt only when the product names change
+        self.fuzzy_matching = fuzzy_matching
+        self.fuzzy_threshold = fuzzy_threshold
+        self._name_index: Optional[NameIndex] = None
+        self._name_index_lock = threading.Lock()
+        
+        # In-memory snapshot. Our own stock writes are applied to it in place;
+        # other changes to the database (PRAGMA data_version moves) reload it
+        # on a background thread, and lookups keep using the current snapshot
+        # until the new one is swapped in. The change counter is read at most
+        # once per refresh_interval, so lookups stay dictionary hits.
+        self.use_snapshot = use_snapshot
+        self.refresh_interval = refresh_interval
+        self._next_refresh = time.monotonic() + refresh_interval
+        self._snapshot: Optional[InventorySnapshot] = None
+        self._item_names: frozenset = frozenset()
+        self._reload_listeners: List[Callable[[Optional[List[str]]], None]] = []
+        self._reload_lock = threading.Lock()
+        self._reload_version = self.data_version()
+        self._reloading = False
+        self._reloader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inventory-reload")
+        self._writes_lock = threading.Lock()
+        self._writes_during_reload: Optional[List[Dict[str, Any]]] = None
+        self._reload()
+        
+        # Stock writes go through one writer thread, started on the first write
+        self.writer = StockWriter(self.connections, on_commit=self._apply_committed)
     
     def _verify_database(self):
         """Verify that the database exists and is accessible"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{config.DB_TABLE_NAME}'")
+            cursor = self.connections.reader().execute(TABLE_EXISTS_SQL, (config.DB_TABLE_NAME,))
             result = cursor.fetchone()
-            conn.close()
             
             if not result:
                 raise Exception(f"Table '{config.DB_TABLE_NAME}' not found in database")
         except sqlite3.Error as e:
             raise Exception(f"Database error: {e}")
     
+    def close(self):
+        """Commit queued stock updates and close all pooled database connections"""
+        self.writer.close()
+        self._reloader.shutdown(wait=True)
+        self.connections.close_all()
+    
+    def data_version(self) -> int:
+        """
+        Get the database change counter
+        
+        Returns:
+            Value of PRAGMA data_version; it differs between two calls if the
+            database was modified in the interim
+        """
+        return self.connections.data_version()
+    
+    def snapshot(self) -> InventorySnapshot:
+        """
+        Get the in-memory snapshot of the inventory table
+        
+        If the database has changed since the snapshot was loaded, a reload
+        is started in the background and the current snapshot is returned;
+        stock changes made through this service are already applied to it.
+        
+        Returns:
+            Current InventorySnapshot
+        """
+        self.refresh()
+        return self._snapshot
+    
+    def refresh(self) -> bool:
+        """
+        Start a background reload if the database changed since the last one
+        
+        The database is only asked for its change counter once per
+        refresh_interval; calls in between return False straight away.
+        
+        Returns:
+            True if the database had changed
+        """
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return False
+        self._next_refresh = now + self.refresh_interval
+        
+        version = self.data_version()
+        if version == self._reload_version:
+            return False
+        
+        with self._reload_lock:
+            if version == self._reload_version:
+                return False
+            self._reload_version = version
+            if not self._reloading:
+                self._reloading = True
+                self._reloader.submit(self._reload_until_current)
+        return True
+    
+    def add_reload_listener(self, listener: Callable[[Optional[List[str]]], None]):
+        """
+        Register a callback run on the reload thread after each background reload
+        
+        Args:
+            listener: Called with the sorted product names if they changed,
+                      or None if only other columns (e.g. stock) changed
+        """
+        self._reload_listeners.append(listener)
+    
+    def name_index(self) -> NameIndex:
+        """
+        Get the fuzzy index of the product names
+        
+        Returns:
+            Current NameIndex, rebuilt only when the product names change
+        """
+        self.refresh()
+        index = self._name_index
+        if index is not None:
+            return index
+        
+        with self._name_index_lock:
+            if self._name_index is None:
+                self._name_index = NameIndex(self.get_item_names())
+            return self._name_index
+    
+    def resolve_item_name(self, item_name: str) -> Optional[NameMatch]:
+        """
+        Resolve a near-miss product name ("Tech-Knit Hoodies", "running tee")
+        
+        Args:
+            item_name: Product name as extracted from the query
+        
+        Returns:
+            (canonical item name, confidence score) or None if fuzzy matching
+            is disabled or no catalog name matches confidently
+        """
+        if not self.fuzzy_matching or not item_name:
+            return None
+        return self.name_index().resolve(item_name, self.fuzzy_threshold)
+    
+    def get_item_names(self) -> List[str]:
+        """
+        Get the distinct product names in the inventory
+        
+        Returns:
+            List of product names as stored in the database
+        """
+        if self.use_snapshot:
+            return sorted(self.snapshot().item_names)
+        return self._query_item_names()
+    
+    def _query_item_names(self) -> List[str]:
+        """Read the distinct product names from the database"""
+        with telemetry.span("sqlite.item_names") as span:
+            try:
+                results = self.connections.reader().execute(ITEM_NAMES_SQL).fetchall()
+                return [row[0] for row in results]
+            except sqlite3.Error as e:
+                span.fail(e)
+                print(f"Inventory Error: {e}")
+                return []
+    
     def get_inventory(self, item_name: str, size: Optional[str] = None, intent: Optional[str] = None) -> str:
         """
         Query inventory database for product information
@@ -48,63 +229,310 @@ class InventoryService:
             Formatted response string
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            match = self._lookup(item_name, size)
             
-            # Build parameterised query
-            if size:
-                query = f"""
-                    SELECT item_name, size, stock_count, price_gbp 
-                    FROM {config.DB_TABLE_NAME} 
-                    WHERE LOWER(item_name) = LOWER(?) AND LOWER(size) = LOWER(?)
-                """
-                params = (item_name, size)
-            else:
-                query = f"""
-                    SELECT item_name, size, stock_count, price_gbp 
-                    FROM {config.DB_TABLE_NAME} 
-                    WHERE LOWER(item_name) = LOWER(?)
-                """
-                params = (item_name,)
+            if not match:
+                # Retry once under the closest catalog name
+                resolved = self.resolve_item_name(item_name)
+                if resolved:
+                    match = self._lookup(resolved[0], size)
             
-            cursor.execute(query, params)
-            results = cursor.fetchall()
-            conn.close()
-            
-            if not results:
+            if not match:
                 return config.FALLBACK_MESSAGE
             
-            # Handle intent-based responses
-            if intent == "price":
-                # Return price information
-                price = results[0][3]
-                return f"£{price:.2f}"
-            
-            # Handle stock queries
-            if size:
-                # Specific size requested
-                stock_count = results[0][2]
-                if stock_count > 0:
-                    return f"Yes ({stock_count} in stock)"
-                else:
-                    return "0 / Out of stock"
-            else:
-                # No size specified - return aggregate or first match
-                if len(results) == 1:
-                    stock_count = results[0][2]
-                    if stock_count > 0:
-                        return f"Yes ({stock_count} in stock)"
-                    else:
-                        return "0 / Out of stock"
-                else:
-                    # Multiple sizes available - return summary
-                    total_stock = sum(row[2] for row in results)
-                    if total_stock > 0:
-                        return f"Yes ({total_stock} in stock across all sizes)"
-                    else:
-                        return "0 / Out of stock"
+            return self._format_response(match, size, intent)
         
         except sqlite3.Error as e:
             return f"Database error: {e}"
         except Exception as e:
             return f"Error: {e}"
+    
+    def get_inventory_many(self, requests: List[Dict[str, Any]]) -> List[str]:
+        """
+        Query inventory for several products at once
+        
+        Uses a single pass over the in-memory snapshot, or a single SQL query
+        when the snapshot is disabled, instead of one lookup per product.
+        
+        Args:
+            requests: List of get_inventory argument dictionaries, each with
+                      'item_name' and optional 'size' and 'intent'
+        
+        Returns:
+            List of formatted response strings, in request order
+        """
+        try:
+            keys = [(request.get("item_name") or "", request.get("size")) for request in requests]
+            matches = self._lookup_many(keys)
+            
+            # Retry the misses under their closest catalog names in one more pass
+            retries = {}
+            for position, (item_name, size) in enumerate(keys):
+                resolved = self.resolve_item_name(item_name) if matches[position] is None else None
+                if resolved:
+                    retries[position] = (resolved[0], size)
+            if retries:
+                for position, match in zip(retries, self._lookup_many(list(retries.values()))):
+                    matches[position] = match
+            
+            return [
+                self._format_response(match, request.get("size"), request.get("intent"))
+                if match else config.FALLBACK_MESSAGE
+                for request, match in zip(requests, matches)
+            ]
+        
+        except sqlite3.Error as e:
+            return [f"Database error: {e}"] * len(requests)
+        except Exception as e:
+            return [f"Error: {e}"] * len(requests)
+    
+    def reserve(self, item_name: str, size: str, quantity: int = 1) -> Dict[str, Any]:
+        """
+        Take stock of one product size, unless fewer than quantity are left
+        
+        Args:
+            item_name: Name of the product
+            size: Size of the product
+            quantity: Number of items to reserve
+        
+        Returns:
+            Dictionary with 'item_name', 'size', 'delta', 'status' and
+            'stock_count' (see apply_stock_updates); status is
+            'insufficient_stock' when the reservation would oversell
+        
+        Raises:
+            ValueError: If quantity is not a positive integer
+        """
+        if not isinstance(quantity, int) or quantity < 1:
+            raise ValueError(f"Quantity must be a positive integer, got {quantity!r}")
+        return self.apply_stock_updates([{"item_name": item_name, "size": size, "delta": -quantity}])[0]
+    
+    def apply_stock_updates(self, updates: List[Dict[str, Any]], atomic: bool = False) -> List[Dict[str, Any]]:
+        """
+        Apply a batch of stock changes
+        
+        Updates from concurrent callers are group-committed in one short
+        BEGIN IMMEDIATE transaction. An update that would take stock below
+        zero is not applied and reported as 'insufficient_stock'.
+        
+        Args:
+            updates: List of dictionaries with 'item_name', 'size' and 'delta'
+                     (negative to take stock, positive to restock)
+            atomic: Apply all of the updates or, if any conflicts, none of them
+        
+        Returns:
+            One dictionary per update with 'item_name', 'size', 'delta', 'status'
+            ('applied', 'insufficient_stock', 'not_found', 'rolled_back' or
+            'failed') and 'stock_count' (after the update, or the current count
+            when it was not applied; None if unknown)
+        """
+        if not updates:
+            return []
+        
+        try:
+            return self.writer.apply(updates, atomic)
+        except ValueError:
+            raise
+        except Exception as e:
+            print(f"Inventory Write Error: {e}")
+            return [
+                {"item_name": update.get("item_name"), "size": update.get("size"), "delta": update.get("delta"),
+                 "status": FAILED, "stock_count": None}
+                for update in updates
+            ]
+    
+    def _reload_until_current(self):
+        """Reload thread: reload until no change arrived during the last reload"""
+        while True:
+            with self._reload_lock:
+                version = self._reload_version
+            try:
+                self._reload()
+            except Exception as e:
+                print(f"Inventory Reload Error: {e}")
+            
+            with self._reload_lock:
+                if version == self._reload_version:
+                    self._reloading = False
+                    return
+    
+    def _reload(self):
+        """Load the snapshot and product names, rebuilding name structures only if the names changed"""
+        if self.use_snapshot:
+            # Writes committed while the table is read are re-applied to the new snapshot
+            with self._writes_lock:
+                self._writes_during_reload = []
+            try:
+                with telemetry.span("sqlite.load_snapshot") as span:
+                    snapshot = InventorySnapshot.load(self.connections.reader())
+                    span.set(rows=len(snapshot))
+                with self._writes_lock:
+                    for result in self._writes_during_reload:
+                        snapshot.set_stock(result["item_name"], result["size"], result["stock_count"])
+                    self._snapshot = snapshot
+            finally:
+                with self._writes_lock:
+                    self._writes_during_reload = None
+            item_names = snapshot.item_names
+        else:
+            item_names = self._query_item_names()
+        
+        names = frozenset(item_names)
+        names_changed = names != self._item_names
+        self._item_names = names
+        if names_changed and self._name_index is not None:
+            index = NameIndex(sorted(item_names)) if self.fuzzy_matching else None
+            with self._name_index_lock:
+                self._name_index = index
+        
+        for listener in self._reload_listeners:
+            try:
+                listener(sorted(item_names) if names_changed else None)
+            except Exception as e:
+                print(f"Inventory Reload Error: {e}")
+    
+    def _apply_committed(self, results: List[Dict[str, Any]]):
+        """Writer thread: apply committed stock counts to the snapshot in place"""
+        # Check the change counter on the next refresh, so cached answers are dropped now
+        self._next_refresh = 0.0
+        with self._writes_lock:
+            snapshot = self._snapshot
+            if snapshot is not None:
+                for result in results:
+                    snapshot.set_stock(result["item_name"], result["size"], result["stock_count"])
+            if self._writes_during_reload is not None:
+                self._writes_during_reload.extend(results)
+    
+    def _lookup(self, item_name: str, size: Optional[str]) -> Optional[InventoryMatch]:
+        """
+        Look up an item in the snapshot, or the database if snapshots are disabled
+        
+        Args:
+            item_name: Name of the product
+            size: Size of the product (optional)
+        
+        Returns:
+            (row_count, stock_count, price_gbp) or None if not found
+        """
+        if self.use_snapshot:
+            return self.snapshot().find(item_name, size)
+        return self._query_database(item_name, size)
+    
+    def _lookup_many(self, keys: List[Tuple[str, Optional[str]]]) -> List[Optional[InventoryMatch]]:
+        """
+        Look up several (item_name, size) pairs in one snapshot pass or one query
+        
+        Args:
+            keys: List of (item_name, size) tuples; size may be None
+        
+        Returns:
+            List of (row_count, stock_count, price_gbp) or None, in key order
+        """
+        if self.use_snapshot:
+            snapshot = self.snapshot()
+            return [snapshot.find(item_name, size) if item_name else None for item_name, size in keys]
+        return self._query_database_many(keys)
+    
+    def _query_database_many(self, keys: List[Tuple[str, Optional[str]]]) -> List[Optional[InventoryMatch]]:
+        """
+        Look up several (item_name, size) pairs with one database query
+        
+        Args:
+            keys: List of (item_name, size) tuples; size may be None
+        
+        Returns:
+            List of (row_count, stock_count, price_gbp) or None, in key order
+        """
+        names = sorted({normalize_key(item_name) for item_name, _ in keys if item_name})
+        if not names:
+            return [None] * len(keys)
+        
+        placeholders = ", ".join("?" for _ in names)
+        query = f"""
+            SELECT item_name, size, stock_count, price_gbp 
+            FROM {config.DB_TABLE_NAME} 
+            WHERE item_name COLLATE NOCASE IN ({placeholders})
+            ORDER BY id
+        """
+        with telemetry.span("sqlite.query_items", items=len(names)) as span:
+            rows = self.connections.reader().execute(query, names).fetchall()
+            span.set(rows=len(rows))
+        
+        # Group rows by name as COLLATE NOCASE compares it, keeping table order within each item
+        rows_by_item: Dict[str, List[Tuple]] = {}
+        for row in rows:
+            rows_by_item.setdefault(normalize_key(row[0]), []).append(row)
+        
+        matches = []
+        for item_name, size in keys:
+            results = rows_by_item.get(normalize_key(item_name), []) if item_name else []
+            if size:
+                results = [row for row in results if normalize_key(row[1]) == normalize_key(size)][:1]
+            
+            if not results:
+                matches.append(None)
+            elif size:
+                matches.append((1, results[0][2], results[0][3]))
+            else:
+                matches.append((len(results), sum(row[2] for row in results), results[0][3]))
+        return matches
+    
+    def _query_database(self, item_name: str, size: Optional[str] = None) -> Optional[InventoryMatch]:
+        """
+        Look up an item directly in the database
+        
+        Args:
+            item_name: Name of the product
+            size: Size of the product (optional)
+        
+        Returns:
+            (row_count, stock_count, price_gbp) or None if not found; stock_count
+            is the total across all matched rows
+        """
+        # Parameterised query on this thread's persistent read-only connection
+        if size:
+            query, params = ITEM_SIZE_SQL, (item_name, size)
+        else:
+            query, params = ITEM_SQL, (item_name,)
+        
+        with telemetry.span("sqlite.query_item") as span:
+            results = self.connections.reader().execute(query, params).fetchall()
+            span.set(rows=len(results))
+        
+        if not results:
+            return None
+        
+        if size:
+            return 1, results[0][2], results[0][3]
+        return len(results), sum(row[2] for row in results), results[0][3]
+    
+    @staticmethod
+    def _format_response(match: InventoryMatch, size: Optional[str], intent: Optional[str]) -> str:
+        """
+        Format a lookup result as a customer-facing answer
+        
+        Args:
+            match: (row_count, stock_count, price_gbp) lookup result
+            size: Size that was requested (optional)
+            intent: Query intent - "stock" or "price" (optional)
+        
+        Returns:
+            Formatted response string
+        """
+        row_count, stock_count, price = match
+        
+        # Handle intent-based responses
+        if intent == "price":
+            # Return price information
+            return f"£{price:.2f}"
+        
+        # Handle stock queries
+        if stock_count <= 0:
+            return "0 / Out of stock"
+        
+        if size or row_count == 1:
+            # Specific size requested, or only one size stocked
+            return f"Yes ({stock_count} in stock)"
+        
+        # Multiple sizes available - return summary
+        return f"Yes ({stock_count} in stock across all sizes)"
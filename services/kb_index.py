@@ -0,0 +1,241 @@
+"""
+Knowledge Base Index - Local retrieval for Tier 1
+Parses the knowledge base file and ranks its entries against a query with BM25
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import Optional, Dict, List, Set, Tuple
+
+
+# Words that carry no information about which entry a query is after
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "as", "at", "be", "can", "do", "does", "for", "from", "have",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "please", "the", "to", "u", "we",
+    "what", "whats", "which", "you", "your", "yours"
+}
+
+# Extra words customers use for each entry, beyond the words in its key and value
+FIELD_ALIASES = {
+    "company_name": ["company", "name", "called", "who", "business", "brand"],
+    "location": ["address", "located", "where", "find", "shop", "store", "office", "directions", "postcode"],
+    "office_hours": ["hours", "open", "opening", "close", "closing", "time", "times", "when", "timings"],
+    "delivery_policy": ["delivery", "deliver", "shipping", "ship", "postage", "dispatch", "arrive", "long"],
+    "returns": ["return", "refund", "exchange", "send", "back", "money"],
+    "contact": ["contact", "phone", "email", "telephone", "call", "reach", "support", "number"],
+    "general_info": ["about", "company", "techgear", "information", "info", "data", "details", "overview"]
+}
+
+# Entries a term may appear in, as a fraction of all entries, before it is skipped in search
+COMMON_TERM_RATIO = 0.5
+
+# Fraction of a query's terms the index must know before best() names an entry, so a
+# single alias ("who") does not answer an unrelated question ("who is the prime minister")
+MIN_QUERY_COVERAGE = 0.5
+
+
+def field_key(label: str) -> str:
+    """
+    Convert a knowledge base label to its field key ("Office Hours" -> "office_hours")
+    
+    Args:
+        label: Label text before the colon
+    
+    Returns:
+        Snake-case field key
+    """
+    return "_".join(re.findall(r"[a-z0-9]+", label.lower()))
+
+
+def parse_knowledge_base(text: str) -> Dict[str, str]:
+    """
+    Parse "Label: value" lines into a field dictionary
+    
+    Lines without a colon (such as the title) and lines starting with '#'
+    are ignored; a repeated label keeps its last value.
+    
+    Args:
+        text: Knowledge base file contents
+    
+    Returns:
+        Dictionary of field key -> value, in file order
+    """
+    entries = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or ":" not in line:
+            continue
+        
+        label, value = line.split(":", 1)
+        key = field_key(label)
+        if key and value.strip():
+            entries[key] = value.strip()
+    return entries
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into index terms: lowercase words without stopwords or plural 's'
+    
+    Args:
+        text: Raw text
+    
+    Returns:
+        List of terms
+    """
+    terms = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+class KBIndex:
+    """
+    Inverted index over knowledge base entries, scored with BM25
+    
+    Each entry is indexed under its key, its aliases and its value. Entries
+    can be added, changed and removed individually, so a reload only
+    re-indexes the entries that changed, and a query only touches the
+    postings of its own terms.
+    """
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize an empty index
+        
+        Args:
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._texts: Dict[str, str] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        
+        # Updates mutate the postings in place, so searches must not interleave with them
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        """Number of indexed entries"""
+        return len(self._texts)
+    
+    def update(self, entries: Dict[str, str]) -> int:
+        """
+        Make the index match a new set of entries
+        
+        Args:
+            entries: Dictionary of field key -> value
+        
+        Returns:
+            Number of entries added, changed or removed
+        """
+        changed = 0
+        with self._lock:
+            for key in [key for key in self._texts if key not in entries]:
+                self._remove(key)
+                changed += 1
+            
+            for key, value in entries.items():
+                if self._texts.get(key) == value:
+                    continue
+                if key in self._texts:
+                    self._remove(key)
+                self._add(key, value)
+                changed += 1
+        return changed
+    
+    def search(self, query: str, limit: int = 3) -> List[Tuple[str, float]]:
+        """
+        Rank entries against a query
+        
+        Args:
+            query: User's question
+            limit: Maximum number of results
+        
+        Returns:
+            List of (field key, BM25 score), best first
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            return self._score(terms, limit)
+    
+    def best(self, query: str) -> Optional[Tuple[str, float]]:
+        """
+        Find the single entry a query is about
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            (field key, confidence) or None if nothing matched or at most
+            MIN_QUERY_COVERAGE of the query's terms are known to the index.
+            Confidence is 1 - runner-up score / top score: 1.0 when only one
+            entry matched, near 0 when the query matches two entries equally
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            known = sum(1 for term in terms if term in self._postings)
+            if known <= len(terms) * MIN_QUERY_COVERAGE:
+                return None
+            results = self._score(terms, limit=2)
+        
+        if not results:
+            return None
+        
+        top_key, top_score = results[0]
+        runner_up = results[1][1] if len(results) > 1 else 0.0
+        return top_key, 1 - runner_up / top_score
+    
+    def _score(self, terms: Set[str], limit: int) -> List[Tuple[str, float]]:
+        """BM25-rank the entries for a set of query terms (caller holds the lock)"""
+        if not self._texts:
+            return []
+        
+        scores: Dict[str, float] = {}
+        count = len(self._texts)
+        average_length = self._total_length / count
+        matched = [self._postings[term] for term in terms if term in self._postings]
+        for postings in matched:
+            # Terms in most entries barely move the ranking but cost a pass
+            # over a long postings list, so skip them if rarer terms matched
+            if len(postings) > count * COMMON_TERM_RATIO and len(matched) > 1 and count >= 100:
+                continue
+            
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[key] / average_length)
+                scores[key] = scores.get(key, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+    
+    def _add(self, key: str, value: str):
+        """Index one entry under its key words, aliases and value"""
+        terms = self._terms(key, value)
+        for term, frequency in Counter(terms).items():
+            self._postings.setdefault(term, {})[key] = frequency
+        self._texts[key] = value
+        self._lengths[key] = len(terms)
+        self._total_length += len(terms)
+    
+    def _remove(self, key: str):
+        """Remove one entry from the index"""
+        for term in set(self._terms(key, self._texts[key])):
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+        del self._texts[key]
+        self._total_length -= self._lengths.pop(key)
+    
+    @staticmethod
+    def _terms(key: str, value: str) -> List[str]:
+        """Index terms of an entry: its key words, aliases and value"""
+        return tokenize(key.replace("_", " ")) + tokenize(" ".join(FIELD_ALIASES.get(key, []))) + tokenize(value)
@@ -3,39 +3,191 @@ Knowledge Base Service - Tier 1 (Enhanced with Semantic Matching)
 Handles company information queries using structured metadata and intelligent matching
 """
 
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Optional, Dict, Any
-from openai import AzureOpenAI
+from services.clients import clients
+from services.kb_index import KBIndex, parse_knowledge_base
+from services.label_codes import label_codes, code_prompt, constrained_options
+from services.streaming import read_label, aread_label, USAGE_STREAM_OPTIONS
+from services.telemetry import telemetry
 import config
 
 
+# Company information categories the knowledge base can answer
+COMPANY_CATEGORIES = [
+    'company_name', 'location', 'office_hours', 'delivery_policy',
+    'returns', 'contact', 'general_info'
+]
+
+# Every label the classifier may answer with, including the negative one
+CLASSIFICATION_LABELS = COMPANY_CATEGORIES + ['not_company']
+
+# System prompt for company information classification
+COMPANY_CLASSIFICATION_PROMPT = """You are a query classifier for TechGear UK company information.
+Classify the user query into ONE of these categories:
+- company_name: asking about company name, what is the company, company identity
+- location: asking about address, location, where located, where are you
+- office_hours: asking about opening hours, timings, when open, office hours
+- delivery_policy: asking about delivery, shipping, how long delivery takes
+- returns: asking about return policy, refunds, returning items
+- contact: asking about contact details, phone, email, how to reach
+- general_info: broad questions like "about the company", "company data", "tell me about techgear"
+- not_company: not asking about company information
+
+Respond with ONLY the category name, nothing else."""
+
+# Constrained mode: the classifier answers with a single-digit code instead of the category
+CATEGORY_CODES = label_codes(CLASSIFICATION_LABELS)
+COMPANY_CODE_PROMPT = code_prompt("Which company information, if any, is the user message asking for?", {
+    "company_name": "company name, what is the company, company identity",
+    "location": "address, location, where located, where are you",
+    "office_hours": "opening hours, timings, when open, office hours",
+    "delivery_policy": "delivery, shipping, how long delivery takes",
+    "returns": "return policy, refunds, returning items",
+    "contact": "contact details, phone, email, how to reach",
+    "general_info": "broad questions like \"about the company\", \"company data\", \"tell me about techgear\"",
+    "not_company": "not asking about company information"
+}, CATEGORY_CODES)
+
+
 class KnowledgeBaseService:
     """Service for handling knowledge base queries with semantic understanding"""
     
-    def __init__(self):
-        """Initialize the Knowledge Base Service with structured company data"""
-        
-        # Structured company metadata
-        self.company_data = {
-            "company_name": "TechGear UK",
-            "location": "124 High Street, London, EC1A 1BB",
-            "office_hours": "Monday to Friday, 09:00 - 18:00. Saturday, 10:00 - 16:00.",
-            "delivery_policy": "Standard delivery takes 3-5 working days. Next-day delivery is available for £5.99.",
-            "returns": "Items can be returned within 30 days of purchase with a valid receipt.",
-            "contact": "Support can be reached at support@techgear.co.uk or 020 7946 0000."
-        }
+    def __init__(self, kb_path: Path = config.KNOWLEDGE_BASE_PATH,
+                 local_retrieval: bool = config.KB_LOCAL_RETRIEVAL,
+                 retrieval_confidence: float = config.KB_RETRIEVAL_CONFIDENCE,
+                 reload_interval: float = config.KB_RELOAD_INTERVAL):
+        """
+        Initialize the Knowledge Base Service from the knowledge base file
         
-        # Initialize Azure OpenAI client for semantic classification
-        if config.AZURE_OPENAI_ENDPOINT and config.AZURE_OPENAI_KEY:
-            self.client = AzureOpenAI(
-                azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
-                api_key=config.AZURE_OPENAI_KEY,
-                api_version=config.AZURE_API_VERSION
-            )
+        Args:
+            kb_path: Path to the "Label: value" knowledge base file
+            local_retrieval: Answer confidently matched queries from the local index
+            retrieval_confidence: Lowest retrieval confidence (0-1) answered without the LLM
+            reload_interval: Seconds between checks of the file for changes
+        """
+        self.kb_path = Path(kb_path)
+        self.local_retrieval = local_retrieval
+        self.retrieval_confidence = retrieval_confidence
+        
+        # Structured company metadata and its retrieval index, reloaded when the file changes
+        self.company_data: Dict[str, str] = {}
+        self.index = KBIndex()
+        self._mtime = None
+        self._reload_lock = threading.Lock()
+        self.reload()
+        
+        # Queries only start a background check of the file, at most once per interval
+        self.reload_interval = reload_interval
+        self._next_check = time.monotonic() + reload_interval
+        self._check_lock = threading.Lock()
+        self._reloader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-reload")
+        
+        # Azure OpenAI client for semantic classification, shared with the other services
+        if clients.configured:
+            self.client = clients.client()
             self.model = config.AZURE_DEPLOYMENT_NAME
+            self.constrained_classification = config.CONSTRAINED_CLASSIFICATION
+            # A one-token answer gains nothing from streaming
+            self.stream_classification = config.STREAM_CLASSIFICATION and not self.constrained_classification
         else:
             self.client = None
             self.model = None
     
+    def reload(self) -> bool:
+        """
+        Reload the knowledge base if the file changed since it was last read
+        
+        Only entries whose text changed are re-indexed. If the file cannot be
+        read, the previously loaded data is kept.
+        
+        Returns:
+            True if the file was (re)loaded
+        """
+        try:
+            mtime = self.kb_path.stat().st_mtime_ns
+            if mtime == self._mtime:
+                return False
+            
+            with self._reload_lock, telemetry.span("kb.reload") as span:
+                if mtime == self._mtime:
+                    return False
+                
+                company_data = parse_knowledge_base(self.kb_path.read_text(encoding="utf-8"))
+                
+                # Broad "about the company" questions are answered with a summary
+                span.set(changed=self.index.update({**company_data, "general_info": ""}))
+                self.company_data = company_data
+                self._mtime = mtime
+                return True
+        
+        except OSError as e:
+            print(f"KB Load Error: {e}")
+            return False
+    
+    def refresh(self) -> bool:
+        """
+        Start a background reload check if the last one is older than the reload interval
+        
+        Queries keep using the loaded data until the reload finishes.
+        
+        Returns:
+            True if a check was started
+        """
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        
+        with self._check_lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.reload_interval
+            self._reloader.submit(self.reload)
+        return True
+    
+    def close(self):
+        """Wait for a running reload and stop the reload thread"""
+        self._reloader.shutdown(wait=True)
+    
+    def retrieve(self, query: str) -> Optional[str]:
+        """
+        Answer a company query from the local index, without an LLM call
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            Answer string if one entry matches with high confidence, None otherwise
+        """
+        if not self.local_retrieval:
+            return None
+        
+        self.refresh()
+        with telemetry.span("kb.retrieve") as span:
+            match = self.index.best(query)
+            if not match or match[1] < self.retrieval_confidence:
+                return None
+            span.set(kb_category=match[0], confidence=round(match[1], 3))
+            return self._generate_company_response(match[0], query)
+    
+    async def aretrieve(self, query: str) -> Optional[str]:
+        """
+        Async version of retrieve, searching the index on a worker thread
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            Answer string if one entry matches with high confidence, None otherwise
+        """
+        if not self.local_retrieval:
+            return None
+        return await asyncio.to_thread(self.retrieve, query)
+    
     def _classify_company_query(self, query: str) -> Optional[str]:
         """
         Use LLM to classify what type of company information is being requested
@@ -50,45 +202,100 @@ class KnowledgeBaseService:
         if not self.client:
             return None
         
-        try:
-            # System prompt for classification
-            system_prompt = """You are a query classifier for TechGear UK company information.
-Classify the user query into ONE of these categories:
-- company_name: asking about company name, what is the company, company identity
-- location: asking about address, location, where located, where are you
-- office_hours: asking about opening hours, timings, when open, office hours
-- delivery_policy: asking about delivery, shipping, how long delivery takes
-- returns: asking about return policy, refunds, returning items
-- contact: asking about contact details, phone, email, how to reach
-- general_info: broad questions like "about the company", "company data", "tell me about techgear"
-- not_company: not asking about company information
-
-Respond with ONLY the category name, nothing else."""
-
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ]
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0,
-                max_tokens=20
-            )
+        with telemetry.span("kb.classify_company_query", model=self.model, streamed=self.stream_classification,
+                            constrained=self.constrained_classification) as span:
+            try:
+                request = self._classification_request(query)
+                
+                # Streaming mode stops reading as soon as the label is unambiguous or,
+                # with telemetry on, at the token usage chunk that ends the stream
+                if self.stream_classification:
+                    on_usage = span.record_usage if telemetry.enabled else None
+                    if on_usage:
+                        request.update(USAGE_STREAM_OPTIONS)
+                    stream = self.client.chat.completions.create(stream=True, **request)
+                    return self._valid_category(read_label(stream, CLASSIFICATION_LABELS, on_usage))
+                
+                response = self.client.chat.completions.create(**request)
+                span.record_usage(response)
+                return self._parse_classification(response)
             
-            classification = response.choices[0].message.content.strip().lower()
-            
-            # Return classification if it's a valid company info type
-            if classification in ['company_name', 'location', 'office_hours', 'delivery_policy', 
-                                 'returns', 'contact', 'general_info']:
-                return classification
-            
-            return None
+            except Exception as e:
+                span.fail(e)
+                print(f"KB Classification Error: {e}")
+                return None
+    
+    async def _aclassify_company_query(self, query: str) -> Optional[str]:
+        """
+        Async version of _classify_company_query
+        
+        Args:
+            query: User's question
         
-        except Exception as e:
-            print(f"KB Classification Error: {e}")
+        Returns:
+            Company information category, or None
+        """
+        if not self.client:
             return None
+        
+        with telemetry.span("kb.classify_company_query", model=self.model, streamed=self.stream_classification,
+                            constrained=self.constrained_classification) as span:
+            try:
+                client = clients.async_client()
+                request = self._classification_request(query)
+                
+                if self.stream_classification:
+                    on_usage = span.record_usage if telemetry.enabled else None
+                    if on_usage:
+                        request.update(USAGE_STREAM_OPTIONS)
+                    stream = await client.chat.completions.create(stream=True, **request)
+                    return self._valid_category(await aread_label(stream, CLASSIFICATION_LABELS, on_usage))
+                
+                response = await client.chat.completions.create(**request)
+                span.record_usage(response)
+                return self._parse_classification(response)
+            
+            except Exception as e:
+                span.fail(e)
+                print(f"KB Classification Error: {e}")
+                return None
+    
+    def _classification_request(self, query: str) -> Dict[str, Any]:
+        """Build the chat completion arguments for company query classification"""
+        if self.constrained_classification:
+            return {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": COMPANY_CODE_PROMPT},
+                    {"role": "user", "content": query}
+                ],
+                "temperature": 0,
+                **constrained_options(CATEGORY_CODES)
+            }
+        
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": COMPANY_CLASSIFICATION_PROMPT},
+                {"role": "user", "content": query}
+            ],
+            "temperature": 0,
+            "max_tokens": 20
+        }
+    
+    @staticmethod
+    def _parse_classification(response) -> Optional[str]:
+        """Extract and validate the company category (or its code) from a classification response"""
+        classification = response.choices[0].message.content.strip().lower()
+        return KnowledgeBaseService._valid_category(CATEGORY_CODES.get(classification, classification))
+    
+    @staticmethod
+    def _valid_category(classification: Optional[str]) -> Optional[str]:
+        """Return the classification if it's a valid company info type, None otherwise"""
+        if classification in COMPANY_CATEGORIES:
+            return classification
+        
+        return None
     
     def _generate_company_response(self, classification: str, query: str) -> str:
         """
@@ -101,34 +308,39 @@ Respond with ONLY the category name, nothing else."""
         Returns:
             Formatted response string
         """
-        # Direct field responses
-        if classification == "company_name":
-            return self.company_data["company_name"]
-        
-        elif classification == "location":
-            return self.company_data["location"]
-        
-        elif classification == "office_hours":
-            return self.company_data["office_hours"]
-        
-        elif classification == "delivery_policy":
-            return self.company_data["delivery_policy"]
+        company_data = self.company_data
         
-        elif classification == "returns":
-            return self.company_data["returns"]
-        
-        elif classification == "contact":
-            return self.company_data["contact"]
-        
-        elif classification == "general_info":
+        if classification == "general_info":
             # Generate comprehensive company summary for broad queries
+            if not all(field in company_data for field in ("company_name", "location", "office_hours", "contact")):
+                return None
             return (
-                f"{self.company_data['company_name']} is located at {self.company_data['location']}. "
-                f"We are open {self.company_data['office_hours']} "
-                f"For support, contact {self.company_data['contact'].replace('Support can be reached at ', '')}"
+                f"{company_data['company_name']} is located at {company_data['location']}. "
+                f"We are open {company_data['office_hours']} "
+                f"For support, contact {company_data['contact'].replace('Support can be reached at ', '')}"
             )
         
-        return None
+        # Direct field responses, for every field in the knowledge base file
+        return company_data.get(classification)
+    
+    def answer_category(self, category: Optional[str], query: str) -> Optional[str]:
+        """
+        Answer a company query whose category has already been classified
+        
+        Used by the fused routing mode, where the router's single LLM call
+        returns the KB category alongside the tier.
+        
+        Args:
+            category: Company information category (see COMPANY_CATEGORIES)
+            query: Original user query
+        
+        Returns:
+            Answer string if the category is valid, None otherwise
+        """
+        if category not in COMPANY_CATEGORIES:
+            return None
+        self.refresh()
+        return self._generate_company_response(category, query)
     
     def search(self, query: str) -> Optional[str]:
         """
@@ -140,14 +352,40 @@ Respond with ONLY the category name, nothing else."""
         Returns:
             Answer string if company info found, None otherwise
         """
-        # Step 1: Classify the query using LLM
+        # Step 1: Answer from the local index when retrieval is confident
+        response = self.retrieve(query)
+        if response:
+            return response
+        
+        # Step 2: Classify the query using LLM
         classification = self._classify_company_query(query)
         
-        # Step 2: If classified as company info, generate appropriate response
+        # Step 3: If classified as company info, generate appropriate response
         if classification:
             response = self._generate_company_response(classification, query)
             if response:
                 return response
         
-        # Step 3: If no classification or response, return None (will proceed to next tier)
+        # Step 4: If no classification or response, return None (will proceed to next tier)
+        return None
+    
+    async def asearch(self, query: str) -> Optional[str]:
+        """
+        Async version of search
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            Answer string if company info found, None otherwise
+        """
+        response = await self.aretrieve(query)
+        if response:
+            return response
+        
+        classification = await self._aclassify_company_query(query)
+        
+        if classification:
+            return self._generate_company_response(classification, query)
+        
         return None
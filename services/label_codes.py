@@ -0,0 +1,63 @@
+"""
+Label Codes - Constrained single-token classification
+Maps classification labels to single-digit codes the model is forced to answer with
+"""
+
+from typing import Dict, Any, Sequence
+
+
+# Token ids of the digits "0"-"9", the same in the cl100k_base (GPT-4, GPT-3.5)
+# and o200k_base (GPT-4o) encodings
+DIGIT_TOKEN_IDS = {str(digit): 15 + digit for digit in range(10)}
+
+# Opening shared by every code prompt, so all classification requests start
+# with the same tokens and the variable user query always comes last
+CODE_PROMPT_PREFIX = """You are a query classifier for TechGear UK, a UK clothing retailer selling jackets, hoodies and tees in sizes S, M, L and XL.
+Answer with the single digit code of the one matching category, nothing else."""
+
+
+def label_codes(labels: Sequence[str]) -> Dict[str, str]:
+    """
+    Number labels in order ("0" for the first)
+    
+    Args:
+        labels: Up to ten labels
+    
+    Returns:
+        Dictionary of digit code -> label
+    """
+    if len(labels) > len(DIGIT_TOKEN_IDS):
+        raise ValueError("At most ten labels can be coded with single digits")
+    return {str(index): label for index, label in enumerate(labels)}
+
+
+def code_prompt(task: str, descriptions: Dict[str, str], codes: Dict[str, str]) -> str:
+    """
+    Build a system prompt asking for a digit code
+    
+    Args:
+        task: One line describing what is being classified
+        descriptions: Label -> what queries belong to it
+        codes: Digit code -> label, from label_codes
+    
+    Returns:
+        Prompt text starting with CODE_PROMPT_PREFIX
+    """
+    lines = [f"{code}: {descriptions[label]}" for code, label in codes.items()]
+    return f"{CODE_PROMPT_PREFIX}\n{task}\n\n" + "\n".join(lines)
+
+
+def constrained_options(codes: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Chat completion arguments that restrict the answer to one of the codes
+    
+    Args:
+        codes: Digit code -> label, from label_codes
+    
+    Returns:
+        max_tokens and logit_bias arguments
+    """
+    return {
+        "max_tokens": 1,
+        "logit_bias": {str(DIGIT_TOKEN_IDS[code]): 100 for code in codes}
+    }
@@ -0,0 +1,25 @@
+"""
+Latency Statistics
+Percentile helpers shared by the test runner and the benchmark
+"""
+
+import math
+from typing import List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile
+    
+    Args:
+        values: Sorted sample values
+        pct: Percentile between 0 and 100
+    
+    Returns:
+        The percentile value, or 0.0 for no samples
+    """
+    if not values:
+        return 0.0
+    # Multiplying first keeps whole-number percentiles exact (0.29 * 100 != 29)
+    rank = max(math.ceil(pct * len(values) / 100) - 1, 0)
+    return values[min(rank, len(values) - 1)]
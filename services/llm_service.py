@@ -4,27 +4,102 @@ Handles query classification and function/tool calling for inventory queries
 """
 
 import json
-from typing import Optional, Dict, Any
-from openai import AzureOpenAI
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
+from services.clients import clients
+from services.label_codes import label_codes, code_prompt, constrained_options
+from services.streaming import read_label, aread_label, USAGE_STREAM_OPTIONS
+from services.kb_service import COMPANY_CATEGORIES
+from services.telemetry import telemetry
 import config
 
+if TYPE_CHECKING:
+    from openai import AsyncAzureOpenAI
+
+
+TIERS = ['company_info', 'inventory', 'unknown']
+
+# System prompt for high-level query classification
+CLASSIFICATION_PROMPT = """You are a query classifier for TechGear UK, a clothing retailer.
+Classify each user query into EXACTLY ONE category:
+
+1. "company_info" - Questions about:
+   - Company name, identity, or what TechGear UK is
+   - Location, address, where they are located
+   - Office hours, opening times, when they're open
+   - Contact details, phone, email
+   - Delivery policy, shipping information
+   - Return policy, refunds
+   - General company information
+
+2. "inventory" - Questions about:
+   - Product availability, stock levels
+   - Specific items (jackets, hoodies, tees)
+   - Product sizes (S, M, L, XL)
+   - Product prices
+   - "Do you have...", "Is X available...", "How many..."
+
+3. "unknown" - Everything else:
+   - General knowledge questions
+   - Unrelated topics
+   - Requests outside company/inventory scope
+
+Respond with ONLY ONE WORD: company_info, inventory, or unknown"""
+
+# Constrained mode: the classifier answers with a single-digit code instead of the label
+TIER_CODES = label_codes(TIERS)
+TIER_CODE_PROMPT = code_prompt("Which kind of question is the user message?", {
+    "company_info": "company information - company name, location or address, office hours, contact details, "
+                    "delivery or shipping, returns or refunds, general company information",
+    "inventory": "products - availability, stock levels, specific items, sizes, prices",
+    "unknown": "anything else - general knowledge, unrelated topics"
+}, TIER_CODES)
+
+# System prompt for inventory parameter extraction
+INVENTORY_PROMPT = ("You are a helpful assistant for TechGear UK, a clothing retailer. "
+                    "Use the get_inventory function to answer questions about product availability, "
+                    "stock levels, sizes, and prices. Only use the function for inventory-related queries. "
+                    "If the user asks about several products or sizes, call get_inventory once for each.")
+
+# System prompt for fused routing (tier, KB category and inventory arguments in one call)
+ROUTING_PROMPT = """You are a query router for TechGear UK, a clothing retailer.
+Call route_query exactly once for the user query.
+
+tier:
+- "company_info": company name or identity, location or address, office hours or opening times,
+  contact details, delivery or shipping policy, returns or refunds, general company information
+- "inventory": product availability, stock levels, specific items (jackets, hoodies, tees),
+  sizes (S, M, L, XL), prices
+- "unknown": everything else, including general knowledge and unrelated requests
+
+kb_category (company_info only):
+- company_name: company name, what is the company, company identity
+- location: address, location, where located, where are you
+- office_hours: opening hours, timings, when open, office hours
+- delivery_policy: delivery, shipping, how long delivery takes
+- returns: return policy, refunds, returning items
+- contact: contact details, phone, email, how to reach
+- general_info: broad questions like "about the company", "tell me about techgear"
+
+items (inventory only): one entry per product and size asked about, each with the
+product name, size and whether the user asks about stock or price."""
+
 
 class LLMService:
     """Service for handling Azure OpenAI LLM interactions with classification and function calling"""
     
     def __init__(self):
-        """Initialize the LLM Service with Azure OpenAI client"""
+        """Initialize the LLM Service with sync and async Azure OpenAI clients"""
         if not config.AZURE_OPENAI_ENDPOINT:
             raise ValueError("AZURE_OPENAI_ENDPOINT environment variable not set")
         if not config.AZURE_OPENAI_KEY:
             raise ValueError("AZURE_OPENAI_KEY environment variable not set")
         
-        self.client = AzureOpenAI(
-            azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
-            api_key=config.AZURE_OPENAI_KEY,
-            api_version=config.AZURE_API_VERSION
-        )
+        # Clients and their connection pools are shared with the other services
+        self.client = clients.client()
         self.model = config.AZURE_DEPLOYMENT_NAME
+        self.constrained_classification = config.CONSTRAINED_CLASSIFICATION
+        # A one-token answer gains nothing from streaming
+        self.stream_classification = config.STREAM_CLASSIFICATION and not self.constrained_classification
         
         # Define the inventory tool/function schema
         self.tools = [
@@ -56,6 +131,47 @@ class LLMService:
                 }
             }
         ]
+        
+        # Define the fused routing tool: tier, KB category and inventory
+        # arguments are returned together from a single chat completion
+        inventory_properties = self.tools[0]["function"]["parameters"]["properties"]
+        self.route_tool = {
+            "type": "function",
+            "function": {
+                "name": "route_query",
+                "description": "Route a TechGear UK customer query to the correct tier and extract the details needed to answer it.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "tier": {
+                            "type": "string",
+                            "description": "'company_info' for company details, 'inventory' for product stock or prices, 'unknown' for everything else",
+                            "enum": ["company_info", "inventory", "unknown"]
+                        },
+                        "kb_category": {
+                            "type": "string",
+                            "description": "For company_info queries only: the type of company information requested",
+                            "enum": COMPANY_CATEGORIES
+                        },
+                        "items": {
+                            "type": "array",
+                            "description": "For inventory queries only: one entry per product and size asked about",
+                            "items": {
+                                "type": "object",
+                                "properties": inventory_properties,
+                                "required": ["item_name"]
+                            }
+                        }
+                    },
+                    "required": ["tier"]
+                }
+            }
+        }
+    
+    @property
+    def async_client(self) -> "AsyncAzureOpenAI":
+        """Async Azure OpenAI client for the running event loop"""
+        return clients.async_client()
     
     def classify_query(self, query: str) -> str:
         """
@@ -70,109 +186,270 @@ class LLMService:
         Returns:
             Classification string: 'company_info', 'inventory', or 'unknown'
         """
-        try:
-            # System prompt for high-level query classification
-            system_prompt = """You are a query classifier for TechGear UK, a clothing retailer.
-Classify each user query into EXACTLY ONE category:
-
-1. "company_info" - Questions about:
-   - Company name, identity, or what TechGear UK is
-   - Location, address, where they are located
-   - Office hours, opening times, when they're open
-   - Contact details, phone, email
-   - Delivery policy, shipping information
-   - Return policy, refunds
-   - General company information
-
-2. "inventory" - Questions about:
-   - Product availability, stock levels
-   - Specific items (jackets, hoodies, tees)
-   - Product sizes (S, M, L, XL)
-   - Product prices
-   - "Do you have...", "Is X available...", "How many..."
-
-3. "unknown" - Everything else:
-   - General knowledge questions
-   - Unrelated topics
-   - Requests outside company/inventory scope
-
-Respond with ONLY ONE WORD: company_info, inventory, or unknown"""
-
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ]
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0,
-                max_tokens=10
-            )
-            
-            classification = response.choices[0].message.content.strip().lower()
-            
-            # Validate classification
-            if classification in ['company_info', 'inventory', 'unknown']:
-                return classification
+        with telemetry.span("llm.classify_query", model=self.model, streamed=self.stream_classification,
+                            constrained=self.constrained_classification) as span:
+            try:
+                request = self._classification_request(query)
+                
+                # Streaming mode stops reading as soon as the label is unambiguous or,
+                # with telemetry on, at the token usage chunk that ends the stream
+                if self.stream_classification:
+                    on_usage = span.record_usage if telemetry.enabled else None
+                    if on_usage:
+                        request.update(USAGE_STREAM_OPTIONS)
+                    stream = self.client.chat.completions.create(stream=True, **request)
+                    return read_label(stream, TIERS, on_usage) or 'unknown'
+                
+                response = self.client.chat.completions.create(**request)
+                span.record_usage(response)
+                return self._parse_classification(response)
             
-            # Default to unknown if invalid response
-            return 'unknown'
+            except Exception as e:
+                span.fail(e)
+                print(f"LLM Classification Error: {e}")
+                return 'unknown'
+    
+    async def aclassify_query(self, query: str) -> str:
+        """
+        Async version of classify_query
+        
+        Args:
+            query: User's question
         
-        except Exception as e:
-            print(f"LLM Classification Error: {e}")
-            return 'unknown'
+        Returns:
+            Classification string: 'company_info', 'inventory', or 'unknown'
+        """
+        with telemetry.span("llm.classify_query", model=self.model, streamed=self.stream_classification,
+                            constrained=self.constrained_classification) as span:
+            try:
+                request = self._classification_request(query)
+                
+                if self.stream_classification:
+                    on_usage = span.record_usage if telemetry.enabled else None
+                    if on_usage:
+                        request.update(USAGE_STREAM_OPTIONS)
+                    stream = await self.async_client.chat.completions.create(stream=True, **request)
+                    return await aread_label(stream, TIERS, on_usage) or 'unknown'
+                
+                response = await self.async_client.chat.completions.create(**request)
+                span.record_usage(response)
+                return self._parse_classification(response)
+            
+            except Exception as e:
+                span.fail(e)
+                print(f"LLM Classification Error: {e}")
+                return 'unknown'
     
     def should_use_inventory(self, query: str) -> Optional[Dict[str, Any]]:
         """
         Determine if query requires inventory lookup and extract parameters
         
+        Only the first get_inventory call is returned; use
+        extract_inventory_calls for questions about several products.
+        
         Args:
             query: User's question
         
         Returns:
             Dictionary with function call details if inventory lookup needed, None otherwise
         """
-        try:
-            # Create messages for the LLM
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant for TechGear UK, a clothing retailer. "
-                               "Use the get_inventory function to answer questions about product availability, "
-                               "stock levels, sizes, and prices. Only use the function for inventory-related queries."
-                },
-                {
-                    "role": "user",
-                    "content": query
-                }
-            ]
+        calls = self.extract_inventory_calls(query)
+        if calls:
+            return {
+                "function": "get_inventory",
+                "arguments": calls[0]
+            }
+        return None
+    
+    def extract_inventory_calls(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Extract get_inventory arguments for every product the query asks about
+        
+        The model may answer with parallel tool calls, e.g. one per product in
+        "do you have the hoodie in M and the tee in L?"; all of them are kept.
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            List of get_inventory argument dictionaries, empty if no lookup is needed
+        """
+        with telemetry.span("llm.extract_inventory_calls", model=self.model) as span:
+            try:
+                response = self.client.chat.completions.create(**self._inventory_request(query))
+                span.record_usage(response)
+                return self._parse_inventory_calls(response)
+            
+            except Exception as e:
+                span.fail(e)
+                print(f"LLM Service Error: {e}")
+                return []
+    
+    async def aextract_inventory_calls(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Async version of extract_inventory_calls
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            List of get_inventory argument dictionaries, empty if no lookup is needed
+        """
+        with telemetry.span("llm.extract_inventory_calls", model=self.model) as span:
+            try:
+                response = await self.async_client.chat.completions.create(**self._inventory_request(query))
+                span.record_usage(response)
+                return self._parse_inventory_calls(response)
+            
+            except Exception as e:
+                span.fail(e)
+                print(f"LLM Service Error: {e}")
+                return []
+    
+    def route_intent(self, query: str) -> Dict[str, Any]:
+        """
+        Classify a query and extract everything needed to answer it in one call
+        
+        Combines classify_query, KnowledgeBaseService._classify_company_query and
+        should_use_inventory into a single chat completion with a forced tool call.
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            Dictionary with 'tier', 'kb_category' and 'inventory_calls' (a list of
+            get_inventory arguments). Tier is 'unknown' if the call fails or is invalid.
+        """
+        with telemetry.span("llm.route_intent", model=self.model) as span:
+            try:
+                response = self.client.chat.completions.create(**self._routing_request(query))
+                span.record_usage(response)
+                return self._parse_route(response)
             
-            # Call OpenAI with function calling
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                tools=self.tools,
-                tool_choice="auto"
-            )
+            except Exception as e:
+                span.fail(e)
+                print(f"LLM Routing Error: {e}")
+                return self._parse_route(None)
+    
+    async def aroute_intent(self, query: str) -> Dict[str, Any]:
+        """
+        Async version of route_intent
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            Dictionary with 'tier', 'kb_category' and 'inventory_calls'
+        """
+        with telemetry.span("llm.route_intent", model=self.model) as span:
+            try:
+                response = await self.async_client.chat.completions.create(**self._routing_request(query))
+                span.record_usage(response)
+                return self._parse_route(response)
             
-            # Check if the model wants to call a function
+            except Exception as e:
+                span.fail(e)
+                print(f"LLM Routing Error: {e}")
+                return self._parse_route(None)
+    
+    def _classification_request(self, query: str) -> Dict[str, Any]:
+        """Build the chat completion arguments for classify_query"""
+        if self.constrained_classification:
+            return {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": TIER_CODE_PROMPT},
+                    {"role": "user", "content": query}
+                ],
+                "temperature": 0,
+                **constrained_options(TIER_CODES)
+            }
+        
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": CLASSIFICATION_PROMPT},
+                {"role": "user", "content": query}
+            ],
+            "temperature": 0,
+            "max_tokens": 10
+        }
+    
+    @staticmethod
+    def _parse_classification(response) -> str:
+        """Extract and validate the tier label (or its code) from a classification response"""
+        classification = response.choices[0].message.content.strip().lower()
+        classification = TIER_CODES.get(classification, classification)
+        
+        # Validate classification
+        if classification in TIERS:
+            return classification
+        
+        # Default to unknown if invalid response
+        return 'unknown'
+    
+    def _inventory_request(self, query: str) -> Dict[str, Any]:
+        """Build the chat completion arguments for extract_inventory_calls"""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": INVENTORY_PROMPT},
+                {"role": "user", "content": query}
+            ],
+            "tools": self.tools,
+            "tool_choice": "auto"
+        }
+    
+    @staticmethod
+    def _parse_inventory_calls(response) -> List[Dict[str, Any]]:
+        """Collect the arguments of every get_inventory tool call in a response"""
+        message = response.choices[0].message
+        
+        return [
+            json.loads(tool_call.function.arguments)
+            for tool_call in (message.tool_calls or [])
+            if tool_call.function.name == "get_inventory"
+        ]
+    
+    def _routing_request(self, query: str) -> Dict[str, Any]:
+        """Build the chat completion arguments for route_intent"""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": ROUTING_PROMPT},
+                {"role": "user", "content": query}
+            ],
+            "tools": [self.route_tool],
+            "tool_choice": {"type": "function", "function": {"name": "route_query"}},
+            "temperature": 0
+        }
+    
+    @staticmethod
+    def _parse_route(response) -> Dict[str, Any]:
+        """
+        Convert a route_query tool call into a routing result
+        
+        Args:
+            response: Chat completion response, or None if the call failed
+        
+        Returns:
+            Routing result; tier is 'unknown' if the response is missing or invalid
+        """
+        if response is not None:
             message = response.choices[0].message
             
             if message.tool_calls:
-                tool_call = message.tool_calls[0]
-                function_name = tool_call.function.name
+                function_args = json.loads(message.tool_calls[0].function.arguments)
+                tier = function_args.get("tier")
                 
-                if function_name == "get_inventory":
-                    # Parse function arguments
-                    function_args = json.loads(tool_call.function.arguments)
+                if tier in TIERS:
                     return {
-                        "function": function_name,
-                        "arguments": function_args
+                        "tier": tier,
+                        "kb_category": function_args.get("kb_category"),
+                        "inventory_calls": [
+                            item for item in function_args.get("items") or []
+                            if isinstance(item, dict) and item.get("item_name")
+                        ]
                     }
-            
-            return None
         
-        except Exception as e:
-            print(f"LLM Service Error: {e}")
-            return None
+        return {"tier": "unknown", "kb_category": None, "inventory_calls": []}
@@ -0,0 +1,400 @@
+"""
+Product Name Index - Fuzzy name resolution
+Resolves near-miss product names ("Tech-Knit Hoodies", "running tee") to the
+canonical catalog name using token and trigram indexes with edit distance
+"""
+
+import math
+import re
+from array import array
+from typing import Optional, Dict, List, Iterable, Set, Tuple
+
+
+# Common abbreviations and alternative spellings, mapped to the catalog's word
+ABBREVIATIONS = {
+    "tshirt": "tee",
+    "tshirts": "tee",
+    "shirt": "tee",
+    "hoody": "hoodie",
+    "hoodys": "hoodie",
+    "jkt": "jacket",
+    "wp": "waterproof",
+    "drifit": "dry fit"
+}
+
+# A query word matches a catalog word when their edit-distance similarity is at least this
+TOKEN_SIMILARITY = 0.75
+
+# Catalog words considered for each misspelled query word
+TOKEN_CANDIDATES = 8
+
+# Weight of query coverage against name coverage in the final score
+QUERY_WEIGHT = 0.7
+
+# Shortest head noun allowed to differ from the catalog's by one edit ("jackt", but not "tea" for "tee")
+HEAD_TYPO_LENGTH = 4
+
+# (canonical item name, confidence score between 0 and 1)
+NameMatch = Tuple[str, float]
+
+
+def tokenize(name: str) -> List[str]:
+    """
+    Split a product name into normalized words
+    
+    Lowercases, joins "t-shirt" style compounds, drops punctuation, expands
+    abbreviations and reduces plurals to their singular form.
+    
+    Args:
+        name: Raw product name or user phrase
+    
+    Returns:
+        List of normalized words
+    """
+    text = re.sub(r"\bt[\s-]+shirt", "tshirt", name.lower())
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text):
+        tokens.extend(ABBREVIATIONS.get(word, word).split())
+    return tokens
+
+
+def singular_forms(word: str) -> List[str]:
+    """
+    Possible singular forms of a word, most likely first
+    
+    Args:
+        word: Normalized word
+    
+    Returns:
+        The word followed by its candidate singulars ("hoodies" -> "hoodie", "hoody")
+    """
+    forms = [word]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        forms.append(word[:-1])
+        if word.endswith("es"):
+            forms.append(word[:-2])
+        if word.endswith("ies"):
+            forms.append(word[:-3] + "y")
+    return forms
+
+
+def trigrams(word: str) -> List[str]:
+    """
+    Character trigrams of a word, padded so short words still produce some
+    
+    Args:
+        word: Normalized word
+    
+    Returns:
+        List of distinct trigrams
+    """
+    padded = f"  {word} "
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """
+    Check whether two words differ by at most one insertion, deletion or substitution
+    
+    Args:
+        a: First word
+        b: Second word
+    
+    Returns:
+        True if the Levenshtein distance is 0 or 1
+    """
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    for i, (char_a, char_b) in enumerate(zip(a, b)):
+        if char_a != char_b:
+            # Substitution if the lengths match, otherwise b has an extra character here
+            return a[i + 1:] == b[i + 1:] if len(a) == len(b) else a[i:] == b[i + 1:]
+    return True
+
+
+def similarity(a: str, b: str) -> float:
+    """
+    Edit-distance similarity of two words
+    
+    Args:
+        a: First word
+        b: Second word
+    
+    Returns:
+        1 - levenshtein(a, b) / max(len(a), len(b)), between 0 and 1
+    """
+    if a == b:
+        return 1.0
+    longest = max(len(a), len(b))
+    if abs(len(a) - len(b)) > longest * (1 - TOKEN_SIMILARITY):
+        return 0.0
+    
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return 1 - previous[-1] / longest
+
+
+class NameIndex:
+    """
+    Immutable fuzzy index over product names
+    
+    Names are indexed by their normalized words; each word is in turn indexed
+    by character trigrams so misspelled query words are matched against a
+    handful of candidate words rather than the whole vocabulary. A lookup
+    touches only the names sharing a word with the query, which keeps it
+    well under a millisecond for catalogs of 100k products.
+    """
+    
+    def __init__(self, names: Iterable[str]):
+        """
+        Build the index
+        
+        Args:
+            names: Canonical product names
+        """
+        self.names: List[str] = []
+        self._exact: Dict[str, int] = {}
+        self._name_tokens: List[Tuple[int, ...]] = []
+        self._heads: List[str] = []
+        
+        # Vocabulary: word -> word id, postings of name ids and word trigrams
+        self._vocabulary: Dict[str, int] = {}
+        self._words: List[str] = []
+        self._postings: List[Set[int]] = []
+        self._word_trigrams: Dict[str, array] = {}
+        
+        for name in names:
+            words = tokenize(name)
+            key = " ".join(words)
+            if not words or key in self._exact:
+                continue
+            
+            name_id = len(self.names)
+            self.names.append(name)
+            self._exact[key] = name_id
+            
+            word_ids = []
+            for word in words:
+                word_id = self._vocabulary.get(word)
+                if word_id is None:
+                    word_id = len(self._words)
+                    self._vocabulary[word] = word_id
+                    self._words.append(word)
+                    self._postings.append(set())
+                    for gram in trigrams(word):
+                        self._word_trigrams.setdefault(gram, array("l")).append(word_id)
+                if word_id not in word_ids:
+                    word_ids.append(word_id)
+                    self._postings[word_id].add(name_id)
+            self._name_tokens.append(tuple(word_ids))
+            self._heads.append(words[-1])
+    
+    def __len__(self) -> int:
+        """Number of distinct names in the index"""
+        return len(self.names)
+    
+    def match(self, query: str, limit: int = 5, min_score: float = 0.0,
+              same_head: bool = False) -> List[NameMatch]:
+        """
+        Rank catalog names by similarity to a query
+        
+        Args:
+            query: Product name as written by the user or extracted by the LLM
+            limit: Maximum number of matches to return
+            min_score: Skip names that cannot reach this score; higher values
+                       let the lookup start from the query's rarest words only
+            same_head: Only return names whose last word, the product type
+                       ("tee", "hoodie"), matches the query's last word
+        
+        Returns:
+            List of (name, score), best first; score 1.0 is an exact match
+            after normalization
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        
+        name_id = self._exact.get(" ".join(words))
+        if name_id is not None:
+            return [(self.names[name_id], 1.0)]
+        
+        words = self._split_compounds(words)
+        
+        # Best similarity of each query word to each catalog word it resembles
+        word_matches = [dict(self._match_word(word)) for word in words]
+        
+        # A name scoring min_score must contain at least `required` of the query
+        # words, so candidates are built from intersections of the words'
+        # postings rather than the whole postings lists of common words
+        required = max(1, math.ceil(len(words) * (min_score - (1 - QUERY_WEIGHT)) / QUERY_WEIGHT - 1e-9))
+        if required > len(words):
+            return []
+        postings = sorted((self._word_postings(matches) for matches in word_matches), key=len)
+        candidates = self._covering(postings, required)
+        
+        # Sum, per candidate, the best similarity of each query word it contains
+        totals = dict.fromkeys(candidates, 0.0)
+        counts = dict.fromkeys(candidates, 0)
+        for matches in word_matches:
+            best: Dict[int, float] = {}
+            for word_id, score in matches.items():
+                for name_id in candidates & self._postings[word_id]:
+                    if score > best.get(name_id, 0.0):
+                        best[name_id] = score
+            for name_id, score in best.items():
+                totals[name_id] += score
+                counts[name_id] += 1
+        
+        results = []
+        for name_id in candidates:
+            if same_head and not self._head_matches(words[-1], name_id):
+                continue
+            query_coverage = totals[name_id] / len(words)
+            name_coverage = counts[name_id] / max(len(self._name_tokens[name_id]), len(words))
+            score = QUERY_WEIGHT * query_coverage + (1 - QUERY_WEIGHT) * name_coverage
+            if score >= min_score:
+                results.append((self.names[name_id], round(score, 4)))
+        
+        results.sort(key=lambda result: (-result[1], result[0]))
+        return results[:limit]
+    
+    def resolve(self, query: str, min_score: float = 0.8, margin: float = 0.05) -> Optional[NameMatch]:
+        """
+        Resolve a query to a single catalog name
+        
+        Only names of the same product type as the query are accepted, so
+        "Dry-Fit Running Shorts" never resolves to the Dry-Fit Running Tee: a
+        wrong stock or price answer is worse than none.
+        
+        Args:
+            query: Product name as written by the user or extracted by the LLM
+            min_score: Lowest score accepted as a match
+            margin: Required lead over the runner-up, so ambiguous queries
+                    ("hoodie" with several hoodies in stock) are not guessed
+        
+        Returns:
+            (canonical name, score) or None if nothing matched confidently
+        """
+        # Runners-up within the margin below min_score still make the query ambiguous
+        matches = self.match(query, limit=2, min_score=max(min_score - margin, 0.0), same_head=True)
+        if not matches or matches[0][1] < min_score:
+            return None
+        if len(matches) > 1 and matches[0][1] - matches[1][1] < margin:
+            return None
+        return matches[0]
+    
+    def _head_matches(self, word: str, name_id: int) -> bool:
+        """
+        Check whether a query's last word names the same product type as a catalog name
+        
+        Args:
+            word: Last normalized query word
+            name_id: Catalog name to compare with
+        
+        Returns:
+            True if a singular form of the word equals the name's last word, or is
+            one edit away from it for words of HEAD_TYPO_LENGTH letters or more
+        """
+        head = self._heads[name_id]
+        for form in singular_forms(word):
+            if form == head:
+                return True
+            if min(len(form), len(head)) >= HEAD_TYPO_LENGTH and within_one_edit(form, head):
+                return True
+        return False
+    
+    def _split_compounds(self, words: List[str]) -> List[str]:
+        """
+        Split unknown words that join two catalog words ("techknit" -> "tech", "knit")
+        
+        Args:
+            words: Normalized query words
+        
+        Returns:
+            Query words with known compounds split
+        """
+        result = []
+        for word in words:
+            if not any(form in self._vocabulary for form in singular_forms(word)):
+                for i in range(2, len(word) - 1):
+                    head, tail = word[:i], word[i:]
+                    if head in self._vocabulary and any(form in self._vocabulary for form in singular_forms(tail)):
+                        result.extend((head, tail))
+                        break
+                else:
+                    result.append(word)
+                continue
+            result.append(word)
+        return result
+    
+    @classmethod
+    def _covering(cls, postings: List[Set[int]], count: int, within: Optional[Set[int]] = None) -> Set[int]:
+        """
+        Names present in at least `count` of the postings sets
+        
+        Args:
+            postings: Postings sets, rarest first
+            count: Minimum number of sets a name must appear in
+            within: Restrict the result to these names (optional)
+        
+        Returns:
+            Set of name ids
+        """
+        if count == 0:
+            return set(within)
+        
+        names: Set[int] = set()
+        for i in range(len(postings) - count + 1):
+            narrowed = postings[i] if within is None else within & postings[i]
+            if narrowed:
+                names |= cls._covering(postings[i + 1:], count - 1, narrowed)
+        return names
+    
+    def _word_postings(self, matches: Dict[int, float]) -> Set[int]:
+        """
+        Names containing any of a query word's matched catalog words
+        
+        Args:
+            matches: Catalog word ids matched by one query word
+        
+        Returns:
+            Set of name ids (shared with the index when there is one match; do not modify)
+        """
+        if len(matches) == 1:
+            return self._postings[next(iter(matches))]
+        return set().union(*(self._postings[word_id] for word_id in matches))
+    
+    def _match_word(self, word: str) -> List[Tuple[int, float]]:
+        """
+        Find the catalog words a query word may refer to
+        
+        Args:
+            word: Normalized query word
+        
+        Returns:
+            List of (word_id, similarity) with similarity >= TOKEN_SIMILARITY
+        """
+        for form in singular_forms(word):
+            word_id = self._vocabulary.get(form)
+            if word_id is not None:
+                return [(word_id, 1.0)]
+        
+        # Candidate words sharing the most trigrams with the query word
+        shared: Dict[int, int] = {}
+        for gram in trigrams(word):
+            for word_id in self._word_trigrams.get(gram, ()):
+                shared[word_id] = shared.get(word_id, 0) + 1
+        candidates = sorted(shared, key=shared.get, reverse=True)[:TOKEN_CANDIDATES]
+        
+        matches = []
+        for word_id in candidates:
+            score = max(similarity(form, self._words[word_id]) for form in singular_forms(word))
+            if score >= TOKEN_SIMILARITY:
+                matches.append((word_id, score))
+        return matches
@@ -0,0 +1,491 @@
+"""
+Resilience - Retries, rate limiting and circuit breaking for Azure OpenAI calls
+Wraps the shared clients' chat completions with jittered exponential backoff that
+honours Retry-After, a token-bucket limiter sized to the deployment's RPM/TPM
+quota, and a circuit breaker that fails fast while Azure is unhealthy
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, Tuple
+from services.telemetry import telemetry
+import config
+
+
+# Completion tokens assumed for requests without max_tokens when estimating TPM use
+DEFAULT_COMPLETION_TOKENS = 64
+
+# Status codes worth retrying: timeout, conflict, rate limit and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling Azure OpenAI while the circuit breaker is open"""
+
+
+class RateLimited(Exception):
+    """Raised when the local rate limiter would delay a request for too long"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Check whether a failed call is transient and worth retrying
+    
+    Args:
+        error: Exception raised by chat.completions.create
+    
+    Returns:
+        True for connection errors, timeouts, 408/409/429 and 5xx responses
+    """
+    # Imported here: the exception types live in openai, which clients.py imports lazily
+    import openai
+    
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    Read the server's requested delay from a failed call
+    
+    Args:
+        error: Exception raised by chat.completions.create
+    
+    Returns:
+        Seconds from the retry-after-ms or Retry-After header, or None if absent
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    
+    try:
+        if headers.get("retry-after-ms"):
+            return max(float(headers["retry-after-ms"]) / 1000, 0.0)
+        
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            # HTTP-date form
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """
+    Delay before a retry: full-jitter exponential backoff, or the server's Retry-After
+    
+    Args:
+        attempt: Retry number, starting at 0
+        base: Delay ceiling of the first retry in seconds
+        cap: Largest delay ceiling in seconds
+        retry_after: Delay requested by the server, if any
+    
+    Returns:
+        Seconds to wait
+    """
+    if retry_after is not None:
+        # Spread the clients that got the same Retry-After a little
+        return retry_after + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def estimate_tokens(request: Dict[str, Any]) -> int:
+    """
+    Estimate the quota tokens a request consumes, the way Azure's limiter counts them
+    
+    Args:
+        request: Keyword arguments passed to chat.completions.create
+    
+    Returns:
+        Prompt tokens (about four characters each) plus max_tokens
+    """
+    prompt = json.dumps([request.get("messages", []), request.get("tools", [])], default=str)
+    return len(prompt) // 4 + int(request.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """Thread-safe token bucket that reserves capacity and reports how long to wait"""
+    
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Most tokens that can accumulate (the allowed burst)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self, amount: float, max_wait: float) -> Optional[float]:
+        """
+        Take tokens, possibly from the future
+        
+        Args:
+            amount: Tokens needed
+            max_wait: Longest acceptable wait in seconds
+        
+        Returns:
+            Seconds to wait before sending, or None (nothing taken) if that exceeds max_wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            
+            # Requests larger than the bucket are only limited to one burst
+            amount = min(amount, self.capacity)
+            wait = max(amount - self._tokens, 0.0) / self.rate
+            if wait > max_wait:
+                return None
+            self._tokens -= amount
+            return wait
+    
+    def refund(self, amount: float):
+        """
+        Give back tokens taken by reserve() for a request that was never sent
+        
+        Args:
+            amount: Tokens passed to reserve()
+        """
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    
+    After failure_threshold transient failures in a row the circuit opens and
+    calls fail immediately. Once reset_timeout has passed, one probe call is
+    let through (half-open); its success closes the circuit, its failure
+    opens it again.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+        
+        self.opened = 0
+        self.rejected = 0
+    
+    @property
+    def state(self) -> str:
+        """'closed', 'open' or 'half_open'"""
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+    
+    @property
+    def rejecting(self) -> bool:
+        """True if allow() would currently refuse a call"""
+        if self._opened_at is None:
+            return False
+        return self._probing or time.monotonic() - self._opened_at < self.reset_timeout
+    
+    def acquire(self) -> Optional[bool]:
+        """
+        Check whether a call may be made, claiming the probe when half-open
+        
+        Returns:
+            None if the call must not be made, otherwise whether it is the
+            half-open probe (which the caller must settle with record_success,
+            record_failure or release)
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return None
+    
+    def allow(self) -> bool:
+        """
+        Check whether a call may be made, claiming the probe when half-open
+        
+        Returns:
+            True if the call should go ahead
+        """
+        return self.acquire() is not None
+    
+    def release(self):
+        """Give back a probe claimed by acquire() whose call was never made or never finished"""
+        with self._lock:
+            self._probing = False
+    
+    def record_success(self):
+        """Close the circuit after a successful call"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+    
+    def record_failure(self):
+        """Count a transient failure, opening the circuit at the threshold or after a failed probe"""
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.opened += 1
+            self._probing = False
+
+
+class Resilience:
+    """
+    Guards every chat completion made through the shared clients
+    
+    Each call first checks the circuit breaker and takes its share of the
+    request and token quotas, then retries transient failures with backoff.
+    Failures the services already handle (by falling back) are raised as
+    before, so while the circuit is open a query falls back in microseconds
+    instead of waiting for a timeout.
+    """
+    
+    def __init__(self, enabled: bool = config.LLM_RESILIENCE,
+                 max_retries: int = config.LLM_MAX_RETRIES,
+                 base_delay: float = config.LLM_RETRY_BASE_DELAY,
+                 max_delay: float = config.LLM_RETRY_MAX_DELAY,
+                 requests_per_minute: float = config.LLM_RATE_LIMIT_RPM,
+                 tokens_per_minute: float = config.LLM_RATE_LIMIT_TPM,
+                 max_queue_wait: float = config.LLM_RATE_LIMIT_MAX_WAIT,
+                 failure_threshold: int = config.LLM_BREAKER_FAILURES,
+                 reset_timeout: float = config.LLM_BREAKER_RESET):
+        """
+        Initialize the resilience layer
+        
+        Args:
+            enabled: Apply retries, rate limiting and circuit breaking
+            max_retries: Retries per call after the first attempt
+            base_delay: Backoff ceiling of the first retry in seconds
+            max_delay: Largest backoff in seconds; a longer Retry-After is not waited for
+            requests_per_minute: Deployment RPM quota, 0 for no request limit
+            tokens_per_minute: Deployment TPM quota, 0 for no token limit
+            max_queue_wait: Longest wait for quota before failing fast, in seconds
+            failure_threshold: Consecutive transient failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe
+        """
+        self.enabled = enabled
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_queue_wait = max_queue_wait
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        
+        # Azure enforces per-minute quotas over short windows, so allow bursts of ten seconds' worth
+        self.request_bucket = TokenBucket(requests_per_minute / 60, requests_per_minute / 6) \
+            if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 6) \
+            if tokens_per_minute > 0 else None
+    
+    @property
+    def circuit_open(self) -> bool:
+        """True while calls are being rejected without contacting Azure"""
+        return self.enabled and self.breaker.rejecting
+    
+    def wrap(self, client):
+        """
+        Route a client's chat completions through the resilience layer
+        
+        Args:
+            client: AzureOpenAI client
+        
+        Returns:
+            The client itself when disabled, otherwise a guarded wrapper
+        """
+        if not self.enabled:
+            return client
+        return _GuardedClient(client, _Completions(self, client))
+    
+    def wrap_async(self, client):
+        """
+        Async version of wrap
+        
+        Args:
+            client: AsyncAzureOpenAI client
+        
+        Returns:
+            The client itself or its guarded wrapper
+        """
+        if not self.enabled:
+            return client
+        return _GuardedClient(client, _AsyncCompletions(self, client))
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get breaker counters
+        
+        Returns:
+            Dictionary with the circuit state and how often it opened and rejected calls
+        """
+        return {"state": self.breaker.state, "opened": self.breaker.opened, "rejected": self.breaker.rejected}
+    
+    def admit(self, request: Dict[str, Any]) -> Tuple[float, bool]:
+        """
+        Check the breaker and reserve quota for one attempt of a request
+        
+        Every attempt, retries included, goes through here, so retries use
+        quota like any other call.
+        
+        Args:
+            request: Keyword arguments passed to chat.completions.create
+        
+        Returns:
+            Tuple of (seconds to wait before sending, whether the attempt is the half-open probe)
+        
+        Raises:
+            CircuitOpen: The circuit breaker is open
+            RateLimited: The quota would not allow the request within max_queue_wait
+        """
+        probe = self.breaker.acquire()
+        if probe is None:
+            raise CircuitOpen("Azure OpenAI circuit breaker is open; skipping the call")
+        
+        wait = 0.0
+        reserved = []
+        for bucket, amount in ((self.request_bucket, 1), (self.token_bucket, estimate_tokens(request))):
+            if bucket is None:
+                continue
+            delay = bucket.reserve(amount, self.max_queue_wait)
+            if delay is None:
+                # The request is not sent, so neither its probe nor its quota is used up
+                for taken, taken_amount in reserved:
+                    taken.refund(taken_amount)
+                if probe:
+                    self.breaker.release()
+                raise RateLimited(f"Rate limit would delay the call by more than {self.max_queue_wait:g}s")
+            reserved.append((bucket, amount))
+            wait = max(wait, delay)
+        return wait, probe
+    
+    def retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """
+        Record a failed attempt and decide whether to retry it
+        
+        Args:
+            error: Exception raised by chat.completions.create
+            attempt: Retry number the next attempt would be, starting at 0
+        
+        Returns:
+            Seconds to wait before retrying, or None to give up and raise
+        """
+        if not is_retryable(error):
+            # Azure answered (e.g. 400 for a bad request), so the service itself is healthy
+            self.breaker.record_success()
+            return None
+        
+        self.breaker.record_failure()
+        if attempt >= self.max_retries or self.breaker.rejecting:
+            return None
+        
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None and retry_after > self.max_delay:
+            return None
+        return backoff_delay(attempt, self.base_delay, self.max_delay, retry_after)
+
+
+class _GuardedClient:
+    """Client wrapper exposing chat.completions through the resilience layer"""
+    
+    def __init__(self, client, completions):
+        self._client = client
+        self.chat = _Chat(completions)
+    
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class _Chat:
+    """Stand-in for client.chat"""
+    
+    def __init__(self, completions):
+        self.completions = completions
+
+
+class _Completions:
+    """Stand-in for client.chat.completions that retries create()"""
+    
+    def __init__(self, resilience: Resilience, client):
+        self.resilience = resilience
+        self.client = client
+    
+    def create(self, **request):
+        attempt = 0
+        while True:
+            wait, probe = self.resilience.admit(request)
+            try:
+                if wait:
+                    time.sleep(wait)
+                response = self.client.chat.completions.create(**request)
+            except Exception as e:
+                delay = self.resilience.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                telemetry.annotate(retries=attempt)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Interrupted with no outcome: give the probe back or the breaker stays half-open
+                if probe:
+                    self.resilience.breaker.release()
+                raise
+            self.resilience.breaker.record_success()
+            return response
+
+
+class _AsyncCompletions(_Completions):
+    """Async version of _Completions"""
+    
+    async def create(self, **request):
+        attempt = 0
+        while True:
+            wait, probe = self.resilience.admit(request)
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                response = await self.client.chat.completions.create(**request)
+            except Exception as e:
+                delay = self.resilience.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                telemetry.annotate(retries=attempt)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (a discarded speculative branch, a timed-out request): release the probe
+                if probe:
+                    self.resilience.breaker.release()
+                raise
+            self.resilience.breaker.record_success()
+            return response
+
+
+# Process-wide resilience layer shared by every client
+resilience = Resilience()
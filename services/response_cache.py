@@ -0,0 +1,133 @@
+"""
+Response Cache - Bounded LRU cache with per-tier TTLs
+Stores routed answers keyed by normalized query text
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of chatbot responses with a separate TTL per tier"""
+    
+    def __init__(self, max_entries: int, ttls: Dict[str, float]):
+        """
+        Initialize the cache
+        
+        Args:
+            max_entries: Maximum number of cached responses before LRU eviction
+            ttls: Time-to-live in seconds per tier ('company_info', 'inventory',
+                  'unknown'). Tiers with no TTL or a TTL of 0 are never cached.
+        """
+        self.max_entries = max_entries
+        self.ttls = dict(ttls)
+        self._entries: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response
+        
+        Args:
+            key: Normalized query text
+        
+        Returns:
+            Cached response, or None on a miss or expired entry
+        """
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+    
+    def get_entry(self, key: str) -> Optional[Tuple[str, str]]:
+        """
+        Look up a cached response and the tier that produced it
+        
+        Args:
+            key: Normalized query text
+        
+        Returns:
+            Tuple of (response, tier), or None on a miss or expired entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            response, tier, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return response, tier
+    
+    def put(self, key: str, response: str, tier: str):
+        """
+        Store a response, evicting the least recently used entry when full
+        
+        Args:
+            key: Normalized query text
+            response: Response string to cache
+            tier: Tier that produced the response, used to select the TTL
+        """
+        ttl = self.ttls.get(tier, 0)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        
+        with self._lock:
+            self._entries[key] = (response, tier, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate_tier(self, tier: str) -> int:
+        """
+        Drop every cached response produced by a tier
+        
+        Args:
+            tier: Tier whose entries should be removed
+        
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            stale = [key for key, (_, entry_tier, _) in self._entries.items() if entry_tier == tier]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+    
+    def clear(self):
+        """Remove all cached responses"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache counters
+        
+        Returns:
+            Dictionary with size, hits, misses, evictions, expirations and invalidations
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
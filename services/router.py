@@ -3,22 +3,127 @@ Router Service - Enhanced Query Routing Logic
 Routes queries through the three-tier system with intelligent classification
 """
 
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple, Callable
+from services.async_utils import BackgroundLoop
+from services.clients import clients
 from services.kb_service import KnowledgeBaseService
 from services.inventory_service import InventoryService
 from services.llm_service import LLMService
+from services.intent_classifier import LocalIntentClassifier, normalize_text
+from services.resilience import resilience
+from services.response_cache import ResponseCache
+from services.session_store import SessionStore
+from services.single_flight import SingleFlight, llm_flights
+from services.telemetry import telemetry
 import config
 
 
+# Inventory lookups made while answering the current query, for its session
+_turn_calls: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar(
+    "turn_calls", default=None
+)
+
+
 class ChatbotRouter:
     """Main router for handling query routing through three tiers with semantic classification"""
     
-    def __init__(self):
-        """Initialize all service components"""
-        self.kb_service = KnowledgeBaseService()
-        self.inventory_service = InventoryService()
-        self.llm_service = LLMService()
+    def __init__(self, fused_routing: bool = config.FUSED_ROUTING,
+                 local_classifier: bool = config.LOCAL_CLASSIFIER,
+                 speculative_routing: bool = config.SPECULATIVE_ROUTING,
+                 warm_up: bool = True):
+        """
+        Initialize all service components
+        
+        Args:
+            fused_routing: Use a single LLM call for classification and extraction
+            local_classifier: Try the deterministic local classifier before any LLM call
+            speculative_routing: Without fused routing, run the tier classifier and
+                                 the tier-specific LLM steps concurrently
+            warm_up: Open LLM connections on the background loop at startup
+                     (see LLM_HTTP_WARMUP_CONNECTIONS)
+        """
+        # Seconds spent building each component, for startup profiling
+        self.startup_timings: Dict[str, float] = {}
+        
+        # The services are independent, so the inventory database is verified and
+        # its snapshot loaded while the LLM clients are built (importing openai)
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="router-init") as pool:
+            kb_service = pool.submit(self._timed, "kb_service", KnowledgeBaseService)
+            inventory_service = pool.submit(self._timed, "inventory_service", InventoryService)
+            llm_service = pool.submit(self._timed, "llm_service", LLMService)
+        self.kb_service = kb_service.result()
+        self.inventory_service = inventory_service.result()
+        self.llm_service = llm_service.result()
+        self.fused_routing = fused_routing
+        self.speculative_routing = speculative_routing
+        
+        self.intent_classifier = None
+        if local_classifier:
+            self.intent_classifier = self._timed("intent_classifier", lambda: LocalIntentClassifier(
+                item_names=self.inventory_service.get_item_names(),
+                company_fields=self.kb_service.company_data.keys()
+            ))
+        
+        # Catalog changes invalidate cached inventory answers and product names;
+        # the snapshot and name patterns are rebuilt off the query path
+        self.inventory_service.add_reload_listener(self._on_inventory_reload)
+        
+        # Response cache keyed by normalized query text; inventory answers are
+        # dropped whenever the database's data_version moves
+        self.response_cache = None
+        if config.RESPONSE_CACHE_SIZE > 0:
+            self.response_cache = ResponseCache(
+                max_entries=config.RESPONSE_CACHE_SIZE,
+                ttls={
+                    "company_info": config.CACHE_TTL_KB,
+                    "inventory": config.CACHE_TTL_INVENTORY,
+                    "unknown": config.CACHE_TTL_FALLBACK
+                }
+            )
+        
+        # Per-conversation memory, so follow-ups like "and in large?" resolve locally
+        self.sessions = None
+        if config.SESSION_MAX_SESSIONS > 0:
+            self.sessions = SessionStore(
+                max_sessions=config.SESSION_MAX_SESSIONS,
+                idle_timeout=config.SESSION_IDLE_TIMEOUT,
+                max_bytes=int(config.SESSION_MAX_MEMORY_MB * 1024 * 1024),
+                history_messages=config.SESSION_HISTORY_MESSAGES,
+                max_message_chars=config.SESSION_MESSAGE_CHARS
+            )
+        
+        # Concurrent identical queries share one resolution instead of each calling the LLM
+        self._flights = SingleFlight(enabled=config.SINGLE_FLIGHT)
+        
+        # Event loop that runs aroute_query on behalf of synchronous callers
+        self._loop = BackgroundLoop()
+        
+        # Connect to Azure OpenAI in the background, so the first query skips the TCP and TLS handshakes
+        if warm_up:
+            self._loop.submit(clients.awarm_up())
+    
+    def route_query(self, query: str, session_id: Optional[str] = None) -> str:
+        """
+        Route a user query through the enhanced three-tier system
+        
+        Synchronous wrapper around aroute_query; the query runs on the
+        router's background event loop, so this is safe to call from any
+        number of threads.
+        
+        Args:
+            query: User's question
+            session_id: Conversation the query belongs to, for follow-up questions
+        
+        Returns:
+            Response string
+        """
+        return self._loop.run(self.aroute_query(query, session_id))
     
-    def route_query(self, query: str) -> str:
+    async def aroute_query(self, query: str, session_id: Optional[str] = None) -> str:
         """
         Route a user query through the enhanced three-tier system
         
@@ -27,57 +132,366 @@ class ChatbotRouter:
         2. Route to appropriate tier based on classification
         3. Fall back if no valid response
         
+        In fused routing mode, step 1 also returns the KB category and the
+        inventory arguments, so each query costs a single LLM round-trip.
+        Queries the local classifier is confident about skip the LLM entirely,
+        and repeated queries are answered from the response cache; identical
+        queries arriving while one is being resolved wait for its answer. With a
+        session_id, follow-ups that name no product ("and in large?") reuse
+        the products of the conversation's previous inventory answer.
+        
+        LLM calls use async clients and database access runs in worker
+        threads, so the event loop is never blocked.
+        
         Tier 1: Knowledge Base (company information with semantic matching)
         Tier 2: Database (inventory via function calling)
         Tier 3: Fallback message
         
         Args:
             query: User's question
+            session_id: Conversation the query belongs to, for follow-up questions
         
         Returns:
             Response string
         """
-        try:
-            # STEP 1: Classify the query using LLM
-            # This determines which tier should handle the query
-            classification = self.llm_service.classify_query(query)
-            
-            # STEP 2: Route based on classification
+        session_id = session_id if self.sessions else None
+        if session_id:
+            _turn_calls.set([])
+        
+        tier, response = await self._answer(query, session_id)
+        
+        if session_id:
+            self.sessions.record(session_id, query, response, tier, _turn_calls.get())
+        return response
+    
+    async def _answer(self, query: str, session_id: Optional[str]) -> Tuple[str, str]:
+        """
+        Answer a query from the session, the cache or the tiers
+        
+        Args:
+            query: User's question
+            session_id: Conversation the query belongs to, or None
+        
+        Returns:
+            Tuple of (tier, response); tier is 'unknown' for the fallback message
+        """
+        cache_key = normalize_text(query)
+        
+        with telemetry.span("route_query") as span:
+            try:
+                await asyncio.to_thread(self._check_inventory_version)
+                
+                # Follow-ups depend on the conversation, so they bypass the shared cache
+                session = self.sessions.get(session_id) if session_id else None
+                if session and session.inventory_calls and self.intent_classifier:
+                    route = self.intent_classifier.follow_up(query, session.inventory_arguments())
+                    if route:
+                        telemetry.annotate(route="session")
+                        response = await self._dispatch(route, query)
+                        if response:
+                            span.set(tier="inventory")
+                            return "inventory", response
+                
+                if self.response_cache:
+                    cached = self.response_cache.get_entry(cache_key)
+                    if cached is not None:
+                        span.set(tier="cache")
+                        response, tier = cached
+                        if session_id and tier == "inventory" and self.intent_classifier:
+                            # Remember the products of a cached answer for the next follow-up
+                            _turn_calls.get()[:] = self.intent_classifier.classify(query)["inventory_calls"]
+                        return tier, response
+                
+                # Identical queries already being resolved share that resolution
+                tier, response, calls = await self._flights.ado(cache_key, lambda: self._resolve_shared(query))
+                if session_id:
+                    _turn_calls.get()[:] = calls
+                
+                if response:
+                    span.set(tier=tier)
+                    if self.response_cache:
+                        self.response_cache.put(cache_key, response, tier)
+                    return tier, response
+                
+                # Cache the fallback under the 'unknown' tier's TTL
+                if self.response_cache:
+                    self.response_cache.put(cache_key, config.FALLBACK_MESSAGE, "unknown")
             
-            # TIER 1: Company Information (Knowledge Base)
-            if classification == "company_info":
-                # Use semantic KB service to handle company-related queries
-                kb_answer = self.kb_service.search(query)
-                if kb_answer:
-                    return kb_answer
+            except Exception as e:
+                span.fail(e)
+                print(f"Router Error: {e}")
             
-            # TIER 2: Inventory Information (Database with Tool Calling)
-            elif classification == "inventory":
-                # Use LLM function calling to extract inventory parameters
-                function_call = self.llm_service.should_use_inventory(query)
-                
-                if function_call and function_call.get("function") == "get_inventory":
-                    # Extract arguments from function call
-                    args = function_call.get("arguments", {})
-                    item_name = args.get("item_name")
-                    size = args.get("size")
-                    intent = args.get("intent")
-                    
-                    # Query inventory database with extracted parameters
-                    if item_name:
-                        response = self.inventory_service.get_inventory(
-                            item_name=item_name,
-                            size=size,
-                            intent=intent
-                        )
-                        
-                        # Only return if it's not the fallback message
-                        if response != config.FALLBACK_MESSAGE:
-                            return response
-        
-        except Exception as e:
-            print(f"Router Error: {e}")
-        
-        # TIER 3: Fallback
-        # If classification is 'unknown' or no valid response from other tiers
-        return config.FALLBACK_MESSAGE
+            # TIER 3: Fallback
+            # If classification is 'unknown' or no valid response from other tiers
+            span.set(tier="fallback")
+            return "unknown", config.FALLBACK_MESSAGE
+    
+    def close(self):
+        """Stop the background event loop and close database connections"""
+        self._loop.stop()
+        self.kb_service.close()
+        self.inventory_service.close()
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """
+        Get response cache counters
+        
+        Returns:
+            Dictionary of cache counters, empty if caching is disabled
+        """
+        return self.response_cache.stats() if self.response_cache else {}
+    
+    def flight_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get coalescing counters for queries and LLM requests
+        
+        Returns:
+            Dictionary with the query and llm single-flight counters
+        """
+        return {"queries": self._flights.stats(), "llm": llm_flights.stats()}
+    
+    def session_stats(self) -> Dict[str, int]:
+        """
+        Get session store counters
+        
+        Returns:
+            Dictionary of session counters, empty if sessions are disabled
+        """
+        return self.sessions.stats() if self.sessions else {}
+    
+    def end_session(self, session_id: str):
+        """
+        Forget a conversation, e.g. when its connection closes
+        
+        Args:
+            session_id: Conversation identifier
+        """
+        if self.sessions:
+            self.sessions.drop(session_id)
+    
+    def _timed(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Build a component and record how long it took in startup_timings"""
+        start = time.perf_counter()
+        component = factory()
+        self.startup_timings[name] = time.perf_counter() - start
+        return component
+    
+    def _check_inventory_version(self):
+        """Drop cached inventory answers and start a background reload if product_inventory has changed"""
+        if self.inventory_service.refresh() and self.response_cache:
+            self.response_cache.invalidate_tier("inventory")
+    
+    def _on_inventory_reload(self, item_names: Optional[List[str]]):
+        """
+        Reload thread: catch up with a reloaded inventory snapshot
+        
+        Args:
+            item_names: New product names, or None if only stock or prices changed
+        """
+        # Answers cached while the reload ran may come from the previous snapshot
+        if self.response_cache:
+            self.response_cache.invalidate_tier("inventory")
+        if item_names is not None and self.intent_classifier:
+            self.intent_classifier.set_item_names(item_names)
+    
+    async def _resolve_shared(self, query: str) -> Tuple[str, Optional[str], List[Dict[str, Any]]]:
+        """
+        Resolve a query on behalf of every caller coalesced onto it
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            Tuple of (tier, response, inventory lookups made for the answer)
+        """
+        calls: List[Dict[str, Any]] = []
+        _turn_calls.set(calls)
+        tier, response = await self._resolve(query)
+        return tier, response, calls
+    
+    async def _resolve(self, query: str) -> Tuple[str, Optional[str]]:
+        """
+        Select the tier for a query and produce its answer
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            Tuple of (tier, response); response is None to fall back
+        """
+        # Fast path: answer common phrasings without any LLM call
+        local_route = self.intent_classifier.classify(query) if self.intent_classifier else None
+        
+        # Company questions the local KB index matches confidently need no LLM call either,
+        # unless the classifier found the query's company keyword out of context
+        if not (local_route and (local_route["confident"] or "inventory" in local_route["hints"]
+                                 or local_route["unfamiliar"])):
+            response = await self.kb_service.aretrieve(query)
+            if response:
+                telemetry.annotate(route="kb_index")
+                return "company_info", response
+        
+        if local_route and local_route["confident"]:
+            telemetry.annotate(route="local")
+            route = local_route
+        elif resilience.circuit_open:
+            # Azure OpenAI is failing: fall back now instead of queueing calls that would be rejected
+            telemetry.annotate(route="circuit_open")
+            return "unknown", None
+        elif self.fused_routing:
+            telemetry.annotate(route="fused")
+            route = await self.llm_service.aroute_intent(query)
+        elif self.speculative_routing:
+            # Cost guard: only speculate on tiers the local heuristics saw evidence for
+            telemetry.annotate(route="speculative")
+            hints = local_route["hints"] if local_route else ["company_info", "inventory"]
+            return await self._route_speculative(query, hints)
+        else:
+            telemetry.annotate(route="sequential")
+            return await self._route_sequential(query)
+        
+        return route["tier"], await self._dispatch(route, query)
+    
+    async def _dispatch(self, route: Dict[str, Any], query: str) -> Optional[str]:
+        """
+        Answer a query from a routing result that already holds the tier,
+        KB category and inventory arguments
+        
+        Args:
+            route: Result of LLMService.route_intent or LocalIntentClassifier.classify
+            query: User's question
+        
+        Returns:
+            Response string, or None to fall back
+        """
+        # TIER 1: Company Information (Knowledge Base)
+        if route["tier"] == "company_info":
+            return self.kb_service.answer_category(route["kb_category"], query)
+        
+        # TIER 2: Inventory Information (Database)
+        if route["tier"] == "inventory":
+            return await asyncio.to_thread(self._answer_inventory, route["inventory_calls"])
+        
+        return None
+    
+    async def _route_speculative(self, query: str, hints: List[str]) -> Tuple[str, Optional[str]]:
+        """
+        Route a query by running the tier classifier and tier-specific LLM steps at once
+        
+        The KB search and inventory extraction for each hinted tier start
+        alongside classify_query; once the tier is known, the matching branch
+        is awaited and the others are cancelled. With no hints this is the
+        same as sequential routing.
+        
+        Args:
+            query: User's question
+            hints: Tiers to speculate on ('company_info', 'inventory')
+        
+        Returns:
+            Tuple of (tier, response); response is None to fall back
+        """
+        branches = {}
+        if "company_info" in hints:
+            branches["company_info"] = asyncio.create_task(self.kb_service.asearch(query))
+        if "inventory" in hints:
+            branches["inventory"] = asyncio.create_task(self.llm_service.aextract_inventory_calls(query))
+        
+        try:
+            classification = await self.llm_service.aclassify_query(query)
+        except BaseException:
+            for task in branches.values():
+                task.cancel()
+            raise
+        
+        # Discard every branch the classifier did not select
+        for tier, task in branches.items():
+            if tier != classification:
+                task.cancel()
+        
+        if classification == "company_info":
+            branch = branches.get("company_info")
+            return classification, await branch if branch else await self.kb_service.asearch(query)
+        
+        if classification == "inventory":
+            branch = branches.get("inventory")
+            inventory_calls = await branch if branch else await self.llm_service.aextract_inventory_calls(query)
+            return classification, await asyncio.to_thread(self._answer_inventory, inventory_calls)
+        
+        return classification, None
+    
+    async def _route_sequential(self, query: str) -> Tuple[str, Optional[str]]:
+        """
+        Route a query by classifying first, then calling the selected tier's LLM step
+        
+        Args:
+            query: User's question
+        
+        Returns:
+            Tuple of (tier, response); response is None to fall back
+        """
+        # STEP 1: Classify the query using LLM
+        # This determines which tier should handle the query
+        classification = await self.llm_service.aclassify_query(query)
+        
+        # STEP 2: Route based on classification
+        
+        # TIER 1: Company Information (Knowledge Base)
+        if classification == "company_info":
+            # Use semantic KB service to handle company-related queries
+            return classification, await self.kb_service.asearch(query)
+        
+        # TIER 2: Inventory Information (Database with Tool Calling)
+        if classification == "inventory":
+            # Use LLM function calling to extract inventory parameters,
+            # one get_inventory call per product asked about
+            inventory_calls = await self.llm_service.aextract_inventory_calls(query)
+            return classification, await asyncio.to_thread(self._answer_inventory, inventory_calls)
+        
+        return classification, None
+    
+    def _answer_inventory(self, inventory_calls: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Query the inventory database with extracted get_inventory arguments
+        
+        Several calls are resolved in one batch lookup and composed into a
+        single answer with one line per product.
+        
+        Args:
+            inventory_calls: List of dictionaries with 'item_name' and optional
+                             'size' and 'intent'
+        
+        Returns:
+            Response string, or None if no item was found
+        """
+        inventory_calls = [args for args in inventory_calls if args.get("item_name")]
+        if not inventory_calls:
+            return None
+        
+        # Query inventory database with extracted parameters
+        if len(inventory_calls) == 1:
+            args = inventory_calls[0]
+            responses = [self.inventory_service.get_inventory(
+                item_name=args["item_name"],
+                size=args.get("size"),
+                intent=args.get("intent")
+            )]
+        else:
+            responses = self.inventory_service.get_inventory_many(inventory_calls)
+        
+        # Only return if at least one answer is not the fallback message
+        if all(response == config.FALLBACK_MESSAGE for response in responses):
+            return None
+        
+        # Share the lookups with the session of the query being answered
+        turn_calls = _turn_calls.get()
+        if turn_calls is not None:
+            turn_calls[:] = inventory_calls
+        
+        if len(responses) == 1:
+            return responses[0]
+        
+        lines = []
+        for args, response in zip(inventory_calls, responses):
+            label = f"{args['item_name']} ({args['size']})" if args.get("size") else args["item_name"]
+            lines.append(f"{label}: {response}")
+        return "\n".join(lines)
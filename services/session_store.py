@@ -0,0 +1,217 @@
+"""
+Session Store - Bounded per-conversation memory
+Keeps the last resolved products, size and tier of each conversation plus a
+short message window, with LRU, idle-timeout and memory-ceiling eviction
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional, Dict, Any, List, Tuple
+
+
+# Estimated bytes per session beyond its strings: the session object, its
+# deque and the store's dictionary entry
+SESSION_OVERHEAD_BYTES = 768
+
+# Estimated bytes per stored string beyond its characters (CPython str header)
+STRING_OVERHEAD_BYTES = 56
+
+# (item_name, size, intent) of one resolved inventory lookup
+InventoryCall = Tuple[str, Optional[str], Optional[str]]
+
+
+class Session:
+    """State remembered for one conversation"""
+    
+    __slots__ = ("tier", "inventory_calls", "messages", "last_seen", "footprint")
+    
+    def __init__(self, history_messages: int):
+        """
+        Args:
+            history_messages: Messages kept in the window (user and bot messages count separately)
+        """
+        self.tier: Optional[str] = None
+        self.inventory_calls: Tuple[InventoryCall, ...] = ()
+        self.messages: "deque[Tuple[str, str]]" = deque(maxlen=history_messages)
+        self.last_seen = time.monotonic()
+        self.footprint = SESSION_OVERHEAD_BYTES
+    
+    def inventory_arguments(self) -> List[Dict[str, Any]]:
+        """
+        Last resolved inventory lookups as get_inventory arguments
+        
+        Returns:
+            List of dictionaries with 'item_name' and optional 'size' and 'intent'
+        """
+        calls = []
+        for item_name, size, intent in self.inventory_calls:
+            arguments = {"item_name": item_name}
+            if size:
+                arguments["size"] = size
+            if intent:
+                arguments["intent"] = intent
+            calls.append(arguments)
+        return calls
+    
+    def _measure(self) -> int:
+        """Estimate the session's memory use in bytes"""
+        strings = [text for _, text in self.messages]
+        for call in self.inventory_calls:
+            strings.extend(value for value in call if value)
+        return SESSION_OVERHEAD_BYTES + sum(STRING_OVERHEAD_BYTES + len(text) for text in strings)
+
+
+class SessionStore:
+    """
+    Thread-safe store of conversation sessions
+    
+    Sessions are kept in least-recently-used order. Sessions idle for longer
+    than idle_timeout expire; when the store exceeds max_sessions or its
+    estimated memory exceeds max_bytes, the least recently used sessions are
+    evicted first.
+    """
+    
+    def __init__(self, max_sessions: int, idle_timeout: float, max_bytes: int,
+                 history_messages: int = 6, max_message_chars: int = 300):
+        """
+        Initialize the store
+        
+        Args:
+            max_sessions: Maximum number of sessions kept
+            idle_timeout: Seconds after its last message that a session expires
+            max_bytes: Ceiling on the estimated memory used by all sessions
+            history_messages: Messages kept per session
+            max_message_chars: Longer messages are truncated to this many characters
+        """
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+        self.history_messages = history_messages
+        self.max_message_chars = max_message_chars
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, session_id: str) -> Optional[Session]:
+        """
+        Look up a session and mark it as recently used
+        
+        Args:
+            session_id: Conversation identifier
+        
+        Returns:
+            The session, or None if it does not exist or has expired
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            
+            now = time.monotonic()
+            if now - session.last_seen > self.idle_timeout:
+                self._remove(session_id)
+                self.expirations += 1
+                return None
+            
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+            return session
+    
+    def record(self, session_id: str, query: str, response: str, tier: str,
+               inventory_calls: Optional[List[Dict[str, Any]]] = None):
+        """
+        Add a turn to a session, creating the session if needed
+        
+        The resolved tier always replaces the previous one; the remembered
+        products are only replaced when the turn looked up new ones.
+        
+        Args:
+            session_id: Conversation identifier
+            query: User's message
+            response: Bot's answer
+            tier: Tier that answered ('company_info', 'inventory' or 'unknown')
+            inventory_calls: get_inventory arguments the answer was looked up with
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(self.history_messages)
+                self._bytes += session.footprint
+            
+            session.tier = tier
+            if inventory_calls:
+                session.inventory_calls = tuple(
+                    (call["item_name"], call.get("size"), call.get("intent")) for call in inventory_calls
+                )
+            session.messages.append(("user", query[:self.max_message_chars]))
+            session.messages.append(("bot", response[:self.max_message_chars]))
+            session.last_seen = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            
+            footprint = session._measure()
+            self._bytes += footprint - session.footprint
+            session.footprint = footprint
+            
+            self._evict()
+    
+    def history(self, session_id: str) -> List[Tuple[str, str]]:
+        """
+        Get the message window of a session
+        
+        Args:
+            session_id: Conversation identifier
+        
+        Returns:
+            List of (role, text) pairs, oldest first; role is 'user' or 'bot'
+        """
+        session = self.get(session_id)
+        return list(session.messages) if session else []
+    
+    def drop(self, session_id: str):
+        """
+        Forget a session, e.g. when its connection closes
+        
+        Args:
+            session_id: Conversation identifier
+        """
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get store counters
+        
+        Returns:
+            Dictionary with sessions, estimated bytes, evictions and expirations
+        """
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+    
+    def _evict(self):
+        """Drop expired sessions, then least recently used ones until within both limits"""
+        # The oldest sessions are at the front, so expiry stops at the first live one
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_seen >= cutoff:
+                break
+            self._remove(session_id)
+            self.expirations += 1
+        
+        while len(self._sessions) > self.max_sessions or (self._bytes > self.max_bytes and len(self._sessions) > 1):
+            self._remove(next(iter(self._sessions)))
+            self.evictions += 1
+    
+    def _remove(self, session_id: str):
+        """Remove a session and release its share of the memory estimate"""
+        self._bytes -= self._sessions.pop(session_id).footprint
@@ -0,0 +1,238 @@
+"""
+Single Flight - Coalescing of identical in-flight work
+Concurrent callers asking for the same key share one execution and its result,
+whether they are threads or asyncio tasks on any event loop
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+from services.cassette import request_key
+from services.telemetry import telemetry
+import config
+
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """One in-flight execution and the callers waiting for it"""
+    
+    __slots__ = ("future", "waiters", "task", "loop")
+    
+    def __init__(self):
+        self.future: "concurrent.futures.Future[Any]" = concurrent.futures.Future()
+        self.waiters = 1
+        self.task: Optional["asyncio.Task[Any]"] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+class SingleFlight:
+    """
+    Runs at most one execution per key at a time
+    
+    The first caller for a key (the leader) runs the work; callers that
+    arrive while it is in flight wait for the same result or exception. The
+    key is forgotten as soon as the work finishes, so this never serves stale
+    results - unlike a cache, it only helps callers that overlap.
+    
+    Async work runs as a task on the leader's event loop and is only cancelled
+    once every async caller waiting for it has been cancelled, so a timed-out
+    caller never cancels the answer for the others.
+    """
+    
+    def __init__(self, enabled: bool = config.SINGLE_FLIGHT):
+        """
+        Args:
+            enabled: Coalesce identical work; when False every call runs on its own
+        """
+        self.enabled = enabled
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        
+        self.leaders = 0
+        self.coalesced = 0
+    
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """
+        Run fn, or wait for the identical call already in flight
+        
+        Args:
+            key: Identity of the work
+            fn: Zero-argument callable doing the work
+        
+        Returns:
+            fn's result (shared with the other callers)
+        """
+        if not self.enabled:
+            return fn()
+        
+        flight, leader = self._join(key)
+        if not leader:
+            telemetry.annotate(coalesced=True)
+            return flight.future.result()
+        
+        try:
+            result = fn()
+        except BaseException as e:
+            self._forget(key, flight)
+            flight.future.set_exception(e)
+            raise
+        self._forget(key, flight)
+        flight.future.set_result(result)
+        return result
+    
+    async def ado(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Async version of do
+        
+        Args:
+            key: Identity of the work
+            factory: Zero-argument callable returning the coroutine doing the work
+        
+        Returns:
+            The coroutine's result (shared with the other callers)
+        """
+        if not self.enabled:
+            return await factory()
+        
+        flight, leader = self._join(key)
+        if leader:
+            flight.loop = asyncio.get_running_loop()
+            flight.task = flight.loop.create_task(factory())
+            flight.task.add_done_callback(lambda task: self._settle(key, flight, task))
+        else:
+            telemetry.annotate(coalesced=True)
+        
+        try:
+            # Shielded, so cancelling one caller leaves the shared work running
+            if leader:
+                return await asyncio.shield(flight.task)
+            return await asyncio.shield(asyncio.wrap_future(flight.future))
+        except asyncio.CancelledError:
+            self._leave(key, flight)
+            raise
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters
+        
+        Returns:
+            Dictionary with in_flight, leaders (executions) and coalesced (callers that shared one)
+        """
+        with self._lock:
+            return {"in_flight": len(self._flights), "leaders": self.leaders, "coalesced": self.coalesced}
+    
+    def wrap(self, client):
+        """
+        Coalesce a client's identical non-streamed chat completions
+        
+        Args:
+            client: AzureOpenAI client
+        
+        Returns:
+            The client itself when disabled, otherwise a coalescing wrapper
+        """
+        if not self.enabled:
+            return client
+        return _CoalescingClient(client, _Completions(self, client))
+    
+    def wrap_async(self, client):
+        """
+        Async version of wrap
+        
+        Args:
+            client: AsyncAzureOpenAI client
+        
+        Returns:
+            The client itself or its coalescing wrapper
+        """
+        if not self.enabled:
+            return client
+        return _CoalescingClient(client, _AsyncCompletions(self, client))
+    
+    def _join(self, key: Hashable) -> Tuple[_Flight, bool]:
+        """Join the flight for a key, starting one if there is none; returns (flight, is_leader)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.coalesced += 1
+                return flight, False
+            
+            flight = self._flights[key] = _Flight()
+            self.leaders += 1
+            return flight, True
+    
+    def _forget(self, key: Hashable, flight: _Flight):
+        """Stop handing out a flight to new callers"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+    
+    def _settle(self, key: Hashable, flight: _Flight, task: "asyncio.Task[Any]"):
+        """Pass an async flight's outcome to its waiters on any loop or thread"""
+        self._forget(key, flight)
+        if task.cancelled():
+            flight.future.cancel()
+        elif task.exception() is not None:
+            flight.future.set_exception(task.exception())
+        else:
+            flight.future.set_result(task.result())
+    
+    def _leave(self, key: Hashable, flight: _Flight):
+        """Drop a cancelled caller, cancelling the work if nobody is left waiting for it"""
+        with self._lock:
+            flight.waiters -= 1
+            abandoned = flight.waiters == 0 and flight.task is not None
+            if abandoned and self._flights.get(key) is flight:
+                del self._flights[key]
+        
+        if abandoned:
+            flight.loop.call_soon_threadsafe(flight.task.cancel)
+
+
+class _CoalescingClient:
+    """Client wrapper exposing chat.completions through single flight"""
+    
+    def __init__(self, client, completions):
+        self._client = client
+        self.chat = _Chat(completions)
+    
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class _Chat:
+    """Stand-in for client.chat"""
+    
+    def __init__(self, completions):
+        self.completions = completions
+
+
+class _Completions:
+    """Stand-in for client.chat.completions that coalesces identical create() calls"""
+    
+    def __init__(self, flights: SingleFlight, client):
+        self.flights = flights
+        self.client = client
+    
+    def create(self, **request):
+        # A stream can only be read once, so streamed requests are never shared
+        if request.get("stream"):
+            return self.client.chat.completions.create(**request)
+        return self.flights.do(request_key(request), lambda: self.client.chat.completions.create(**request))
+
+
+class _AsyncCompletions(_Completions):
+    """Async version of _Completions"""
+    
+    async def create(self, **request):
+        if request.get("stream"):
+            return await self.client.chat.completions.create(**request)
+        return await self.flights.ado(request_key(request), lambda: self.client.chat.completions.create(**request))
+
+
+# Process-wide coalescing of identical LLM requests, shared by every client
+llm_flights = SingleFlight()
@@ -0,0 +1,273 @@
+"""
+Stock Writer - Batched inventory writes
+Applies stock changes on a single writer thread, group-committing the updates
+of concurrent callers in short BEGIN IMMEDIATE transactions
+"""
+
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, List, Callable
+from services.db_connection import ConnectionManager
+from services.telemetry import telemetry
+import config
+
+
+# The stock condition is checked by the UPDATE itself, under the write lock,
+# so concurrent reservations can never take stock below zero
+UPDATE_STOCK_SQL = f"""
+    UPDATE {config.DB_TABLE_NAME}
+    SET stock_count = stock_count + ?
+    WHERE item_name = ? COLLATE NOCASE AND size = ? COLLATE NOCASE AND stock_count + ? >= 0
+"""
+STOCK_SQL = f"""
+    SELECT stock_count
+    FROM {config.DB_TABLE_NAME}
+    WHERE item_name = ? COLLATE NOCASE AND size = ? COLLATE NOCASE
+"""
+
+# Outcome of one stock change
+APPLIED = "applied"
+INSUFFICIENT_STOCK = "insufficient_stock"
+NOT_FOUND = "not_found"
+ROLLED_BACK = "rolled_back"
+FAILED = "failed"
+
+
+class _Job:
+    """One caller's updates, waiting for the writer thread"""
+    
+    __slots__ = ("updates", "atomic", "future")
+    
+    def __init__(self, updates: List[Dict[str, Any]], atomic: bool):
+        self.updates = updates
+        self.atomic = atomic
+        self.future: "Future[List[Dict[str, Any]]]" = Future()
+
+
+class StockWriter:
+    """
+    Serializes stock changes through one read-write connection
+    
+    Callers queue their updates and wait; the writer thread takes every job
+    queued so far and applies them in one transaction, so concurrent writes
+    share a single commit. Each job runs in its own savepoint, so a job that
+    fails is undone without failing the rest of its batch. Transactions
+    start with BEGIN IMMEDIATE and only run SQL, so the write lock is held
+    for milliseconds and never across an LLM call. In WAL mode readers keep
+    reading the last committed data while a batch is written.
+    """
+    
+    def __init__(self, connections: ConnectionManager,
+                 max_batch: int = config.INVENTORY_WRITE_BATCH,
+                 max_wait: float = config.INVENTORY_WRITE_WAIT_MS / 1000,
+                 on_commit: Optional[Callable[[List[Dict[str, Any]]], None]] = None):
+        """
+        Initialize the writer; its thread starts on the first write
+        
+        Args:
+            connections: Connection manager whose writer connection is used
+            max_batch: Most updates committed in one transaction
+            max_wait: Seconds to wait for more jobs before committing a batch
+            on_commit: Called on the writer thread after each commit, before the
+                       callers are answered, with the results of the applied updates
+        """
+        self.connections = connections
+        self.on_commit = on_commit
+        self.max_batch = max(max_batch, 1)
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        
+        self.transactions = 0
+        self.updates = 0
+    
+    def submit(self, updates: List[Dict[str, Any]], atomic: bool = False) -> "Future[List[Dict[str, Any]]]":
+        """
+        Queue stock updates without waiting for them
+        
+        Args:
+            updates: List of dictionaries with 'item_name', 'size' and 'delta'
+                     (negative to take stock, positive to add it)
+            atomic: Apply all of the updates or none of them
+        
+        Returns:
+            Future for one result per update, in order (see apply)
+        
+        Raises:
+            ValueError: If an update has no item_name or size, or a non-integer delta
+        """
+        for update in updates:
+            if not update.get("item_name") or not update.get("size"):
+                raise ValueError("Stock updates need an item_name and a size")
+            if not isinstance(update.get("delta"), int) or isinstance(update["delta"], bool):
+                raise ValueError(f"Stock update delta must be an integer, got {update.get('delta')!r}")
+        
+        job = _Job(updates, atomic)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stock-writer", daemon=True)
+                self._thread.start()
+            self._queue.put(job)
+        return job.future
+    
+    def apply(self, updates: List[Dict[str, Any]], atomic: bool = False,
+              timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Apply stock updates and wait until they are committed
+        
+        Args:
+            updates: List of dictionaries with 'item_name', 'size' and 'delta'
+            atomic: Apply all of the updates or none of them
+            timeout: Seconds to wait for the commit (optional)
+        
+        Returns:
+            One dictionary per update with 'item_name', 'size', 'delta',
+            'status' and 'stock_count'. status is 'applied', 'insufficient_stock'
+            (nothing changed), 'not_found' or, for atomic batches with a
+            conflict, 'rolled_back'. stock_count is the count after the update,
+            or the current count when it was not applied.
+        
+        Raises:
+            sqlite3.Error: If the transaction could not be committed
+        """
+        return self.submit(updates, atomic).result(timeout)
+    
+    def close(self):
+        """Commit the queued jobs and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+    
+    def _run(self):
+        """Writer thread: commit queued jobs in batches until stopped"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            
+            jobs, size = [job], len(job.updates)
+            stop = False
+            while size < self.max_batch:
+                try:
+                    job = self._queue.get(timeout=self.max_wait) if self.max_wait > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                jobs.append(job)
+                size += len(job.updates)
+            
+            self._commit(jobs)
+            if stop:
+                return
+    
+    def _commit(self, jobs: List[_Job]):
+        """Apply a batch of jobs in one transaction and resolve their futures"""
+        # Each job's results, or the exception it failed with
+        outcomes: List[Any] = []
+        try:
+            with telemetry.span("sqlite.write_batch", jobs=len(jobs)) as span:
+                conn = None
+                try:
+                    conn = self.connections.writer()
+                    conn.execute("BEGIN IMMEDIATE")
+                    outcomes = [self._apply_isolated(conn, job) for job in jobs]
+                    conn.execute("COMMIT")
+                except Exception as e:
+                    span.fail(e)
+                    outcomes = [e] * len(jobs)
+                    self._rollback(conn)
+                else:
+                    updates = sum(len(job.updates) for job, outcome in zip(jobs, outcomes)
+                                  if not isinstance(outcome, Exception))
+                    span.set(updates=updates)
+                    self.transactions += 1
+                    self.updates += updates
+                    self._notify(outcomes)
+        finally:
+            # Whatever went wrong above, no caller may be left waiting
+            for index, job in enumerate(jobs):
+                outcome = outcomes[index] if index < len(outcomes) else \
+                    RuntimeError("Stock write batch was interrupted")
+                if isinstance(outcome, BaseException):
+                    job.future.set_exception(outcome)
+                else:
+                    job.future.set_result(outcome)
+    
+    def _notify(self, outcomes: List[Any]):
+        """Pass the committed stock counts to on_commit"""
+        if self.on_commit is None:
+            return
+        applied = [
+            result
+            for outcome in outcomes if not isinstance(outcome, Exception)
+            for result in outcome if result["status"] == APPLIED
+        ]
+        if not applied:
+            return
+        try:
+            self.on_commit(applied)
+        except Exception as e:
+            print(f"Inventory Write Error: commit listener failed: {e}")
+    
+    def _rollback(self, conn: Optional[sqlite3.Connection]):
+        """Roll back a failed batch, reopening the writer connection if even that fails"""
+        if conn is None:
+            return
+        try:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+        except sqlite3.Error as e:
+            print(f"Inventory Write Error: rollback failed: {e}")
+            self.connections.reset_writer()
+    
+    def _apply_isolated(self, conn: sqlite3.Connection, job: _Job) -> Any:
+        """Apply one job inside its own savepoint, returning its results or its error"""
+        conn.execute("SAVEPOINT stock_job")
+        try:
+            results = self._apply_job(conn, job)
+        except sqlite3.Error as e:
+            # Undo this job only; the other jobs of the batch still commit
+            conn.execute("ROLLBACK TO stock_job")
+            conn.execute("RELEASE stock_job")
+            return e
+        conn.execute("RELEASE stock_job")
+        return results
+    
+    @staticmethod
+    def _apply_job(conn: sqlite3.Connection, job: _Job) -> List[Dict[str, Any]]:
+        """Apply one caller's updates inside its savepoint (see _apply_isolated)"""
+        results = []
+        for update in job.updates:
+            item_name, size, delta = update["item_name"], update["size"], update["delta"]
+            applied = conn.execute(UPDATE_STOCK_SQL, (delta, item_name, size, delta)).rowcount > 0
+            row = conn.execute(STOCK_SQL, (item_name, size)).fetchone()
+            
+            if applied:
+                status = APPLIED
+            else:
+                status = INSUFFICIENT_STOCK if row else NOT_FOUND
+            results.append({
+                "item_name": item_name,
+                "size": size,
+                "delta": delta,
+                "status": status,
+                "stock_count": row[0] if row else None
+            })
+        
+        # An atomic job with a conflict undoes its own updates
+        if job.atomic and any(result["status"] != APPLIED for result in results):
+            conn.execute("ROLLBACK TO stock_job")
+            for result in results:
+                if result["status"] == APPLIED:
+                    result["status"] = ROLLED_BACK
+                    result["stock_count"] = conn.execute(STOCK_SQL, (result["item_name"], result["size"])).fetchone()[0]
+        
+        return results
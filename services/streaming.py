@@ -0,0 +1,120 @@
+"""
+Streaming Helpers
+Read a classification label from a streamed chat completion and stop early
+"""
+
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+
+# Asks for a final chunk carrying the token usage, which streams otherwise omit
+USAGE_STREAM_OPTIONS: Dict[str, Any] = {"stream_options": {"include_usage": True}}
+
+
+def match_label(text: str, labels: Sequence[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Decide whether a partial completion already determines its label
+    
+    Args:
+        text: Completion text received so far
+        labels: Every label the model may answer with
+    
+    Returns:
+        (done, label): done is True once no further text can change the
+        outcome; label is the matched label, or None if the text cannot
+        become any valid label
+    """
+    prefix = text.strip().strip("\"'`.").lower()
+    if not prefix:
+        return False, None
+    
+    # The text already contains a complete label (longest first so
+    # "company_info" is not mistaken for a shorter label it starts with)
+    for label in sorted(labels, key=len, reverse=True):
+        if prefix.startswith(label):
+            return True, label
+    
+    candidates = [label for label in labels if label.startswith(prefix)]
+    if len(candidates) == 1:
+        return True, candidates[0]
+    if not candidates:
+        return True, None
+    return False, None
+
+
+def read_label(stream, labels: Sequence[str], on_usage: Optional[Callable[[Any], None]] = None) -> Optional[str]:
+    """
+    Consume a streamed completion until its label is determined, then close it
+    
+    Args:
+        stream: Stream returned by chat.completions.create(stream=True)
+        labels: Every label the model may answer with
+        on_usage: Called with the chunk carrying the token usage (see
+                  USAGE_STREAM_OPTIONS). When given, the rest of the stream
+                  (at most max_tokens) is read for it after the label is known.
+    
+    Returns:
+        Matched label, or None if the completion is not a valid label
+    """
+    reader = _LabelReader(labels, on_usage)
+    try:
+        for chunk in stream:
+            if reader.feed(chunk):
+                break
+    finally:
+        stream.close()
+    return reader.label()
+
+
+async def aread_label(stream, labels: Sequence[str],
+                      on_usage: Optional[Callable[[Any], None]] = None) -> Optional[str]:
+    """
+    Async version of read_label
+    
+    Args:
+        stream: AsyncStream returned by chat.completions.create(stream=True)
+        labels: Every label the model may answer with
+        on_usage: Called with the chunk carrying the token usage
+    
+    Returns:
+        Matched label, or None if the completion is not a valid label
+    """
+    reader = _LabelReader(labels, on_usage)
+    try:
+        async for chunk in stream:
+            if reader.feed(chunk):
+                break
+    finally:
+        await stream.close()
+    return reader.label()
+
+
+class _LabelReader:
+    """Label matching state shared by read_label and aread_label"""
+    
+    def __init__(self, labels: Sequence[str], on_usage: Optional[Callable[[Any], None]]):
+        self.labels = labels
+        self.on_usage = on_usage
+        self.text = ""
+        self.done = False
+        self.matched: Optional[str] = None
+    
+    def feed(self, chunk) -> bool:
+        """Take one chunk; returns True once nothing more needs to be read"""
+        if getattr(chunk, "usage", None) is not None and self.on_usage is not None:
+            self.on_usage(chunk)
+            return True
+        if not self.done:
+            self.text += _delta_text(chunk)
+            self.done, self.matched = match_label(self.text, self.labels)
+        return self.done and self.on_usage is None
+    
+    def label(self) -> Optional[str]:
+        """The matched label, judged on the whole text if the stream ended first"""
+        return self.matched if self.done else match_label(self.text, self.labels)[1]
+
+
+def _delta_text(chunk) -> str:
+    """Text carried by one streamed chunk (Azure may send chunks with no choices)"""
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
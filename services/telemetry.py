@@ -0,0 +1,260 @@
+"""
+Telemetry - Request tracing and metrics
+Timing spans for LLM calls, SQLite queries and routing, exported as
+Prometheus text and structured JSON logs
+"""
+
+import contextvars
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple
+import config
+
+
+# Histogram bucket upper bounds in seconds
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Span currently open in this thread or task
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation, nested under the span that was open when it started"""
+    
+    def __init__(self, telemetry: "Telemetry", name: str, attributes: Dict[str, Any]):
+        """
+        Args:
+            telemetry: Telemetry instance the span reports to
+            name: Operation name, e.g. "llm.route_intent"
+            attributes: Initial span attributes
+        """
+        parent = _current_span.get()
+        self.telemetry = telemetry
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent else None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.duration = 0.0
+        self._start = 0.0
+        self._token = None
+    
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self._start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            if issubclass(exc_type, (GeneratorExit, KeyboardInterrupt)) or exc_type.__name__ == "CancelledError":
+                self.status = "cancelled"
+            else:
+                self.fail(exc)
+        self.telemetry.record(self)
+        return False
+    
+    def set(self, **attributes):
+        """Add or replace span attributes"""
+        self.attributes.update(attributes)
+    
+    def fail(self, error: BaseException):
+        """
+        Mark the span as failed, e.g. from an except block that handles the error
+        
+        Args:
+            error: The exception that was raised
+        """
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+    
+    def record_usage(self, response):
+        """
+        Record token usage from a chat completion response
+        
+        Args:
+            response: Chat completion response (streams carry no usage and are skipped)
+        """
+        # A coalesced call shares another span's response, whose tokens that span already counts
+        usage = getattr(response, "usage", None)
+        if usage is not None and not self.attributes.get("coalesced"):
+            self.attributes["prompt_tokens"] = getattr(usage, "prompt_tokens", 0) or 0
+            self.attributes["completion_tokens"] = getattr(usage, "completion_tokens", 0) or 0
+
+
+class _NoopSpan:
+    """Span stand-in used when telemetry is disabled"""
+    
+    def __enter__(self) -> "_NoopSpan":
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        return False
+    
+    def set(self, **attributes):
+        pass
+    
+    def fail(self, error: BaseException):
+        pass
+    
+    def record_usage(self, response):
+        pass
+
+
+class Telemetry:
+    """Collects finished spans into Prometheus metrics and JSON log lines"""
+    
+    def __init__(self, enabled: bool = config.TELEMETRY_ENABLED,
+                 json_logs: bool = config.TELEMETRY_JSON_LOGS,
+                 log_path: Optional[str] = config.TELEMETRY_LOG_PATH):
+        """
+        Initialize telemetry
+        
+        Args:
+            enabled: Record spans and metrics at all
+            json_logs: Write every finished span as a JSON log line
+            log_path: File for the JSON log lines (default: stderr)
+        """
+        self.enabled = enabled
+        self.json_logs = json_logs
+        self._lock = threading.Lock()
+        
+        # (span name, status) -> [bucket counts..., overflow count, count, sum]
+        self._durations: Dict[Tuple[str, str], List[float]] = {}
+        # (span name, token type) -> tokens
+        self._tokens: Dict[Tuple[str, str], int] = {}
+        # tier -> routed queries
+        self._tiers: Dict[str, int] = {}
+        
+        self.logger = logging.getLogger("chatbot.telemetry")
+        if json_logs and not self.logger.handlers:
+            handler = logging.FileHandler(log_path, encoding="utf-8") if log_path else logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+    
+    def span(self, name: str, **attributes):
+        """
+        Time an operation
+        
+        Usage:
+            with telemetry.span("llm.route_intent", model=model) as span:
+                response = client.chat.completions.create(...)
+                span.record_usage(response)
+        
+        Args:
+            name: Operation name
+            **attributes: Initial span attributes
+        
+        Returns:
+            Context manager yielding the Span
+        """
+        if not self.enabled:
+            return _NoopSpan()
+        return Span(self, name, attributes)
+    
+    @staticmethod
+    def annotate(**attributes):
+        """Add attributes to the span open in the current thread or task, if any"""
+        span = _current_span.get()
+        if span is not None:
+            span.set(**attributes)
+    
+    def record(self, span: Span):
+        """
+        Add a finished span to the metrics and the JSON log
+        
+        Args:
+            span: Finished span
+        """
+        with self._lock:
+            histogram = self._durations.get((span.name, span.status))
+            if histogram is None:
+                histogram = self._durations[(span.name, span.status)] = [0] * (len(DURATION_BUCKETS) + 3)
+            histogram[bisect_left(DURATION_BUCKETS, span.duration)] += 1
+            histogram[-2] += 1
+            histogram[-1] += span.duration
+            
+            for token_type in ("prompt", "completion"):
+                tokens = span.attributes.get(f"{token_type}_tokens")
+                if tokens:
+                    key = (span.name, token_type)
+                    self._tokens[key] = self._tokens.get(key, 0) + tokens
+            
+            tier = span.attributes.get("tier")
+            if tier and span.name == "route_query":
+                self._tiers[tier] = self._tiers.get(tier, 0) + 1
+        
+        if self.json_logs:
+            entry = {
+                "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "trace_id": span.trace_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "duration_ms": round(span.duration * 1000, 3),
+                "status": span.status
+            }
+            if span.error:
+                entry["error"] = span.error
+            entry.update(span.attributes)
+            self.logger.info(json.dumps(entry, default=str))
+    
+    def render_prometheus(self) -> str:
+        """
+        Export the metrics in the Prometheus text exposition format
+        
+        Returns:
+            Metrics text
+        """
+        with self._lock:
+            durations = {key: list(value) for key, value in self._durations.items()}
+            tokens = dict(self._tokens)
+            tiers = dict(self._tiers)
+        
+        lines = [
+            "# HELP chatbot_span_duration_seconds Duration of traced operations",
+            "# TYPE chatbot_span_duration_seconds histogram"
+        ]
+        for (name, status), histogram in sorted(durations.items()):
+            labels = f'span="{name}",status="{status}"'
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, histogram):
+                cumulative += count
+                lines.append(f'chatbot_span_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'chatbot_span_duration_seconds_bucket{{{labels},le="+Inf"}} {int(histogram[-2])}')
+            lines.append(f"chatbot_span_duration_seconds_count{{{labels}}} {int(histogram[-2])}")
+            lines.append(f"chatbot_span_duration_seconds_sum{{{labels}}} {histogram[-1]:.6f}")
+        
+        lines.append("# HELP chatbot_llm_tokens_total Tokens used by LLM calls")
+        lines.append("# TYPE chatbot_llm_tokens_total counter")
+        for (name, token_type), count in sorted(tokens.items()):
+            lines.append(f'chatbot_llm_tokens_total{{span="{name}",type="{token_type}"}} {count}')
+        
+        lines.append("# HELP chatbot_routed_queries_total Queries answered, by final tier")
+        lines.append("# TYPE chatbot_routed_queries_total counter")
+        for tier, count in sorted(tiers.items()):
+            lines.append(f'chatbot_routed_queries_total{{tier="{tier}"}} {count}')
+        
+        return "\n".join(lines) + "\n"
+    
+    def reset(self):
+        """Clear all collected metrics"""
+        with self._lock:
+            self._durations.clear()
+            self._tokens.clear()
+            self._tiers.clear()
+
+
+# Process-wide telemetry shared by every service
+telemetry = Telemetry()
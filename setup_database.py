@@ -1,11 +1,326 @@
 """
 Database Setup Script
-Initializes the inventory database using inventory_setup.sql
+Initializes the inventory database using inventory_setup.sql, migrates its
+schema, and bulk-imports catalog feeds from CSV or JSONL files
 """
 
+import argparse
+import csv
+import json
 import sqlite3
 import os
+import time
+from itertools import islice
 from pathlib import Path
+from typing import Optional, Dict, Iterator, List, Tuple
+import config
+
+
+# Earliest row and total stock of each (item_name, size) group with case-variant duplicates
+DUPLICATE_GROUPS_SQL = """
+    SELECT MIN(id) AS id, SUM(stock_count) AS stock_count
+    FROM product_inventory
+    GROUP BY item_name COLLATE NOCASE, size COLLATE NOCASE
+    HAVING COUNT(*) > 1
+"""
+
+# Schema migrations, applied in order to bring PRAGMA user_version up to date
+MIGRATIONS = [
+    (1, [
+        # Rows that differ only in case (e.g. 'Tech-Knit Hoodie' / 'tech-knit hoodie', 'M')
+        # would make the unique index fail, so merge each group into its earliest
+        # row first: stock counts are added up and that row's price is kept
+        f"""UPDATE product_inventory SET stock_count = merged.stock_count
+           FROM ({DUPLICATE_GROUPS_SQL}) AS merged
+           WHERE product_inventory.id = merged.id""",
+        """DELETE FROM product_inventory WHERE id NOT IN (
+               SELECT MIN(id) FROM product_inventory GROUP BY item_name COLLATE NOCASE, size COLLATE NOCASE
+           )""",
+        # Case-insensitive composite index used by InventoryService lookups
+        # (WHERE item_name = ? COLLATE NOCASE AND size = ? COLLATE NOCASE)
+        # and by catalog upserts (ON CONFLICT)
+        """CREATE UNIQUE INDEX IF NOT EXISTS idx_product_inventory_item_size
+           ON product_inventory (item_name COLLATE NOCASE, size COLLATE NOCASE)"""
+    ]),
+]
+
+
+# Catalog rows are loaded into this table, then swapped or merged into
+# product_inventory in one transaction
+IMPORT_TABLE = "product_inventory_import"
+
+IMPORT_COLUMNS = ("item_name", "size", "stock_count", "price_gbp")
+
+# Rows inserted per executemany transaction while streaming a catalog file
+IMPORT_CHUNK_SIZE = 10000
+
+# Print import progress every this many rows
+IMPORT_PROGRESS_ROWS = 100000
+
+# Invalid rows reported individually before only being counted
+MAX_REPORTED_REJECTS = 5
+
+# (item_name, size, stock_count, price_gbp)
+CatalogRow = Tuple[str, str, int, float]
+
+
+def migrate_database(conn: sqlite3.Connection) -> int:
+    """
+    Apply any pending schema migrations
+    
+    Args:
+        conn: Open connection to the inventory database
+    
+    Returns:
+        Number of migrations applied
+    """
+    current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    applied = 0
+    
+    for version, statements in MIGRATIONS:
+        if version <= current_version:
+            continue
+        
+        with conn:
+            changes = conn.total_changes
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+        
+        print(f"🔄 Applied schema migration {version} ({conn.total_changes - changes} rows changed)")
+        applied += 1
+    
+    return applied
+
+
+def enable_wal(conn: sqlite3.Connection):
+    """
+    Switch the database to WAL journal mode if SQLITE_WAL is enabled
+    
+    In WAL mode the chatbot's lookups never block its stock writer. The mode
+    is persistent in the database file, so it is set here rather than every
+    time the chatbot starts.
+    
+    Args:
+        conn: Open read-write connection to the inventory database
+    """
+    if not config.SQLITE_WAL:
+        return
+    
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError as e:
+        # Read-only media or a locked database: keep the current journal mode
+        print(f"⚠️  Could not enable WAL mode: {e}")
+
+
+def run_migrations():
+    """Migrate an existing inventory database without reloading its data"""
+    
+    db_path = Path("inventory.db")
+    
+    if not db_path.exists():
+        print(f"❌ Error: {db_path} not found!")
+        return False
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        applied = migrate_database(conn)
+        enable_wal(conn)
+        conn.close()
+        
+        if not applied:
+            print("✅ Database schema is already up to date")
+        return True
+    
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+        return False
+
+
+def read_catalog(source: Path, rejects: List[str]) -> Iterator[CatalogRow]:
+    """
+    Stream catalog rows from a CSV file with a header row or a JSONL file
+    
+    Files are read one line at a time, so memory use does not grow with the
+    file size.
+    
+    Args:
+        source: .csv or .jsonl file with item_name, size, stock_count and price_gbp
+        rejects: Receives one message per invalid row, which is skipped
+    
+    Returns:
+        Iterator of (item_name, size, stock_count, price_gbp)
+    """
+    suffix = source.suffix.lower()
+    if suffix not in (".csv", ".jsonl", ".ndjson"):
+        raise ValueError(f"Unsupported catalog format '{suffix}', expected .csv or .jsonl")
+    
+    with open(source, "r", encoding="utf-8", newline="") as f:
+        if suffix == ".csv":
+            reader = csv.DictReader(f)
+            missing = [column for column in IMPORT_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"Catalog is missing column(s): {', '.join(missing)}")
+            records = enumerate(reader, start=2)
+        else:
+            records = ((number, line) for number, line in enumerate(f, start=1) if line.strip())
+        
+        for number, record in records:
+            try:
+                if suffix != ".csv":
+                    record = json.loads(record)
+                yield parse_catalog_row(record)
+            except (ValueError, TypeError, AttributeError) as e:
+                rejects.append(f"line {number}: {e}")
+
+
+def parse_catalog_row(record: Dict) -> CatalogRow:
+    """
+    Validate one catalog record
+    
+    Args:
+        record: Mapping with item_name, size, stock_count and price_gbp
+    
+    Returns:
+        (item_name, size, stock_count, price_gbp)
+    
+    Raises:
+        ValueError: If a field is missing or invalid
+    """
+    item_name = str(record.get("item_name") or "").strip()
+    size = str(record.get("size") or "").strip()
+    if not item_name or not size:
+        raise ValueError("item_name and size are required")
+    
+    stock_count = int(str(record.get("stock_count")).strip())
+    price = float(str(record.get("price_gbp")).strip())
+    if stock_count < 0 or price < 0:
+        raise ValueError("stock_count and price_gbp cannot be negative")
+    return item_name, size, stock_count, price
+
+
+def import_catalog(source: Path, db_path: Path = Path("inventory.db"), upsert: bool = False,
+                   chunk_size: int = IMPORT_CHUNK_SIZE) -> Optional[Dict[str, float]]:
+    """
+    Bulk-load a catalog feed into product_inventory
+    
+    Rows are streamed into an unindexed shadow table in chunked executemany
+    transactions. Duplicate (item_name, size) rows keep the last one. The
+    shadow table then replaces product_inventory (or, with upsert, is merged
+    into it) in a single transaction, and the unique index is built there, so
+    live lookups see either the old catalog or the new one, never a partial load.
+    
+    Args:
+        source: .csv or .jsonl catalog file
+        db_path: Inventory database
+        upsert: Update or insert the imported rows, keyed on (item_name, size),
+                instead of replacing the whole catalog
+        chunk_size: Rows per insert transaction
+    
+    Returns:
+        Dictionary with rows (imported, after duplicates are dropped), duplicates,
+        rejected, seconds and rows_per_second (rows read per second), or None on error
+    """
+    if not source.exists():
+        print(f"❌ Error: {source} not found!")
+        return None
+    if not db_path.exists():
+        print(f"❌ Error: {db_path} not found! Run 'python setup_database.py' first")
+        return None
+    
+    start = time.perf_counter()
+    rejects: List[str] = []
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    
+    try:
+        # Loading only appends to the shadow table, so commits need not fsync each chunk
+        conn.execute("PRAGMA busy_timeout = 5000")
+        enable_wal(conn)
+        conn.execute("PRAGMA synchronous = NORMAL")
+        
+        conn.execute(f"DROP TABLE IF EXISTS {IMPORT_TABLE}")
+        conn.execute(f"""CREATE TABLE {IMPORT_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_name TEXT NOT NULL,
+            size TEXT NOT NULL,
+            stock_count INTEGER NOT NULL,
+            price_gbp DECIMAL(10, 2) NOT NULL
+        )""")
+        
+        insert_sql = f"INSERT INTO {IMPORT_TABLE} (item_name, size, stock_count, price_gbp) VALUES (?, ?, ?, ?)"
+        rows = read_catalog(source, rejects)
+        loaded = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            conn.execute("BEGIN")
+            conn.executemany(insert_sql, chunk)
+            conn.execute("COMMIT")
+            
+            previous, loaded = loaded, loaded + len(chunk)
+            if loaded // IMPORT_PROGRESS_ROWS > previous // IMPORT_PROGRESS_ROWS:
+                print(f"   ... {loaded:,} rows ({loaded / (time.perf_counter() - start):,.0f} rows/s)")
+        
+        for message in rejects[:MAX_REPORTED_REJECTS]:
+            print(f"⚠️  Skipped invalid row at {message}")
+        
+        if not loaded:
+            conn.execute(f"DROP TABLE {IMPORT_TABLE}")
+            print("❌ Error: no valid rows to import")
+            return None
+        
+        # Last row wins for duplicate keys, so the unique index can be built
+        duplicates = conn.execute(f"""DELETE FROM {IMPORT_TABLE} WHERE id NOT IN (
+            SELECT MAX(id) FROM {IMPORT_TABLE} GROUP BY item_name COLLATE NOCASE, size COLLATE NOCASE
+        )""").rowcount
+        imported = loaded - duplicates
+        
+        # Swap or merge atomically; readers keep seeing the old catalog until COMMIT
+        conn.execute("BEGIN IMMEDIATE")
+        if upsert:
+            conn.execute(f"""INSERT INTO product_inventory (item_name, size, stock_count, price_gbp)
+                SELECT item_name, size, stock_count, price_gbp FROM {IMPORT_TABLE} WHERE true ORDER BY id
+                ON CONFLICT (item_name COLLATE NOCASE, size COLLATE NOCASE)
+                DO UPDATE SET stock_count = excluded.stock_count, price_gbp = excluded.price_gbp""")
+            conn.execute(f"DROP TABLE {IMPORT_TABLE}")
+        else:
+            conn.execute("DROP TABLE IF EXISTS product_inventory")
+            conn.execute(f"ALTER TABLE {IMPORT_TABLE} RENAME TO product_inventory")
+            # The old table's indexes went with it; rebuild them on the loaded rows
+            for _, statements in MIGRATIONS:
+                for statement in statements:
+                    conn.execute(statement)
+        conn.execute("COMMIT")
+        
+        seconds = time.perf_counter() - start
+        stats = {
+            "rows": imported,
+            "duplicates": duplicates,
+            "rejected": len(rejects),
+            "seconds": seconds,
+            "rows_per_second": loaded / seconds if seconds else 0.0
+        }
+        total = conn.execute("SELECT COUNT(*) FROM product_inventory").fetchone()[0]
+        
+        print(f"✅ {'Upserted' if upsert else 'Imported'} {imported:,} rows from {source} "
+              f"in {seconds:.1f}s ({stats['rows_per_second']:,.0f} rows/s)")
+        if duplicates:
+            print(f"🔁 {duplicates:,} duplicate row(s) replaced by a later row for the same product and size")
+        if rejects:
+            print(f"⚠️  Skipped {len(rejects):,} invalid row(s)")
+        print(f"📦 product_inventory now holds {total:,} products")
+        return stats
+    
+    except (sqlite3.Error, ValueError, OSError) as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.execute(f"DROP TABLE IF EXISTS {IMPORT_TABLE}")
+        print(f"❌ Import error: {e}")
+        return None
+    finally:
+        conn.close()
 
 
 def setup_database():
@@ -33,6 +348,10 @@ def setup_database():
         cursor.executescript(sql_script)
         conn.commit()
         
+        # Bring the freshly created schema up to the latest version
+        migrate_database(conn)
+        enable_wal(conn)
+        
         # Verify data was inserted
         cursor.execute("SELECT COUNT(*) FROM product_inventory")
         count = cursor.fetchone()[0]
@@ -61,7 +380,7 @@ def setup_database():
         conn.close()
         
         return True
-        
+    
     except sqlite3.Error as e:
         print(f"❌ Database error: {e}")
         return False
@@ -71,12 +390,28 @@ def setup_database():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inventory database setup")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Upgrade the existing database in place instead of reloading it")
+    parser.add_argument("--import", dest="catalog", type=Path, metavar="FILE",
+                        help="Replace the catalog with the rows of a .csv or .jsonl file")
+    parser.add_argument("--upsert", action="store_true",
+                        help="With --import, update or add the file's rows instead of replacing the catalog")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE,
+                        help=f"Rows per insert transaction when importing (default: {IMPORT_CHUNK_SIZE})")
+    args = parser.parse_args()
+    
     print("=" * 70)
     print("🔧 Inventory Database Setup")
     print("=" * 70)
     print()
     
-    success = setup_database()
+    if args.migrate:
+        success = run_migrations()
+    elif args.catalog:
+        success = import_catalog(args.catalog, upsert=args.upsert, chunk_size=max(args.chunk_size, 1)) is not None
+    else:
+        success = setup_database()
     
     if success:
         print("\n✨ Database is ready to use!")
@@ -0,0 +1,43 @@
+"""
+Tests for per-thread connection cleanup
+Run with: python -m unittest discover tests
+"""
+
+import sqlite3
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from services.db_connection import ConnectionManager
+
+
+class ConnectionManagerTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        db_path = Path(directory.name) / "inventory.db"
+        sqlite3.connect(db_path).close()
+        
+        self.connections = ConnectionManager(str(db_path))
+        self.addCleanup(self.connections.close_all)
+    
+    def reader_from_new_thread(self):
+        opened = []
+        thread = threading.Thread(target=lambda: opened.append(self.connections.reader()))
+        thread.start()
+        thread.join()
+        return opened[0]
+    
+    def test_connections_of_exited_threads_are_closed(self):
+        first = self.reader_from_new_thread()
+        # The second thread may well be given the first one's (reused) ident
+        second = self.reader_from_new_thread()
+        
+        with self.assertRaises(sqlite3.ProgrammingError):
+            first.execute("SELECT 1")
+        self.assertEqual(len(self.connections._connections), 1)
+        second.execute("SELECT 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Tests for bulk catalog imports
+Run with: python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from setup_database import import_catalog, IMPORT_TABLE
+from tests.test_inventory_service import SETUP_SQL
+
+
+HEADER = "item_name,size,stock_count,price_gbp\n"
+
+
+class ImportCatalogTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.db_path = self.directory / "inventory.db"
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(SETUP_SQL.read_text(encoding="utf-8"))
+        conn.close()
+    
+    def write(self, name: str, text: str) -> Path:
+        path = self.directory / name
+        path.write_text(text, encoding="utf-8")
+        return path
+    
+    def run_import(self, source: Path, **options):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            stats = import_catalog(source, self.db_path, **options)
+        return stats, output.getvalue()
+    
+    def query(self, sql: str, *args):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql, args).fetchall()
+        finally:
+            conn.close()
+    
+    def catalog(self):
+        return sorted(self.query("SELECT item_name, size, stock_count FROM product_inventory"))
+    
+    def test_replace_swaps_in_the_new_catalog(self):
+        source = self.write("catalog.csv", HEADER + "Trail Gilet,M,4,60\nTrail Gilet,L,2,60\ntrail gilet,m,7,65\n")
+        stats, _ = self.run_import(source, chunk_size=1)
+        
+        self.assertEqual((stats["rows"], stats["duplicates"], stats["rejected"]), (2, 1, 0))
+        # Last row wins for keys that differ only in case
+        self.assertEqual(self.catalog(), [("Trail Gilet", "L", 2), ("trail gilet", "m", 7)])
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name = ?", IMPORT_TABLE), [])
+        self.assertEqual(len(self.query("PRAGMA index_list(product_inventory)")), 1)
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.query("INSERT INTO product_inventory (item_name, size, stock_count, price_gbp) "
+                       "VALUES ('TRAIL GILET', 'L', 1, 60)")
+    
+    def test_upsert_updates_and_adds_rows(self):
+        source = self.write("changes.jsonl",
+                            '{"item_name": "tech-knit hoodie", "size": "m", "stock_count": 3, "price_gbp": 40}\n'
+                            '\n'
+                            '{"item_name": "Trail Gilet", "size": "M", "stock_count": 4, "price_gbp": 60}\n')
+        stats, _ = self.run_import(source, upsert=True)
+        
+        self.assertEqual(stats["rows"], 2)
+        catalog = self.catalog()
+        self.assertEqual(len(catalog), 9)
+        self.assertIn(("Tech-Knit Hoodie", "M", 3), catalog)
+        self.assertIn(("Trail Gilet", "M", 4), catalog)
+        self.assertIn(("Dry-Fit Running Tee", "L", 20), catalog)
+        self.assertEqual(self.query("SELECT price_gbp FROM product_inventory WHERE item_name = 'Tech-Knit Hoodie' "
+                                    "AND size = 'M'"), [(40,)])
+    
+    def test_invalid_rows_are_skipped_and_reported(self):
+        source = self.write("catalog.csv", HEADER + "Trail Gilet,M,4,60\n,M,1,10\nTrail Gilet,L,-1,60\n"
+                            "Trail Gilet,S,two,60\nTrail Gilet,XL,1,\n")
+        stats, output = self.run_import(source)
+        
+        self.assertEqual((stats["rows"], stats["rejected"]), (1, 4))
+        self.assertEqual(self.catalog(), [("Trail Gilet", "M", 4)])
+        self.assertIn("line 3", output)
+        self.assertIn("Skipped 4 invalid row(s)", output)
+    
+    def test_failed_import_keeps_the_old_catalog(self):
+        before = self.catalog()
+        for name, text in [("no_valid_rows.csv", HEADER + ",M,1,10\n"),
+                           ("missing_column.csv", "item_name,size,stock_count\nTrail Gilet,M,4\n"),
+                           ("catalog.xml", "<catalog/>")]:
+            stats, _ = self.run_import(self.write(name, text))
+            self.assertIsNone(stats, name)
+            self.assertEqual(self.catalog(), before, name)
+            self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name = ?", IMPORT_TABLE), [], name)
+    
+    def test_readers_see_the_old_catalog_until_the_swap_commits(self):
+        self.query("PRAGMA journal_mode=WAL")
+        reader = sqlite3.connect(self.db_path, isolation_level=None)
+        self.addCleanup(reader.close)
+        reader.execute("BEGIN")
+        self.assertEqual(reader.execute("SELECT COUNT(*) FROM product_inventory").fetchone(), (8,))
+        
+        stats, _ = self.run_import(self.write("catalog.csv", HEADER + "Trail Gilet,M,4,60\n"))
+        self.assertEqual(stats["rows"], 1)
+        self.assertEqual(reader.execute("SELECT COUNT(*) FROM product_inventory").fetchone(), (8,))
+        
+        reader.execute("COMMIT")
+        self.assertEqual(reader.execute("SELECT COUNT(*) FROM product_inventory").fetchone(), (1,))
+
+
+if __name__ == "__main__":
+    unittest.main()
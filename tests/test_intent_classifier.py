@@ -0,0 +1,69 @@
+"""
+Tests for the local intent classifier
+Run with: python -m unittest discover tests
+"""
+
+import unittest
+from services.intent_classifier import LocalIntentClassifier
+
+
+ITEM_NAMES = ["Tech-Knit Hoodie", "Dry-Fit Running Tee", "Running Tee", "Waterproof Commuter Jacket"]
+COMPANY_FIELDS = ["company_name", "location", "office_hours", "delivery_policy", "returns", "contact"]
+
+
+class LocalIntentClassifierTest(unittest.TestCase):
+    def setUp(self):
+        self.classifier = LocalIntentClassifier(ITEM_NAMES, COMPANY_FIELDS)
+    
+    def test_matches_products_and_plurals(self):
+        route = self.classifier.classify("Do you have Tech-Knit Hoodies in XL and Dry-Fit Running Tees in M?")
+        self.assertTrue(route["confident"])
+        self.assertEqual(route["inventory_calls"], [
+            {"item_name": "Tech-Knit Hoodie", "size": "XL", "intent": "stock"},
+            {"item_name": "Dry-Fit Running Tee", "size": "M", "intent": "stock"}
+        ])
+    
+    def test_longest_name_wins(self):
+        route = self.classifier.classify("What is the price of the Dry-Fit Running Tee?")
+        self.assertEqual(route["inventory_calls"], [{"item_name": "Dry-Fit Running Tee", "intent": "price"}])
+    
+    def test_catalog_update_replaces_names(self):
+        self.classifier.set_item_names(["Trail Gilet"])
+        self.assertEqual(self.classifier.classify("Is the trail gilet in stock?")["inventory_calls"][0]["item_name"],
+                         "Trail Gilet")
+        self.assertFalse(self.classifier.classify("Is the Tech-Knit Hoodie in stock?")["confident"])
+    
+    def test_company_questions_are_confident(self):
+        for query, category in [("What are your opening hours?", "office_hours"),
+                                ("Do you deliver to Scotland?", "delivery_policy"),
+                                ("Can I get a refund?", "returns")]:
+            route = self.classifier.classify(query)
+            self.assertTrue(route["confident"], query)
+            self.assertEqual(route["kb_category"], category)
+    
+    def test_keyword_out_of_context_defers_to_llm(self):
+        for query in ["When does Tesco open?", "How do I return a library book?"]:
+            route = self.classifier.classify(query)
+            self.assertFalse(route["confident"], query)
+            self.assertTrue(route["unfamiliar"], query)
+    
+    def test_other_product_questions_defer_to_llm(self):
+        for query in ["Is the Tech-Knit Hoodie machine washable?",
+                      "Do you sell the Dry-Fit Running Tee in red?",
+                      "What is the Waterproof Commuter Jacket made of?",
+                      "Tech-Knit Hoodie reviews"]:
+            route = self.classifier.classify(query)
+            self.assertFalse(route["confident"], query)
+            self.assertIn("inventory", route["hints"], query)
+    
+    def test_keywords_match_whole_words_in_company_context(self):
+        for query in ["How do I open a jar?", "What is the phone number for the police?"]:
+            route = self.classifier.classify(query)
+            self.assertFalse(route["confident"], query)
+            self.assertTrue(route["unfamiliar"], query)
+        self.assertEqual(self.classifier.classify("What's your phone number?")["kb_category"], "contact")
+        self.assertEqual(self.classifier.classify("How much is delivery?")["kb_category"], "delivery_policy")
+
+
+if __name__ == "__main__":
+    unittest.main()
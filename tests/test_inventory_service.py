@@ -0,0 +1,77 @@
+"""
+Tests for inventory lookups from the in-memory snapshot
+Run with: python -m unittest discover tests
+"""
+
+import sqlite3
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from services.inventory_service import InventoryService
+import config
+
+
+SETUP_SQL = Path(__file__).resolve().parent.parent / "inventory_setup.sql"
+
+
+class InventoryServiceTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_path = Path(directory.name) / "inventory.db"
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(SETUP_SQL.read_text(encoding="utf-8"))
+        conn.close()
+    
+    def service(self, **options) -> InventoryService:
+        service = InventoryService(str(self.db_path), **options)
+        self.addCleanup(service.close)
+        return service
+    
+    def set_stock_elsewhere(self, item_name: str, size: str, stock_count: int):
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute(f"UPDATE {config.DB_TABLE_NAME} SET stock_count = ? WHERE item_name = ? AND size = ?",
+                         (stock_count, item_name, size))
+        conn.close()
+    
+    def test_lookups_check_for_changes_at_most_once_per_interval(self):
+        service = self.service(refresh_interval=3600)
+        checks = []
+        data_version = service.connections.data_version
+        service.connections.data_version = lambda: checks.append(1) or data_version()
+        
+        for _ in range(100):
+            service.get_inventory("Tech-Knit Hoodie", "M")
+        self.assertEqual(checks, [])
+    
+    def test_changes_made_elsewhere_are_picked_up(self):
+        service = self.service(refresh_interval=0)
+        self.set_stock_elsewhere("Tech-Knit Hoodie", "M", 42)
+        
+        deadline = time.monotonic() + 5
+        while "42" not in service.get_inventory("Tech-Knit Hoodie", "M") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIn("42", service.get_inventory("Tech-Knit Hoodie", "M"))
+    
+    
+    def test_batch_and_single_lookups_agree(self):
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute(f"INSERT INTO {config.DB_TABLE_NAME} (item_name, size, stock_count, price_gbp) "
+                         "VALUES ('CAFÉ Jacket', 'M', 3, 60.00), ('Ärmel Tee', 'S', 2, 15.00)")
+        conn.close()
+        
+        requests = [{"item_name": name, "size": size}
+                    for name in ["café jacket", "CAFÉ JACKET", "cafÉ jacket", "Ärmel tee", "ärmel tee",
+                                 "tech-knit HOODIE"]
+                    for size in [None, "m", "S"]]
+        for use_snapshot in (True, False):
+            service = self.service(use_snapshot=use_snapshot, fuzzy_matching=False)
+            single = [service.get_inventory(request["item_name"], request["size"]) for request in requests]
+            self.assertEqual(service.get_inventory_many(requests), single, f"use_snapshot={use_snapshot}")
+
+
+if __name__ == "__main__":
+    unittest.main()
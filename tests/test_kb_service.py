@@ -0,0 +1,62 @@
+"""
+Tests for knowledge base reloading off the query path
+Run with: python -m unittest discover tests
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from services.kb_service import KnowledgeBaseService
+
+
+KB_TEXT = """COMPANY DATA - TECHGEAR UK
+Location: 124 High Street, London, EC1A 1BB
+Returns: Items can be returned within 30 days of purchase with a valid receipt.
+"""
+
+
+class KnowledgeBaseReloadTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "knowledge_base.txt"
+        self.path.write_text(KB_TEXT, encoding="utf-8")
+    
+    def service(self, reload_interval: float) -> KnowledgeBaseService:
+        service = KnowledgeBaseService(self.path, reload_interval=reload_interval)
+        self.addCleanup(service.close)
+        return service
+    
+    def edit(self):
+        self.path.write_text(KB_TEXT.replace("124 High Street", "9 Market Square"), encoding="utf-8")
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    
+    def test_queries_do_not_reload_within_the_interval(self):
+        service = self.service(reload_interval=3600)
+        self.edit()
+        
+        self.assertIn("124 High Street", service.retrieve("where is your office located"))
+        self.assertFalse(service.refresh())
+    
+    def test_changed_file_is_reloaded_in_the_background(self):
+        service = self.service(reload_interval=0)
+        self.edit()
+        
+        self.assertTrue(service.refresh())
+        
+        # close() waits for the reload the check started
+        service.close()
+        self.assertIn("9 Market Square", service.company_data["location"])
+    
+    def test_async_retrieve_answers_from_the_index(self):
+        service = self.service(reload_interval=3600)
+        
+        answer = asyncio.run(service.aretrieve("where is your office located"))
+        self.assertIn("124 High Street", answer)
+
+
+if __name__ == "__main__":
+    unittest.main()
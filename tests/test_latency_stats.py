@@ -0,0 +1,24 @@
+"""
+Tests for the latency percentile helper
+Run with: python -m unittest discover tests
+"""
+
+import unittest
+from services.latency_stats import percentile
+
+
+class PercentileTest(unittest.TestCase):
+    def test_nearest_rank(self):
+        self.assertEqual(percentile(list(range(1, 11)), 50), 5)
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        self.assertEqual(percentile(list(range(1, 101)), 99), 99)
+        self.assertEqual(percentile(list(range(1, 101)), 100), 100)
+    
+    def test_small_samples(self):
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(percentile([7.5], 99), 7.5)
+        self.assertEqual(percentile([1, 2], 0), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
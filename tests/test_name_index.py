@@ -0,0 +1,45 @@
+"""
+Tests for fuzzy product name resolution
+Run with: python -m unittest discover tests
+"""
+
+import unittest
+from services.name_index import NameIndex, within_one_edit
+
+
+CATALOG = ["Dry-Fit Running Tee", "Tech-Knit Hoodie", "Waterproof Commuter Jacket"]
+
+
+class NameIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = NameIndex(CATALOG)
+    
+    def resolved(self, query: str):
+        match = self.index.resolve(query)
+        return match[0] if match else None
+    
+    def test_near_misses_resolve(self):
+        self.assertEqual(self.resolved("Tech-Knit Hoodies"), "Tech-Knit Hoodie")
+        self.assertEqual(self.resolved("running tee"), "Dry-Fit Running Tee")
+        self.assertEqual(self.resolved("Waterprof Comuter Jacket"), "Waterproof Commuter Jacket")
+        self.assertEqual(self.resolved("waterproof commuter jackt"), "Waterproof Commuter Jacket")
+    
+    def test_other_product_types_do_not_resolve(self):
+        self.assertIsNone(self.resolved("Dry-Fit Running Shorts"))
+        self.assertIsNone(self.resolved("Dry-Fit Running Socks"))
+        self.assertIsNone(self.resolved("Tech-Knit Beanie"))
+    
+    def test_single_modifier_does_not_resolve(self):
+        self.assertIsNone(self.resolved("knit"))
+        self.assertIsNone(self.resolved("running"))
+    
+    def test_within_one_edit(self):
+        self.assertTrue(within_one_edit("jacket", "jackt"))
+        self.assertTrue(within_one_edit("hoodie", "hoodle"))
+        self.assertTrue(within_one_edit("tee", "tee"))
+        self.assertFalse(within_one_edit("shorts", "tee"))
+        self.assertFalse(within_one_edit("jacket", "jcket2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Tests for the resilience layer's circuit breaker and rate limiting
+Run with: python -m unittest discover tests
+"""
+
+import asyncio
+import unittest
+from unittest import mock
+from services.resilience import Resilience, RateLimited
+
+
+class TransientError(Exception):
+    """Stands in for a retryable Azure OpenAI error"""
+
+
+class _Completions:
+    """Fake chat.completions whose create() runs a given coroutine function"""
+    
+    def __init__(self, create):
+        self.create = create
+
+
+class _Chat:
+    def __init__(self, create):
+        self.completions = _Completions(create)
+
+
+class FakeAsyncClient:
+    """Async client stand-in for AsyncAzureOpenAI"""
+    
+    def __init__(self, create):
+        self.chat = _Chat(create)
+
+
+def half_open_resilience(**options) -> Resilience:
+    """Resilience layer whose breaker has opened and is ready for a probe"""
+    resilience = Resilience(enabled=True, failure_threshold=1, reset_timeout=0, **options)
+    resilience.breaker.record_failure()
+    return resilience
+
+
+class CancelledProbeTest(unittest.TestCase):
+    def test_cancelled_probe_releases_the_breaker(self):
+        resilience = half_open_resilience()
+        
+        async def hang(**request):
+            await asyncio.Event().wait()
+        
+        async def scenario():
+            client = resilience.wrap_async(FakeAsyncClient(hang))
+            task = asyncio.create_task(client.chat.completions.create(messages=[]))
+            await asyncio.sleep(0)
+            self.assertTrue(resilience.breaker.rejecting)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        
+        asyncio.run(scenario())
+        self.assertFalse(resilience.breaker.rejecting)
+        self.assertTrue(resilience.breaker.allow())
+    
+    def test_probe_success_after_cancelled_probe_closes_the_circuit(self):
+        resilience = half_open_resilience()
+        calls = []
+        
+        async def first_hangs(**request):
+            calls.append(request)
+            if len(calls) == 1:
+                await asyncio.Event().wait()
+            return "ok"
+        
+        async def scenario():
+            client = resilience.wrap_async(FakeAsyncClient(first_hangs))
+            task = asyncio.create_task(client.chat.completions.create(messages=[]))
+            await asyncio.sleep(0)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return await client.chat.completions.create(messages=[])
+        
+        self.assertEqual(asyncio.run(scenario()), "ok")
+        self.assertEqual(resilience.breaker.state, "closed")
+
+
+class RateLimitTest(unittest.TestCase):
+    def test_retries_take_request_quota(self):
+        # One request of burst, refilled at one per ten seconds
+        resilience = Resilience(enabled=True, max_retries=3, base_delay=0,
+                                requests_per_minute=6, max_queue_wait=0.1)
+        attempts = []
+        
+        async def fail(**request):
+            attempts.append(request)
+            raise TransientError()
+        
+        client = resilience.wrap_async(FakeAsyncClient(fail))
+        with mock.patch("services.resilience.is_retryable", return_value=True):
+            with self.assertRaises(RateLimited):
+                asyncio.run(client.chat.completions.create(messages=[]))
+        self.assertEqual(len(attempts), 1)
+    
+    def test_token_limit_rejection_refunds_the_request_token(self):
+        resilience = Resilience(enabled=True, requests_per_minute=60, tokens_per_minute=60,
+                                max_queue_wait=0.1)
+        resilience.token_bucket._tokens = 0
+        before = resilience.request_bucket._tokens
+        
+        with self.assertRaises(RateLimited):
+            resilience.admit({"messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 100})
+        self.assertAlmostEqual(resilience.request_bucket._tokens, before, places=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Tests for the response cache and its invalidation when the inventory changes
+Run with: python -m unittest discover tests
+"""
+
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from services.inventory_service import InventoryService
+from services.response_cache import ResponseCache
+from services.router import ChatbotRouter
+from tests.test_inventory_service import SETUP_SQL
+import config
+
+
+TTLS = {"company_info": 3600, "inventory": 30, "unknown": 0}
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("services.response_cache.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_entries_expire_after_their_tier_ttl(self):
+        cache = ResponseCache(max_entries=10, ttls=TTLS)
+        cache.put("where are you", "London", "company_info")
+        cache.put("hoodie in m", "Yes", "inventory")
+        
+        self.now += 29
+        self.assertEqual(cache.get_entry("hoodie in m"), ("Yes", "inventory"))
+        self.now += 1
+        self.assertIsNone(cache.get("hoodie in m"))
+        self.assertEqual(cache.get("where are you"), "London")
+        self.assertEqual(cache.stats()["expirations"], 1)
+        self.assertEqual(cache.stats()["size"], 1)
+    
+    def test_tiers_without_ttl_are_not_cached(self):
+        cache = ResponseCache(max_entries=10, ttls=TTLS)
+        cache.put("capital of france", "Sorry", "unknown")
+        cache.put("anything", "Sorry", "unrouted")
+        self.assertEqual(cache.stats()["size"], 0)
+        
+        disabled = ResponseCache(max_entries=0, ttls=TTLS)
+        disabled.put("where are you", "London", "company_info")
+        self.assertIsNone(disabled.get("where are you"))
+    
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResponseCache(max_entries=2, ttls=TTLS)
+        cache.put("a", "A", "company_info")
+        cache.put("b", "B", "company_info")
+        cache.get("a")
+        cache.put("c", "C", "company_info")
+        
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), ("A", "C"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+    
+    def test_invalidate_tier_keeps_other_tiers(self):
+        cache = ResponseCache(max_entries=10, ttls=TTLS)
+        cache.put("where are you", "London", "company_info")
+        cache.put("hoodie in m", "Yes", "inventory")
+        cache.put("tee in l", "No", "inventory")
+        
+        self.assertEqual(cache.invalidate_tier("inventory"), 2)
+        self.assertIsNone(cache.get("hoodie in m"))
+        self.assertEqual(cache.get("where are you"), "London")
+
+
+class InventoryInvalidationTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_path = Path(directory.name) / "inventory.db"
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(SETUP_SQL.read_text(encoding="utf-8"))
+        conn.close()
+        
+        # Only the pieces _check_inventory_version uses
+        self.router = ChatbotRouter.__new__(ChatbotRouter)
+        self.router.inventory_service = InventoryService(str(self.db_path), refresh_interval=0)
+        self.addCleanup(self.router.inventory_service.close)
+        self.router.response_cache = ResponseCache(max_entries=10, ttls=TTLS)
+        self.router.response_cache.put("where are you", "London", "company_info")
+        self.router.response_cache.put("hoodie in m", "Yes (10 in stock)", "inventory")
+    
+    def test_unchanged_database_keeps_inventory_answers(self):
+        self.router._check_inventory_version()
+        self.assertEqual(self.router.response_cache.get("hoodie in m"), "Yes (10 in stock)")
+    
+    def test_data_version_change_drops_inventory_answers(self):
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute(f"UPDATE {config.DB_TABLE_NAME} SET stock_count = 0 WHERE item_name = 'Tech-Knit Hoodie'")
+        conn.close()
+        
+        self.router._check_inventory_version()
+        self.assertIsNone(self.router.response_cache.get("hoodie in m"))
+        self.assertEqual(self.router.response_cache.get("where are you"), "London")
+        self.assertEqual(self.router.response_cache.stats()["invalidations"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+"""
+Tests for the HTTP/WebSocket server: request parsing, WebSocket framing, sessions and admission control
+Run with: python -m unittest discover tests
+"""
+
+import asyncio
+import json
+import os
+import struct
+import unittest
+from server import ChatServer, Overloaded, MAX_BODY_BYTES
+
+
+def stream(data: bytes) -> asyncio.StreamReader:
+    """StreamReader that yields data and then EOF"""
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+def client_frame(opcode: int, payload: bytes, fin: bool = True) -> bytes:
+    """Masked frame as a browser would send it"""
+    mask = os.urandom(4)
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", (0x80 if fin else 0) | opcode, 0x80 | length)
+    else:
+        header = struct.pack("!BBH", (0x80 if fin else 0) | opcode, 0x80 | 126, length)
+    return header + mask + bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+
+
+class BufferWriter:
+    """StreamWriter stand-in that keeps what was written"""
+    
+    def __init__(self):
+        self.data = b""
+    
+    def write(self, data: bytes):
+        self.data += data
+    
+    async def drain(self):
+        pass
+
+
+class FakeRouter:
+    """Router whose answers wait until released, recording the session of each query"""
+    
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.sessions = []
+    
+    async def aroute_query(self, query, session_id=None):
+        self.sessions.append(session_id)
+        await self.release.wait()
+        return f"answer to {query}"
+    
+    def end_session(self, session_id):
+        pass
+
+
+class RequestParsingTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = ChatServer(FakeRouter(), port=0)
+    
+    async def test_reads_request_line_headers_and_body(self):
+        body = b'{"query": "hi"}'
+        request = (b"POST /chat?x=1 HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                   b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+        method, path, headers, read_body = await self.server._read_request(stream(request))
+        
+        self.assertEqual((method, path, read_body), ("POST", "/chat", body))
+        self.assertEqual(headers["content-type"], "application/json")
+        self.assertEqual(headers["host"], "localhost")
+    
+    async def test_closed_connection_returns_none(self):
+        self.assertIsNone(await self.server._read_request(stream(b"")))
+    
+    async def test_malformed_requests_raise_value_error(self):
+        for request in [b"GARBAGE\r\n\r\n",
+                        b"POST /chat HTTP/1.1\r\nContent-Length: 10",
+                        b"POST /chat HTTP/1.1\r\nContent-Length: " + str(MAX_BODY_BYTES + 1).encode() + b"\r\n\r\n"]:
+            with self.assertRaises(ValueError, msg=request):
+                await self.server._read_request(stream(request))
+    
+    def test_parse_query_validates_body(self):
+        self.assertEqual(ChatServer._parse_query(b'{"query": "  hi  "}'), ("hi", None))
+        for body in [b"not json", b'{"query": ""}', b'["hi"]', b'{"query": "hi", "session_id": 5}',
+                     b'{"query": "hi", "session_id": "' + b"x" * 200 + b'"}']:
+            with self.assertRaises(ValueError, msg=body):
+                ChatServer._parse_query(body)
+
+
+class WebSocketFramingTest(unittest.IsolatedAsyncioTestCase):
+    async def test_reads_masked_frame(self):
+        opcode, payload = await ChatServer._read_frame(stream(client_frame(0x1, b"hello")), BufferWriter())
+        self.assertEqual((opcode, payload), (0x1, b"hello"))
+    
+    async def test_joins_fragments_around_pings(self):
+        writer = BufferWriter()
+        reader = stream(client_frame(0x1, b"hel", fin=False) + client_frame(0x9, b"ping")
+                        + client_frame(0x0, b"lo" * 100) + client_frame(0x8, b"\x03\xe8"))
+        self.assertEqual(await ChatServer._read_frame(reader, writer), (0x1, b"hel" + b"lo" * 100))
+        self.assertEqual(writer.data, b"\x8a\x04ping")
+        self.assertEqual(await ChatServer._read_frame(reader, writer), (0x8, b"\x03\xe8"))
+    
+    async def test_rejects_oversized_message(self):
+        fragments = client_frame(0x1, b"x" * 60000, fin=False) + client_frame(0x0, b"x" * 60000)
+        with self.assertRaises(ValueError):
+            await ChatServer._read_frame(stream(fragments), BufferWriter())
+    
+    async def test_written_frames_read_back(self):
+        # Server frames are unmasked, which the reader also accepts
+        for payload in [b"short", b"m" * 300]:
+            writer = BufferWriter()
+            ChatServer._write_frame(writer, 0x1, payload)
+            self.assertFalse(writer.data[1] & 0x80)
+            self.assertEqual(await ChatServer._read_frame(stream(writer.data), writer), (0x1, payload))
+        
+        writer = BufferWriter()
+        ChatServer._write_frame(writer, 0x1, b"l" * 70000)
+        self.assertEqual(writer.data[:10], struct.pack("!BBQ", 0x81, 127, 70000))
+
+
+class SessionTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.router = FakeRouter()
+        self.router.release.set()
+        self.server = ChatServer(self.router, host="127.0.0.1", port=0)
+    
+    async def test_http_sessions_are_issued_by_the_server(self):
+        status, first = await self.server._handle_http("POST", "/chat", b'{"query": "hi"}')
+        self.assertEqual(status, 200)
+        body = json.dumps({"query": "and in large?", "session_id": first["session_id"]}).encode()
+        status, second = await self.server._handle_http("POST", "/chat", body)
+        self.assertEqual((status, second["session_id"]), (200, first["session_id"]))
+        
+        status, other = await self.server._handle_http("POST", "/chat", b'{"query": "hi"}')
+        self.assertNotEqual(other["session_id"], first["session_id"])
+        self.assertEqual(self.router.sessions, [first["session_id"], first["session_id"], other["session_id"]])
+    
+    async def test_http_rejects_session_ids_it_did_not_issue(self):
+        token = self.server._issue_session().split(".")[0]
+        for session_id in ["victim", f"{token}.{'0' * 32}", ChatServer(self.router)._issue_session()]:
+            body = json.dumps({"query": "hi", "session_id": session_id}).encode()
+            status, _ = await self.server._handle_http("POST", "/chat", body)
+            self.assertEqual(status, 400, session_id)
+        self.assertEqual(self.router.sessions, [])
+    
+    async def test_websocket_ignores_client_session_id(self):
+        await self.server.start()
+        self.addAsyncCleanup(self.server.shutdown, 0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.server.port)
+        self.addCleanup(writer.close)
+        writer.write(b"GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\nSec-WebSocket-Version: 13\r\n\r\n")
+        self.assertIn(b" 101 ", await reader.readuntil(b"\r\n\r\n"))
+        
+        for query in ["hi", "again"]:
+            writer.write(client_frame(0x1, json.dumps({"query": query, "session_id": "victim"}).encode()))
+            opcode, reply = await ChatServer._read_frame(reader, writer)
+            self.assertEqual(json.loads(reply), {"response": f"answer to {query}"})
+        self.assertNotIn("victim", self.router.sessions)
+        self.assertTrue(self.router.sessions[0].startswith("ws-"))
+        self.assertEqual(self.router.sessions[0], self.router.sessions[1])
+
+
+class AdmissionTest(unittest.IsolatedAsyncioTestCase):
+    async def test_full_queue_returns_503(self):
+        router = FakeRouter()
+        server = ChatServer(router, port=0, max_concurrency=1, max_queue=1, request_timeout=5)
+        running = [asyncio.create_task(server.answer("first")), asyncio.create_task(server.answer("second"))]
+        await asyncio.sleep(0)
+        self.assertEqual(server.stats()["admitted"], 2)
+        
+        with self.assertRaises(Overloaded):
+            await server.answer("third")
+        status, payload = await server._route("third")
+        self.assertEqual(status, 503)
+        self.assertIn("error", payload)
+        
+        router.release.set()
+        self.assertEqual(await asyncio.gather(*running), ["answer to first", "answer to second"])
+        self.assertEqual(server.stats()["admitted"], 0)
+        self.assertEqual((await server._route("fourth"))[0], 200)
+    
+    async def test_slow_query_returns_504(self):
+        server = ChatServer(FakeRouter(), port=0, request_timeout=0.01)
+        self.assertEqual((await server._route("slow"))[0], 504)
+    
+    async def test_draining_server_refuses_queries(self):
+        server = ChatServer(FakeRouter(), port=0)
+        await server.shutdown(drain_timeout=0)
+        with self.assertRaises(Overloaded):
+            await server.answer("late")
+
+
+if __name__ == "__main__":
+    unittest.main()
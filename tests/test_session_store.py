@@ -0,0 +1,83 @@
+"""
+Tests for the conversation session store
+Run with: python -m unittest discover tests
+"""
+
+import unittest
+from unittest import mock
+from services.intent_classifier import LocalIntentClassifier
+from services.session_store import SessionStore
+
+
+HOODIE_CALLS = [{"item_name": "Tech-Knit Hoodie", "size": "M", "intent": "stock"}]
+
+
+class SessionStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("services.session_store.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def store(self, **options) -> SessionStore:
+        settings = {"max_sessions": 10, "idle_timeout": 60, "max_bytes": 1 << 20}
+        settings.update(options)
+        return SessionStore(**settings)
+    
+    def test_idle_sessions_expire(self):
+        store = self.store()
+        store.record("a", "Is the hoodie in stock?", "Yes", "inventory", HOODIE_CALLS)
+        
+        self.now += 59
+        self.assertIsNotNone(store.get("a"))
+        self.now += 61
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.stats()["expirations"], 1)
+        self.assertEqual(store.stats()["bytes"], 0)
+    
+    def test_least_recently_used_session_is_evicted(self):
+        store = self.store(max_sessions=2)
+        store.record("a", "hi", "hello", "unknown")
+        store.record("b", "hi", "hello", "unknown")
+        store.get("a")
+        store.record("c", "hi", "hello", "unknown")
+        
+        self.assertIsNone(store.get("b"))
+        self.assertIsNotNone(store.get("a"))
+        self.assertIsNotNone(store.get("c"))
+        self.assertEqual(store.stats()["evictions"], 1)
+    
+    def test_memory_ceiling_evicts_but_keeps_the_current_session(self):
+        store = self.store(max_bytes=2000)
+        store.record("a", "x" * 300, "y" * 300, "unknown")
+        store.record("b", "x" * 300, "y" * 300, "unknown")
+        
+        self.assertIsNone(store.get("a"))
+        self.assertIsNotNone(store.get("b"))
+        self.assertLessEqual(store.stats()["bytes"], 2000)
+    
+    def test_turn_without_lookups_keeps_the_remembered_products(self):
+        store = self.store()
+        store.record("a", "Is the hoodie in M in stock?", "Yes", "inventory", HOODIE_CALLS)
+        store.record("a", "Where are you?", "London", "company_info")
+        
+        session = store.get("a")
+        self.assertEqual(session.tier, "company_info")
+        self.assertEqual(session.inventory_arguments(), HOODIE_CALLS)
+        self.assertEqual(len(store.history("a")), 4)
+    
+    def test_follow_up_resolves_against_the_session(self):
+        store = self.store()
+        classifier = LocalIntentClassifier(["Tech-Knit Hoodie"], ["location"])
+        store.record("a", "Is the Tech-Knit Hoodie in M in stock?", "Yes", "inventory", HOODIE_CALLS)
+        previous = store.get("a").inventory_arguments()
+        
+        route = classifier.follow_up("and in large?", previous)
+        self.assertEqual(route["inventory_calls"], [{"item_name": "Tech-Knit Hoodie", "size": "L", "intent": "stock"}])
+        route = classifier.follow_up("how much is it?", previous)
+        self.assertEqual(route["inventory_calls"], [{"item_name": "Tech-Knit Hoodie", "size": "M", "intent": "price"}])
+        self.assertIsNone(classifier.follow_up("what about the weather?", previous))
+
+
+if __name__ == "__main__":
+    unittest.main()
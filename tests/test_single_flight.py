@@ -0,0 +1,88 @@
+"""
+Tests for coalescing identical in-flight work
+Run with: python -m unittest discover tests
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from services.single_flight import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.flights = SingleFlight(enabled=True)
+    
+    def test_concurrent_callers_share_one_call(self):
+        calls = []
+        release = threading.Event()
+        
+        def work():
+            calls.append(1)
+            release.wait(5)
+            return "answer"
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(self.flights.do, "key", work) for _ in range(8)]
+            while self.flights.stats()["coalesced"] < 7:
+                time.sleep(0.001)
+            release.set()
+            results = [future.result(5) for future in futures]
+        
+        self.assertEqual(results, ["answer"] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.flights.stats(), {"in_flight": 0, "leaders": 1, "coalesced": 7})
+    
+    def test_error_reaches_every_waiter(self):
+        async def main():
+            started = asyncio.Event()
+            
+            async def work():
+                started.set()
+                await asyncio.sleep(0.01)
+                raise ValueError("backend down")
+            
+            leader = asyncio.ensure_future(self.flights.ado("key", work))
+            await started.wait()
+            waiters = [asyncio.ensure_future(self.flights.ado("key", work)) for _ in range(3)]
+            return await asyncio.gather(leader, *waiters, return_exceptions=True)
+        
+        results = asyncio.run(main())
+        self.assertEqual([type(result) for result in results], [ValueError] * 4)
+        self.assertEqual(self.flights.stats()["leaders"], 1)
+    
+    def test_work_is_cancelled_only_when_every_waiter_left(self):
+        async def main():
+            started = asyncio.Event()
+            cancelled = asyncio.Event()
+            
+            async def work():
+                started.set()
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+                return "answer"
+            
+            leader = asyncio.ensure_future(self.flights.ado("key", work))
+            await started.wait()
+            waiter = asyncio.ensure_future(self.flights.ado("key", work))
+            await asyncio.sleep(0)
+            
+            leader.cancel()
+            await asyncio.sleep(0.01)
+            cancelled_with_waiter = cancelled.is_set()
+            
+            waiter.cancel()
+            await asyncio.wait_for(cancelled.wait(), 1)
+            return cancelled_with_waiter
+        
+        self.assertFalse(asyncio.run(main()))
+        self.assertEqual(self.flights.stats()["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
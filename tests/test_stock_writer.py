@@ -0,0 +1,93 @@
+"""
+Tests for the batched stock writer
+Run with: python -m unittest discover tests
+"""
+
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from services.db_connection import ConnectionManager
+from services.stock_writer import StockWriter, _Job, APPLIED
+import config
+
+
+def make_database(path: Path):
+    """Create a small product_inventory whose 'Broken Item' rejects every update"""
+    conn = sqlite3.connect(path)
+    conn.executescript(f"""
+        CREATE TABLE {config.DB_TABLE_NAME} (item_name TEXT, size TEXT, stock_count INTEGER);
+        INSERT INTO {config.DB_TABLE_NAME} VALUES ('Tee', 'M', 5), ('Broken Item', 'M', 5);
+        CREATE TRIGGER reject_broken BEFORE UPDATE ON {config.DB_TABLE_NAME}
+        WHEN OLD.item_name = 'Broken Item'
+        BEGIN SELECT RAISE(ABORT, 'broken item'); END;
+    """)
+    conn.close()
+
+
+class _FailingConnection:
+    """Writer connection stand-in whose COMMIT and ROLLBACK both fail"""
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+    
+    @property
+    def in_transaction(self) -> bool:
+        return self._conn.in_transaction
+    
+    def execute(self, sql, *args):
+        if sql in ("COMMIT", "ROLLBACK"):
+            raise sqlite3.OperationalError(f"{sql} failed")
+        return self._conn.execute(sql, *args)
+    
+    def close(self):
+        self._conn.close()
+
+
+class StockWriterTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self._dir.name) / "inventory.db"
+        make_database(self.db_path)
+        self.connections = ConnectionManager(str(self.db_path))
+        self.writer = StockWriter(self.connections)
+    
+    def tearDown(self):
+        self.writer.close()
+        self.connections.close_all()
+        self._dir.cleanup()
+    
+    def stock(self, item_name: str) -> int:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(f"SELECT stock_count FROM {config.DB_TABLE_NAME} WHERE item_name = ?",
+                                (item_name,)).fetchone()[0]
+        finally:
+            conn.close()
+    
+    def test_failing_job_does_not_fail_its_batch(self):
+        good = _Job([{"item_name": "Tee", "size": "M", "delta": -1}], atomic=False)
+        bad = _Job([{"item_name": "Broken Item", "size": "M", "delta": -1}], atomic=False)
+        self.writer._commit([good, bad])
+        
+        self.assertEqual(good.future.result(0)[0]["status"], APPLIED)
+        with self.assertRaises(sqlite3.IntegrityError):
+            bad.future.result(0)
+        self.assertEqual(self.stock("Tee"), 4)
+        self.assertEqual(self.stock("Broken Item"), 5)
+    
+    def test_failed_rollback_still_resolves_every_future(self):
+        self.connections._writer = _FailingConnection(self.connections.writer())
+        jobs = [_Job([{"item_name": "Tee", "size": "M", "delta": -1}], atomic=False) for _ in range(3)]
+        self.writer._commit(jobs)
+        
+        for job in jobs:
+            with self.assertRaises(sqlite3.OperationalError):
+                job.future.result(0)
+        # The broken connection was dropped, so the next batch gets a fresh one
+        self.assertEqual(self.writer.apply([{"item_name": "Tee", "size": "M", "delta": -1}])[0]["status"], APPLIED)
+        self.assertEqual(self.stock("Tee"), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Tests for reading labels from streamed classifications
+Run with: python -m unittest discover tests
+"""
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+from services.streaming import read_label, aread_label
+
+
+LABELS = ["company_info", "inventory", "unknown"]
+
+
+def chunk(content=None, usage=None):
+    choices = [] if content is None else [SimpleNamespace(delta=SimpleNamespace(content=content))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class FakeStream:
+    """Stream stand-in that records how many chunks were read"""
+    
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.read = 0
+        self.closed = False
+    
+    def __iter__(self):
+        for item in self.chunks:
+            self.read += 1
+            yield item
+    
+    async def __aiter__(self):
+        for item in self:
+            yield item
+    
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncStream(FakeStream):
+    async def close(self):
+        self.closed = True
+
+
+USAGE = SimpleNamespace(prompt_tokens=40, completion_tokens=3)
+CHUNKS = [chunk(), chunk("inv"), chunk("entory"), chunk(""), chunk(usage=USAGE)]
+
+
+class ReadLabelTest(unittest.TestCase):
+    def test_stops_at_the_label_without_a_usage_callback(self):
+        stream = FakeStream(CHUNKS)
+        self.assertEqual(read_label(stream, LABELS), "inventory")
+        self.assertEqual(stream.read, 2)
+        self.assertTrue(stream.closed)
+    
+    def test_reads_on_to_the_usage_chunk(self):
+        usages = []
+        stream = FakeStream(CHUNKS)
+        self.assertEqual(read_label(stream, LABELS, usages.append), "inventory")
+        self.assertEqual([item.usage for item in usages], [USAGE])
+        self.assertTrue(stream.closed)
+    
+    def test_async_reads_on_to_the_usage_chunk(self):
+        usages = []
+        stream = FakeAsyncStream(CHUNKS)
+        self.assertEqual(asyncio.run(aread_label(stream, LABELS, usages.append)), "inventory")
+        self.assertEqual([item.usage for item in usages], [USAGE])
+        self.assertTrue(stream.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()